@@ -55,6 +55,13 @@ class PG(interface.IDB):
             await session.execute(text(query), query_params)
             await session.commit()
 
+    async def update_returning(self, query: str, query_params: dict) -> Sequence[Any]:
+        async with self.pool() as session:
+            result = await session.execute(text(query), query_params)
+            rows = result.all()
+            await session.commit()
+            return rows
+
     async def select(self, query: str, query_params: dict) -> Sequence[Any]:
         async with self.pool() as session:
             result = await session.execute(text(query), query_params)
@@ -57,6 +57,20 @@ class RedisClient(interface.IRedis):
         except Exception as e:
             return default
 
+    async def delete(self, *keys: str) -> int:
+        if not keys:
+            return 0
+        client = await self.get_async_client()
+        return await client.delete(*keys)
+
+    async def incr(self, key: str) -> int:
+        client = await self.get_async_client()
+        return await client.incr(key)
+
+    async def set_if_absent(self, key: str, value: Any, ttl: int) -> bool:
+        client = await self.get_async_client()
+        return bool(await client.set(key, self._serialize_value(value), ex=ttl, nx=True))
+
     async def get_async_client(self) -> aioredis.Redis:
         if self.async_client is None:
             self.async_pool = aioredis.ConnectionPool.from_url(
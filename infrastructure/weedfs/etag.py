@@ -0,0 +1,16 @@
+import re
+
+# entity-tag по RFC 9110: необязательный W/ и строка в кавычках, внутри которой может быть запятая
+ENTITY_TAG_RE = re.compile(r'(?:W/)?("[^"]*")')
+
+
+def fid_etag(fid: str) -> str:
+    # Содержимое по fid не меняется, поэтому fid — сильный валидатор
+    return f'"{fid}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == '*':
+        return True
+    # Слабое сравнение: префикс W/ игнорируется
+    return etag in ENTITY_TAG_RE.findall(if_none_match)
@@ -1,19 +1,50 @@
 import io
+import json
 import asyncio
-from typing import Optional, Tuple
+import logging
+import random
+import time
+from typing import AsyncIterator, BinaryIO, Optional, Tuple
 from dataclasses import dataclass
 
 import aiohttp
 from aiohttp import ClientSession
 
+from infrastructure.weedfs.etag import fid_etag, etag_matches
 from internal import interface, model
 
 
 class AsyncWeed(interface.IStorage):
-    def __init__(self, weed_master_host: str, weed_master_port: int, timeout: int = 30):
+    def __init__(
+            self,
+            weed_master_host: str,
+            weed_master_port: int,
+            timeout: int = 30,
+            stream_chunk_size: int = 64 * 1024,
+            volume_cache_ttl: int = 60,
+            volume_negative_ttl: int = 5,
+            volume_min_age: int = 5,
+            upload_concurrency: int = 4,
+            upload_chunk_size: int = 8 * 1024 * 1024,
+    ):
         self.master_url = f"http://{weed_master_host}:{weed_master_port}"
         self.timeout = aiohttp.ClientTimeout(total=timeout)
+        # Для потоковой отдачи ограничиваем не всю передачу, а простой между чанками
+        self.stream_timeout = aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+        self.stream_chunk_size = stream_chunk_size
+        self.upload_concurrency = upload_concurrency
+        # Файл больше чанка загружается частями и склеивается манифестом SeaweedFS (cm=true)
+        self.upload_chunk_size = upload_chunk_size
         self._session: Optional[ClientSession] = None
+        self.logger = logging.getLogger(__name__)
+
+        # volume_id -> (истекает в, адреса реплик, получено в); пустой список — volume не найден
+        self.volume_cache_ttl = volume_cache_ttl
+        self.volume_negative_ttl = volume_negative_ttl
+        # Запись моложе этого возраста не сбрасывается, чтобы сбои не превращались в поток запросов к мастеру
+        self.volume_min_age = volume_min_age
+        self._volume_locations: dict[str, tuple[float, list[str], float]] = {}
+        self._volume_lookups: dict[str, asyncio.Task] = {}
 
     async def _get_session(self) -> ClientSession:
         """Получить или создать HTTP сессию"""
@@ -21,11 +52,12 @@ class AsyncWeed(interface.IStorage):
             self._session = aiohttp.ClientSession(timeout=self.timeout)
         return self._session
 
-    async def _assign_file_key(self) -> dict:
-        """Получить ключ для загрузки файла"""
+    async def _assign_file_key(self, count: int = 1) -> dict:
+        """Получить ключ для загрузки файла; при count > 1 резервируются fid, fid_1, ..., fid_{count-1}"""
         session = await self._get_session()
 
-        async with session.get(f"{self.master_url}/dir/assign") as response:
+        params = {"count": count} if count > 1 else None
+        async with session.get(f"{self.master_url}/dir/assign", params=params) as response:
             if response.status != 200:
                 raise Exception(f"Failed to assign file key: {response.status}")
             return await response.json()
@@ -35,10 +67,80 @@ class AsyncWeed(interface.IStorage):
         session = await self._get_session()
 
         async with session.get(f"{self.master_url}/dir/lookup", params={"volumeId": volume_id}) as response:
+            if response.status == 404:
+                return {"locations": []}
             if response.status != 200:
                 raise Exception(f"Failed to lookup volume: {response.status}")
             return await response.json()
 
+    async def _volume_urls(self, volume_id: str) -> list[str]:
+        """Адреса реплик volume из кеша, в случайном порядке для распределения чтений"""
+        cached = self._volume_locations.get(volume_id)
+        if cached is None or cached[0] <= time.monotonic():
+            # Одновременные промахи по одному volume ждут общий запрос к мастеру
+            lookup = self._volume_lookups.get(volume_id)
+            if lookup is None:
+                lookup = asyncio.create_task(self._resolve_volume(volume_id))
+                self._volume_lookups[volume_id] = lookup
+                lookup.add_done_callback(lambda _: self._volume_lookups.pop(volume_id, None))
+            cached = await asyncio.shield(lookup)
+
+        _, urls, _ = cached
+        if not urls:
+            raise Exception(f"Volume {volume_id} not found")
+
+        return random.sample(urls, len(urls))
+
+    async def _resolve_volume(self, volume_id: str) -> tuple[float, list[str], float]:
+        lookup_result = await self._lookup_volume(volume_id)
+        urls = [location['url'] for location in lookup_result.get('locations') or []]
+
+        now = time.monotonic()
+        ttl = self.volume_cache_ttl if urls else self.volume_negative_ttl
+        cached = (now + ttl, urls, now)
+        self._volume_locations[volume_id] = cached
+        return cached
+
+    def _invalidate_volume(self, volume_id: str):
+        cached = self._volume_locations.get(volume_id)
+        if cached is not None and time.monotonic() - cached[2] >= self.volume_min_age:
+            self._volume_locations.pop(volume_id, None)
+
+    async def _get_from_replicas(
+            self,
+            volume_id: str,
+            path: str,
+            headers: dict = None,
+            timeout: aiohttp.ClientTimeout = None
+    ) -> aiohttp.ClientResponse:
+        """GET к репликам volume по очереди; кеш расположения сбрасывает только ошибка соединения.
+
+        404 означает отсутствие файла, а не устаревший адрес volume, поэтому просто пробуется следующая реплика.
+        """
+        session = await self._get_session()
+
+        last_error = None
+        for volume_server in await self._volume_urls(volume_id):
+            try:
+                response = await session.get(
+                    f"http://{volume_server}/{path}",
+                    headers=headers,
+                    timeout=timeout or self.timeout
+                )
+            except aiohttp.ClientConnectionError as err:
+                self._invalidate_volume(volume_id)
+                last_error = Exception(f"Volume server {volume_server} unavailable: {err}")
+                continue
+
+            if response.status == 404:
+                response.release()
+                last_error = Exception("Download failed: 404")
+                continue
+
+            return response
+
+        raise last_error
+
     def _parse_fid(self, fid: str) -> Tuple[str, str]:
         """Разобрать FID на volume_id и file_key"""
         if ',' not in fid:
@@ -51,58 +153,182 @@ class AsyncWeed(interface.IStorage):
         try:
             # Получаем ключ для загрузки
             assign_result = await self._assign_file_key()
-            fid = assign_result['fid']
-            upload_url = f"http://{assign_result['url']}/{fid}"
+            return await self._upload_to(assign_result['url'], assign_result['fid'], file, name)
 
-            # Подготавливаем данные для загрузки
-            file.seek(0)
-            file_data = file.read()
+        except Exception as e:
+            raise Exception(f"Failed to upload file: {str(e)}")
 
-            session = await self._get_session()
+    async def upload_many(self, files: list[tuple[io.BytesIO, str]]) -> list[model.AsyncWeedOperationResponse]:
+        """Загрузить несколько файлов: один assign на все fid и параллельная загрузка, результаты в порядке входа"""
+        if not files:
+            return []
 
-            # Создаем form data
-            data = aiohttp.FormData()
-            data.add_field('file', file_data, filename=name)
+        try:
+            assign_result = await self._assign_file_key(count=len(files))
+            fid = assign_result['fid']
+            fids = [fid] + [f"{fid}_{index}" for index in range(1, len(files))]
 
-            # Загружаем файл
-            async with session.post(upload_url, data=data) as response:
-                content = await response.read()
+            semaphore = asyncio.Semaphore(self.upload_concurrency)
 
-                if response.status not in [200, 201]:
-                    raise Exception(f"Upload failed: {response.status}, {content.decode()}")
+            async def upload_one(file_fid: str, file: io.BytesIO, name: str) -> model.AsyncWeedOperationResponse:
+                async with semaphore:
+                    return await self._upload_to(assign_result['url'], file_fid, file, name)
 
-                return model.AsyncWeedOperationResponse(
-                    status_code=response.status,
-                    content=content,
-                    content_type=response.headers.get('Content-Type', ''),
-                    headers=dict(response.headers),
-                    fid=fid,
-                    url=upload_url,
-                    size=len(file_data)
+            return list(await asyncio.gather(*[
+                upload_one(file_fid, file, name)
+                for file_fid, (file, name) in zip(fids, files)
+            ]))
+
+        except Exception as e:
+            raise Exception(f"Failed to upload files: {str(e)}")
+
+    async def upload_stream(
+            self,
+            source: AsyncIterator[bytes] | BinaryIO,
+            name: str,
+            content_type: str = 'application/octet-stream'
+    ) -> model.AsyncWeedOperationResponse:
+        """
+        Загрузить файл потоком, не держа его в памяти целиком.
+
+        Каждый чанк отправляется multipart-телом с chunked transfer прямо из источника.
+        Если источник закончился в пределах первого чанка, это обычный файл;
+        иначе чанки склеиваются манифестом, и по fid манифеста файл отдаётся целиком.
+        При ошибке уже загруженные чанки удаляются, чтобы не оставлять файлы без манифеста.
+        """
+        chunks = []
+        try:
+            stream = _ChunkedSource(source, self.stream_chunk_size)
+            offset = 0
+
+            while True:
+                assign_result = await self._assign_file_key()
+                chunk_response = await self._upload_stream_to(
+                    assign_result['url'],
+                    assign_result['fid'],
+                    stream.take(self.upload_chunk_size),
+                    name,
+                    content_type
                 )
+                chunk_size = stream.taken
+                chunks.append({"fid": assign_result['fid'], "offset": offset, "size": chunk_size})
+                offset += chunk_size
+
+                if await stream.exhausted():
+                    break
+
+            if len(chunks) == 1:
+                chunk_response.size = offset
+                return chunk_response
+
+            manifest = json.dumps({
+                "name": name,
+                "mime": content_type,
+                "size": offset,
+                "chunks": chunks,
+            }).encode()
+
+            assign_result = await self._assign_file_key()
+            manifest_response = await self._upload_to(
+                assign_result['url'],
+                assign_result['fid'],
+                io.BytesIO(manifest),
+                name,
+                query="?cm=true"
+            )
+            manifest_response.size = offset
+            return manifest_response
 
         except Exception as e:
+            await self._delete_chunks([chunk["fid"] for chunk in chunks])
             raise Exception(f"Failed to upload file: {str(e)}")
 
+    async def _delete_chunks(self, fids: list[str]):
+        """Удалить осиротевшие чанки; сбой удаления только логируется, чтобы не скрыть исходную ошибку"""
+        results = await asyncio.gather(*[self.delete(fid, "") for fid in fids], return_exceptions=True)
+        for fid, result in zip(fids, results):
+            if isinstance(result, Exception):
+                self.logger.warning(f"Не удалось удалить чанк {fid}: {result}")
+
+    async def _upload_stream_to(
+            self,
+            volume_server: str,
+            fid: str,
+            chunks: AsyncIterator[bytes],
+            name: str,
+            content_type: str
+    ) -> model.AsyncWeedOperationResponse:
+        upload_url = f"http://{volume_server}/{fid}"
+
+        # Размер части заранее неизвестен, поэтому тело уходит с Transfer-Encoding: chunked
+        with aiohttp.MultipartWriter('form-data') as writer:
+            part = writer.append(aiohttp.payload.AsyncIterablePayload(chunks, content_type=content_type))
+            part.set_content_disposition('form-data', name='file', filename=name)
+
+        session = await self._get_session()
+
+        async with session.post(upload_url, data=writer, timeout=self.stream_timeout) as response:
+            content = await response.read()
+
+            if response.status not in [200, 201]:
+                raise Exception(f"Upload failed: {response.status}, {content.decode()}")
+
+            return model.AsyncWeedOperationResponse(
+                status_code=response.status,
+                content=content,
+                content_type=response.headers.get('Content-Type', ''),
+                headers=dict(response.headers),
+                fid=fid,
+                url=upload_url
+            )
+
+    async def _upload_to(
+            self,
+            volume_server: str,
+            fid: str,
+            file: io.BytesIO,
+            name: str,
+            query: str = ""
+    ) -> model.AsyncWeedOperationResponse:
+        upload_url = f"http://{volume_server}/{fid}{query}"
+
+        # Подготавливаем данные для загрузки
+        file.seek(0)
+        file_data = file.read()
+
+        session = await self._get_session()
+
+        # Создаем form data
+        data = aiohttp.FormData()
+        data.add_field('file', file_data, filename=name)
+
+        # Загружаем файл
+        async with session.post(upload_url, data=data) as response:
+            content = await response.read()
+
+            if response.status not in [200, 201]:
+                raise Exception(f"Upload failed: {response.status}, {content.decode()}")
+
+            return model.AsyncWeedOperationResponse(
+                status_code=response.status,
+                content=content,
+                content_type=response.headers.get('Content-Type', ''),
+                headers=dict(response.headers),
+                fid=fid,
+                url=upload_url,
+                size=len(file_data)
+            )
+
     async def download(self, fid: str, name: str) -> tuple[io.BytesIO, str]:
         try:
             volume_id, file_key = self._parse_fid(fid)
 
-            # Находим volume
-            lookup_result = await self._lookup_volume(volume_id)
-            if 'locations' not in lookup_result or not lookup_result['locations']:
-                raise Exception(f"Volume {volume_id} not found")
-
-            volume_server = lookup_result['locations'][0]['url']
-            download_url = f"http://{volume_server}/{fid}"
-
+            download_path = fid
             if name:
-                download_url += f"?filename={name}"
-
-            session = await self._get_session()
+                download_path += f"?filename={name}"
 
             # Скачиваем файл
-            async with session.get(download_url) as response:
+            async with await self._get_from_replicas(volume_id, download_path) as response:
                 if response.status != 200:
                     raise Exception(f"Download failed: {response.status}")
 
@@ -115,16 +341,88 @@ class AsyncWeed(interface.IStorage):
         except Exception as e:
             raise Exception(f"Failed to download file: {str(e)}")
 
-    async def delete(self, fid: str, name: str) -> model.AsyncWeedOperationResponse:
+    async def download_stream(
+            self,
+            fid: str,
+            name: str,
+            byte_range: str = None,
+            if_none_match: str = None
+    ) -> model.StorageStream:
+        """Скачать файл потоком: тело ответа volume-сервера отдаётся чанками без буферизации целиком"""
+        etag = fid_etag(fid)
+        if if_none_match and etag_matches(if_none_match, etag):
+            return model.StorageStream(
+                content_type='',
+                content_length=None,
+                chunks=self._empty_chunks(),
+                release=lambda: None,
+                status_code=304,
+                etag=etag
+            )
+
         try:
             volume_id, file_key = self._parse_fid(fid)
 
-            # Находим volume
-            lookup_result = await self._lookup_volume(volume_id)
-            if 'locations' not in lookup_result or not lookup_result['locations']:
-                raise Exception(f"Volume {volume_id} not found")
+            download_path = fid
+            if name:
+                download_path += f"?filename={name}"
+
+            # Диапазон запрашивается у volume-сервера, а не вырезается из полного тела
+            headers = {'Range': byte_range} if byte_range else None
+            response = await self._get_from_replicas(
+                volume_id,
+                download_path,
+                headers=headers,
+                timeout=self.stream_timeout
+            )
+
+            if response.status == 416:
+                response.release()
+                return model.StorageStream(
+                    content_type='',
+                    content_length=None,
+                    chunks=self._empty_chunks(),
+                    release=lambda: None,
+                    status_code=416,
+                    etag=etag,
+                    content_range=response.headers.get('Content-Range')
+                )
 
-            volume_server = lookup_result['locations'][0]['url']
+            if response.status not in [200, 206]:
+                response.release()
+                raise Exception(f"Download failed: {response.status}")
+
+            return model.StorageStream(
+                content_type=response.headers.get('Content-Type', 'application/octet-stream'),
+                content_length=response.content_length,
+                chunks=self._iter_response(response),
+                release=response.release,
+                status_code=response.status,
+                etag=etag,
+                content_range=response.headers.get('Content-Range')
+            )
+
+        except Exception as e:
+            raise Exception(f"Failed to download file: {str(e)}")
+
+    @staticmethod
+    async def _empty_chunks() -> AsyncIterator[bytes]:
+        return
+        yield
+
+    async def _iter_response(self, response: aiohttp.ClientResponse) -> AsyncIterator[bytes]:
+        try:
+            async for chunk in response.content.iter_chunked(self.stream_chunk_size):
+                yield chunk
+        finally:
+            response.release()
+
+    async def delete(self, fid: str, name: str) -> model.AsyncWeedOperationResponse:
+        try:
+            volume_id, file_key = self._parse_fid(fid)
+
+            # Запись на любую реплику volume-сервер распространяет на остальные
+            volume_server = (await self._volume_urls(volume_id))[0]
             delete_url = f"http://{volume_server}/{fid}"
 
             if name:
@@ -147,6 +445,11 @@ class AsyncWeed(interface.IStorage):
                     fid=fid
                 )
 
+        except aiohttp.ClientConnectionError as e:
+            # Volume-сервер недоступен — при следующем обращении расположение запросится заново
+            self._invalidate_volume(volume_id)
+            raise Exception(f"Failed to delete file: {str(e)}")
+
         except Exception as e:
             raise Exception(f"Failed to delete file: {str(e)}")
 
@@ -155,12 +458,8 @@ class AsyncWeed(interface.IStorage):
         try:
             volume_id, file_key = self._parse_fid(fid)
 
-            # Находим volume
-            lookup_result = await self._lookup_volume(volume_id)
-            if 'locations' not in lookup_result or not lookup_result['locations']:
-                raise Exception(f"Volume {volume_id} not found")
-
-            volume_server = lookup_result['locations'][0]['url']
+            # Запись на любую реплику volume-сервер распространяет на остальные
+            volume_server = (await self._volume_urls(volume_id))[0]
             update_url = f"http://{volume_server}/{fid}"
 
             # Подготавливаем данные для обновления
@@ -190,6 +489,11 @@ class AsyncWeed(interface.IStorage):
                     size=len(file_data)
                 )
 
+        except aiohttp.ClientConnectionError as e:
+            # Volume-сервер недоступен — при следующем обращении расположение запросится заново
+            self._invalidate_volume(volume_id)
+            raise Exception(f"Failed to update file: {str(e)}")
+
         except Exception as e:
             raise Exception(f"Failed to update file: {str(e)}")
 
@@ -226,3 +530,48 @@ class AsyncWeed(interface.IStorage):
                 # Event loop не найден или не запущен
                 pass
 
+
+class _ChunkedSource:
+    """Источник байтов, из которого последовательно забираются части не длиннее заданного размера"""
+
+    def __init__(self, source: AsyncIterator[bytes] | BinaryIO, read_size: int):
+        self._iterator = self._iterate(source, read_size)
+        self._pending = b""
+        self.taken = 0
+
+    async def take(self, limit: int) -> AsyncIterator[bytes]:
+        self.taken = 0
+        while self.taken < limit:
+            piece = self._pending or await anext(self._iterator, b"")
+            self._pending = b""
+            if not piece:
+                return
+
+            rest = limit - self.taken
+            if len(piece) > rest:
+                piece, self._pending = piece[:rest], piece[rest:]
+
+            self.taken += len(piece)
+            yield piece
+
+    async def exhausted(self) -> bool:
+        if not self._pending:
+            self._pending = await anext(self._iterator, b"")
+        return not self._pending
+
+    @staticmethod
+    async def _iterate(source: AsyncIterator[bytes] | BinaryIO, read_size: int) -> AsyncIterator[bytes]:
+        if hasattr(source, '__aiter__'):
+            async for piece in source:
+                if piece:
+                    yield piece
+            return
+
+        # Файловый объект: синхронный (open, BytesIO) или асинхронный (UploadFile)
+        while True:
+            piece = source.read(read_size)
+            if asyncio.iscoroutine(piece):
+                piece = await piece
+            if not piece:
+                return
+            yield piece
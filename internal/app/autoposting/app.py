@@ -1,9 +1,15 @@
 import asyncio
 import random
+import time
 import traceback
+from collections import defaultdict
 from datetime import datetime, timedelta
 
 from internal import interface, model
+from internal.app.autoposting.channel_cache import ChannelPostCache
+from internal.app.autoposting.jobs import AutopostingJobs
+from internal.app.autoposting.prefilter import PostPrefilter
+from internal.app.autoposting.scheduler import AutopostingScheduler
 
 
 class Autoposting:
@@ -14,54 +20,173 @@ class Autoposting:
         telegram_client: interface.ITelegramClient,
         openai_client: interface.IOpenAIClient,
         prompt_generator: interface.IPublicationPromptGenerator,
-        loom_employee_client: interface.ILoomEmployeeClient,
+        autoposting_jobs: AutopostingJobs,
+        post_prefilter: PostPrefilter,
+        channel_post_cache: ChannelPostCache,
+        max_workers: int = 10,
+        max_workers_per_organization: int = 2,
+        autoposting_timeout: int = 15 * 60,
+        worker_id: str = "autoposting",
+        sync_interval: int = 10,
+        filter_batch_size: int = 20,
+        filter_batch_token_budget: int = 8000,
     ):
         self.tel = tel
         self.logger = tel.logger()
+        self.meter = tel.meter()
         self.publication_service = publication_service
         self.telegram_client = telegram_client
         self.openai_client = openai_client
         self.prompt_generator = prompt_generator
-        self.loom_employee_client = loom_employee_client
+        self.autoposting_jobs = autoposting_jobs
+        self.post_prefilter = post_prefilter
+        self.channel_post_cache = channel_post_cache
+
+        # Пул обработчиков: общий лимит и лимит на организацию
+        self.max_workers = max_workers
+        self.max_workers_per_organization = max_workers_per_organization
+        self.autoposting_timeout = autoposting_timeout
+        # Аренда строки автопостинга, чтобы несколько реплик не обработали её одновременно
+        self.worker_id = worker_id
+        self.lease_seconds = autoposting_timeout + 60
+        self.workers_semaphore = asyncio.Semaphore(max_workers)
+        self.organization_semaphores: dict[int, asyncio.Semaphore] = defaultdict(
+            lambda: asyncio.Semaphore(self.max_workers_per_organization)
+        )
+        self.queue_depth = 0
+
+        # Планировщик по времени следующего запуска вместо ежеминутного опроса всей таблицы
+        self.sync_interval = sync_interval
+        self.scheduler = AutopostingScheduler(tel, publication_service)
+        self.running_tasks: set[asyncio.Task] = set()
+
+        # Пакетная фильтрация постов: лимит постов и примерный бюджет токенов на один запрос
+        self.filter_batch_size = filter_batch_size
+        self.filter_batch_token_budget = filter_batch_token_budget
+
+        self.queue_depth_gauge = self.meter.create_up_down_counter(
+            "autoposting.queue.depth",
+            description="Количество автопостингов, ожидающих свободного обработчика",
+        )
+        self.autoposting_duration_histogram = self.meter.create_histogram(
+            "autoposting.task.duration",
+            unit="s",
+            description="Длительность обработки одного автопостинга",
+        )
 
     async def run(self):
         self.logger.info("Сервис автопостинга запущен")
 
         while True:
             try:
-                await self._process_iteration()
-                await self._sleep_until_next_iteration()
+                await self.scheduler.sync()
+                self._dispatch_due_autopostings()
+                await self.scheduler.wait_next_due(self.sync_interval)
             except Exception as err:
                 await self._handle_critical_error(err)
 
-    async def _process_iteration(self):
-        self.logger.info("Начата новая итерация автопостинга")
-
-        active_autopostings = await self._get_active_autopostings()
+    def _dispatch_due_autopostings(self):
+        due_autopostings = self.scheduler.pop_due(datetime.now())
 
-        if not active_autopostings:
-            self.logger.info("Нет автопостингов для обработки")
+        if not due_autopostings:
             return
 
-        for autoposting in active_autopostings:
-            await self._process_autoposting(autoposting)
+        self.logger.info(
+            f"Автопостингов к запуску: {len(due_autopostings)}, обработчиков: {self.max_workers}"
+        )
+        for autoposting in due_autopostings:
+            task = asyncio.create_task(self._run_scheduled_autoposting(autoposting))
+            self.running_tasks.add(task)
+            task.add_done_callback(self.running_tasks.discard)
 
-        self.logger.info(f"Итерация завершена, обработано автопостингов: {len(active_autopostings)}")
+    async def _run_scheduled_autoposting(self, autoposting: model.Autoposting):
+        succeeded = False
+        try:
+            succeeded = await self._run_autoposting_task(autoposting)
+        except Exception as err:
+            self.logger.error(f"Ошибка при запуске автопостинга {autoposting.id}: {err}")
+        finally:
+            self.scheduler.complete(autoposting.id, succeeded)
 
-    async def _get_active_autopostings(self) -> list:
-        all_autopostings = await self.publication_service.get_all_autopostings()
+    async def _run_autoposting_task(self, autoposting: model.Autoposting) -> bool:
+        organization_semaphore = self.organization_semaphores[autoposting.organization_id]
 
-        now = datetime.now()
-        active_autopostings = []
+        self._change_queue_depth(1)
+        try:
+            await organization_semaphore.acquire()
+            try:
+                await self.workers_semaphore.acquire()
+            except BaseException:
+                organization_semaphore.release()
+                raise
+        finally:
+            self._change_queue_depth(-1)
 
-        for autoposting in all_autopostings:
-            if not autoposting.enabled:
-                continue
+        try:
+            # Захватываем аренду только со свободным обработчиком, чтобы она не истекала в очереди
+            claimed_autoposting = await self._claim_autoposting(autoposting.id)
+            if claimed_autoposting is None:
+                return False
 
-            if self._should_process_autoposting(autoposting, now):
-                active_autopostings.append(autoposting)
+            task_start = time.monotonic()
+            succeeded = False
+            try:
+                succeeded = await asyncio.wait_for(
+                    self._process_autoposting(claimed_autoposting),
+                    timeout=self.autoposting_timeout
+                )
+                return succeeded
+            except asyncio.TimeoutError:
+                self.logger.error(
+                    f"Превышено время обработки автопостинга {autoposting.id}: {self.autoposting_timeout}с"
+                )
+                return False
+            except Exception as task_err:
+                self.logger.error(f"Ошибка в обработчике автопостинга {autoposting.id}: {task_err}")
+                return False
+            finally:
+                self.autoposting_duration_histogram.record(time.monotonic() - task_start)
+                await self._release_autoposting(autoposting.id, succeeded)
+        finally:
+            self.workers_semaphore.release()
+            organization_semaphore.release()
+
+    async def _claim_autoposting(self, autoposting_id: int) -> model.Autoposting | None:
+        autoposting = await self.publication_service.claim_autoposting(
+            autoposting_id=autoposting_id,
+            lease_owner=self.worker_id,
+            lease_seconds=self.lease_seconds
+        )
+        if autoposting is not None:
+            return autoposting
+
+        # Не захватили: запись удалили, выключили, уже обработали или её держит другая реплика
+        autopostings = await self.publication_service.get_autoposting_by_id(autoposting_id)
+        if not autopostings or not autopostings[0].enabled:
+            self.logger.info(f"Автопостинг {autoposting_id} удален или выключен, снят с расписания")
+            self.scheduler.remove(autoposting_id)
+            return None
+
+        if not self._should_process_autoposting(autopostings[0], datetime.now()):
+            self.scheduler.reschedule(autopostings[0])
+            return None
 
-        return active_autopostings
+        self.logger.info(f"Автопостинг {autoposting_id} обрабатывается другим обработчиком")
+        return None
+
+    async def _release_autoposting(self, autoposting_id: int, succeeded: bool):
+        try:
+            await self.publication_service.release_autoposting(
+                autoposting_id=autoposting_id,
+                lease_owner=self.worker_id,
+                last_active=datetime.now() if succeeded else None
+            )
+        except Exception as release_err:
+            self.logger.error(f"Ошибка при освобождении автопостинга {autoposting_id}: {release_err}")
+
+    def _change_queue_depth(self, delta: int):
+        self.queue_depth += delta
+        self.queue_depth_gauge.add(delta)
 
     def _should_process_autoposting(self, autoposting: model.Autoposting, now: datetime) -> bool:
         if autoposting.last_active is None:
@@ -72,7 +197,7 @@ class Autoposting:
 
         return time_since_last_active >= period
 
-    async def _process_autoposting(self, autoposting: model.Autoposting):
+    async def _process_autoposting(self, autoposting: model.Autoposting) -> bool:
         try:
             self.logger.info(f"Обработка автопостинга {autoposting.id}, организация {autoposting.organization_id}, каналов {len(autoposting.tg_channels)}")
 
@@ -87,19 +212,36 @@ class Autoposting:
             self.logger.info(f"Найдено подходящих постов: {len(suitable_posts)}")
 
             await self._process_suitable_posts(autoposting, suitable_posts)
-            await self._update_last_active(autoposting.id)
+            await self._prune_viewed_posts(autoposting)
+            return True
 
         except Exception as autoposting_err:
             self.logger.error(f"Ошибка при обработке автопостинга {autoposting.id}: {autoposting_err}")
+            return False
 
     async def _process_channel(self, autoposting: model.Autoposting, channel_username: str) -> list[dict]:
         try:
-            posts = await self._fetch_channel_posts(channel_username)
+            watermark = await self.publication_service.get_telegram_channel_watermark(
+                autoposting_id=autoposting.id,
+                tg_channel_username=channel_username
+            )
+            posts = await self._fetch_channel_posts(channel_username, watermark)
             recent_posts = self._filter_posts_by_time(posts, autoposting.period_in_hours)
-            self.logger.info(f"Канал {channel_username}: постов за {autoposting.period_in_hours}ч - {len(recent_posts)}")
+            self.logger.info(
+                f"Канал {channel_username}: новых постов {len(posts)}, "
+                f"за {autoposting.period_in_hours * 3}ч - {len(recent_posts)}"
+            )
 
-            viewed_post_links = await self._get_viewed_post_links(autoposting.id, channel_username)
-            suitable_posts = await self._process_posts(autoposting, channel_username, recent_posts, viewed_post_links)
+            viewed_post_links = await self._get_viewed_post_links(
+                autoposting.id, channel_username, [post['link'] for post in recent_posts]
+            )
+            suitable_posts, decided_links = await self._process_posts(
+                autoposting, channel_username, recent_posts, viewed_post_links
+            )
+
+            await self._advance_channel_watermark(
+                autoposting.id, channel_username, watermark, posts, recent_posts, decided_links
+            )
 
             return suitable_posts
 
@@ -107,10 +249,37 @@ class Autoposting:
             self.logger.error(f"Ошибка при обработке канала {channel_username}: {channel_err}")
             return []
 
-    async def _fetch_channel_posts(self, channel_username: str) -> list[dict]:
-        posts = await self.telegram_client.get_channel_posts(channel_id=channel_username, limit=100)
+    async def _fetch_channel_posts(self, channel_username: str, min_id: int) -> list[dict]:
+        posts = await self.channel_post_cache.get_posts(channel_username, min_id=min_id, limit=100)
         return posts
 
+    async def _advance_channel_watermark(
+        self,
+        autoposting_id: int,
+        channel_username: str,
+        watermark: int,
+        posts: list[dict],
+        recent_posts: list[dict],
+        decided_links: set[str],
+    ):
+        # Метка сдвигается только по непрерывному префиксу решённых постов:
+        # всё, что не старше неё, больше никогда не нужно перечитывать
+        recent_post_ids = {post['id'] for post in recent_posts}
+        new_watermark = watermark
+
+        for post in sorted(posts, key=lambda post: post['id']):
+            # Посты старше окна фильтра по времени уже не станут кандидатами
+            if post['id'] in recent_post_ids and post['link'] not in decided_links:
+                break
+            new_watermark = post['id']
+
+        if new_watermark > watermark:
+            await self.publication_service.update_telegram_channel_watermark(
+                autoposting_id=autoposting_id,
+                tg_channel_username=channel_username,
+                last_message_id=new_watermark
+            )
+
     def _filter_posts_by_time(self, posts: list[dict], period_hours: int) -> list[dict]:
         now = datetime.now()
         period_start = now - timedelta(hours=period_hours*3)
@@ -129,59 +298,190 @@ class Autoposting:
 
         return recent_posts
 
-    async def _get_viewed_post_links(self, autoposting_id: int, channel_username: str) -> list[str]:
-        viewed_posts = await self.publication_service.get_viewed_telegram_post(
+    async def _get_viewed_post_links(self, autoposting_id: int, channel_username: str, links: list[str]) -> set[str]:
+        viewed_post_links = await self.publication_service.get_viewed_telegram_post_links(
             autoposting_id=autoposting_id,
-            tg_channel_username=channel_username
+            tg_channel_username=channel_username,
+            links=links
         )
-        return [vp.link for vp in viewed_posts]
+        return viewed_post_links
 
     async def _process_posts(
         self,
         autoposting,
         channel_username: str,
         recent_posts: list[dict],
-        viewed_post_links: list[str],
-    ) -> list[dict]:
+        viewed_post_links: set[str],
+    ) -> tuple[list[dict], set[str]]:
 
-        suitable_posts = []
-        processed_count = 0
+        # Ссылки постов, по которым уже есть окончательное решение
+        decided_links = set()
 
+        candidate_posts = []
         for post in recent_posts:
-            try:
-                post_text = post['text']
-                post_date = post['date']
-                post_link = post['link']
+            post_text = post['text']
 
-                if not post_text or not post_text.strip():
-                    continue
+            if not post_text or not post_text.strip():
+                decided_links.add(post['link'])
+                continue
 
-                if post_link in viewed_post_links:
-                    continue
+            if post['link'] in viewed_post_links:
+                decided_links.add(post['link'])
+                continue
+
+            candidate_posts.append(post)
 
-                processed_count += 1
-                is_suitable, reason = await self._filter_post_with_ai(autoposting.filter_prompt, post_text)
+        # Дешёвый локальный отсев до платных вызовов LLM
+        candidate_posts, rejected_posts = self.post_prefilter.apply(autoposting.filter_prompt, candidate_posts)
+        rejected_links = [post['link'] for post in rejected_posts]
+        if await self._mark_posts_as_viewed(autoposting.id, channel_username, rejected_links):
+            decided_links.update(rejected_links)
 
+        suitable_posts = []
+        processed_count = 0
+
+        for batch in self._split_filter_batches(candidate_posts):
+            verdicts = await self._filter_posts_with_ai(autoposting.filter_prompt, batch)
+            processed_count += len(batch)
+
+            unsuitable_links = []
+            for post, verdict in zip(batch, verdicts):
+                if verdict is None:
+                    continue
+
+                is_suitable, reason = verdict
                 if is_suitable:
+                    # Берём первый подходящий пост, остальные подходящие остаются непросмотренными
+                    if suitable_posts:
+                        continue
+
                     self.logger.info(f"Пост подходит: {reason}")
                     suitable_posts.append({
-                        "text": post_text,
+                        "text": post['text'],
                         "channel_username": channel_username,
                         "link": post.get("link", ""),
-                        "date": post_date,
+                        "date": post['date'],
                     })
-                    if len(suitable_posts) == 1:
-                        break
                 else:
-                    await self._mark_post_as_viewed(autoposting.id, channel_username, post_link)
+                    unsuitable_links.append(post['link'])
 
+            if await self._mark_posts_as_viewed(autoposting.id, channel_username, unsuitable_links):
+                decided_links.update(unsuitable_links)
+
+            if suitable_posts:
+                break
+
+        self.logger.info(f"Обработано постов: {processed_count}, отобрано: {len(suitable_posts)}")
+
+        return suitable_posts, decided_links
+
+    def _split_filter_batches(self, posts: list[dict]) -> list[list[dict]]:
+        batches = []
+        batch = []
+        batch_tokens = 0
+
+        for post in posts:
+            post_tokens = self._estimate_tokens(post['text'])
+
+            if batch and (
+                    len(batch) >= self.filter_batch_size
+                    or batch_tokens + post_tokens > self.filter_batch_token_budget
+            ):
+                batches.append(batch)
+                batch = []
+                batch_tokens = 0
+
+            batch.append(post)
+            batch_tokens += post_tokens
+
+        if batch:
+            batches.append(batch)
+
+        return batches
+
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        # Грубая оценка: ~3 символа на токен для кириллицы плюс служебная разметка поста
+        return len(text) // 3 + 20
+
+    async def _filter_posts_with_ai(
+        self,
+        filter_prompt: str,
+        posts: list[dict]
+    ) -> list[tuple[bool, str] | None]:
+        verdicts: list[tuple[bool, str] | None] = [None] * len(posts)
+
+        if len(posts) > 1:
+            try:
+                filter_system_prompt = await self.prompt_generator.get_filter_posts_batch_system_prompt(
+                    filter_prompt=filter_prompt,
+                    posts_text=[post['text'] for post in posts]
+                )
+
+                filter_result, _ = await self.openai_client.generate_json(
+                    history=[{"role": "user", "content": "Проанализируй эти посты"}],
+                    system_prompt=filter_system_prompt,
+                    temperature=1,
+                    llm_model="gpt-5",
+                )
+
+                verdicts = self._parse_batch_verdicts(filter_result, len(posts))
+            except Exception as batch_err:
+                self.logger.warning(f"Не удалось отфильтровать пакет из {len(posts)} постов: {batch_err}")
+
+        missing_indexes = [index for index, verdict in enumerate(verdicts) if verdict is None]
+        if len(posts) > 1 and missing_indexes:
+            self.logger.warning(f"Нет вердикта для {len(missing_indexes)} постов пакета, проверяем по одному")
+
+        for index in missing_indexes:
+            try:
+                verdicts[index] = await self._filter_post_with_ai(filter_prompt, posts[index]['text'])
             except Exception as post_err:
                 self.logger.error(f"Ошибка при обработке поста: {post_err}")
+
+        return verdicts
+
+    @staticmethod
+    def _parse_batch_verdicts(filter_result: dict, posts_count: int) -> list[tuple[bool, str] | None]:
+        results = filter_result.get("results")
+        if not isinstance(results, list):
+            raise ValueError("в ответе нет списка results")
+
+        verdicts: list[tuple[bool, str] | None] = [None] * posts_count
+        for result in results:
+            if not isinstance(result, dict):
                 continue
 
-        self.logger.info(f"Обработано постов: {processed_count}, отобрано: {len(suitable_posts)}")
+            index = result.get("index")
+            is_suitable = result.get("is_suitable")
+            if not isinstance(index, int) or not 0 <= index < posts_count or not isinstance(is_suitable, bool):
+                continue
+
+            verdicts[index] = (is_suitable, result.get("reason", "не указана"))
 
-        return suitable_posts
+        return verdicts
+
+    async def _mark_posts_as_viewed(self, autoposting_id: int, channel_username: str, links: list[str]) -> bool:
+        try:
+            await self.publication_service.create_viewed_telegram_posts(
+                autoposting_id=autoposting_id,
+                tg_channel_username=channel_username,
+                links=links
+            )
+            return True
+        except Exception as post_err:
+            self.logger.error(f"Ошибка при сохранении просмотренных постов: {post_err}")
+            return False
+
+    async def _prune_viewed_posts(self, autoposting: model.Autoposting):
+        # Посты старше окна фильтра по времени больше не попадают в кандидаты
+        try:
+            await self.publication_service.delete_expired_viewed_telegram_posts(
+                autoposting_id=autoposting.id,
+                created_before=datetime.now() - timedelta(hours=autoposting.period_in_hours * 3)
+            )
+        except Exception as prune_err:
+            self.logger.error(f"Ошибка при очистке просмотренных постов автопостинга {autoposting.id}: {prune_err}")
 
     async def _mark_post_as_viewed(self, autoposting_id: int, channel_username: str, link: str):
         await self.publication_service.create_viewed_telegram_post(
@@ -214,62 +514,12 @@ class Autoposting:
 
         selected_post = random.choice(suitable_posts)
         self.logger.info(f"Выбран пост для публикации: {selected_post['link']}")
-        await self._mark_post_as_viewed(autoposting.id, selected_post['channel_username'], selected_post['link'])
-
-        try:
-            publication_data = await self.publication_service.generate_autoposting_publication_text(
-                autoposting_category_id=autoposting.autoposting_category_id,
-                source_post_text=selected_post['text']
-            )
 
-            image_url = None
-            if autoposting.need_image:
-                images_url = await self.publication_service.generate_autoposting_publication_image(
-                    autoposting_category_id=autoposting.autoposting_category_id,
-                    publication_text=publication_data['text']
-                )
-                image_url = images_url[0]
-
-            employees = await self.loom_employee_client.get_employees_by_organization(autoposting.organization_id)
-            moderators = [employee for employee in employees if employee.role == "moderator"]
-
-            publication_id = await self.publication_service.create_publication(
-                organization_id=autoposting.organization_id,
-                category_id=autoposting.autoposting_category_id,
-                creator_id=0,
-                text_reference=selected_post['text'],
-                text=publication_data['text'],
-                moderation_status="moderation",
-                image_url=image_url
-            )
-
-            await self.publication_service.change_publication(
-                publication_id=publication_id,
-                tg_source=True
-            )
-
-            if not moderators:
-                await self.publication_service.moderate_publication(
-                    publication_id=publication_id,
-                    moderator_id=0,
-                    moderation_status="approved",
-                    moderation_comment=""
-                )
-
-            self.logger.info(f"Публикация создана: {publication_id}")
-
-        except Exception as gen_err:
-            self.logger.error(f"Ошибка при генерации публикации: {gen_err}")
-            self.logger.error(traceback.format_exc())
-
-    async def _update_last_active(self, autoposting_id: int):
-        await self.publication_service.update_autoposting(
-            autoposting_id=autoposting_id,
-            last_active=datetime.now()
-        )
+        # Сначала ставим задачу, потом помечаем пост: при сбое пост будет выбран снова
+        job_id = await self.autoposting_jobs.enqueue_publication(autoposting, selected_post)
+        await self._mark_post_as_viewed(autoposting.id, selected_post['channel_username'], selected_post['link'])
 
-    async def _sleep_until_next_iteration(self):
-        await asyncio.sleep(1 * 60)
+        self.logger.info(f"Поставлена задача генерации публикации: {job_id}")
 
     async def _handle_critical_error(self, err: Exception):
         self.logger.error(f"Критическая ошибка в главном цикле: {err}")
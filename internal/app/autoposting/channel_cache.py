@@ -0,0 +1,118 @@
+import asyncio
+import time
+from dataclasses import dataclass
+
+from internal import interface
+
+
+@dataclass
+class _ChannelWindow:
+    # Последние посты канала, от новых к старым
+    posts: list[dict]
+    expires_at: float
+    last_access: float
+
+
+class ChannelPostCache:
+    """
+    Общий кеш постов Telegram-каналов для всех автопостингов.
+
+    Для каждого канала хранится скользящее окно последних window_size постов.
+    После истечения ttl окно дочитывается только новыми сообщениями (min_id),
+    одновременные запросы одного канала ждут одно и то же обновление.
+    Возвращаемые посты общие — вызывающий код не должен их изменять.
+    """
+
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            telegram_client: interface.ITelegramClient,
+            ttl: int = 120,
+            window_size: int = 100,
+            idle_ttl: int = 24 * 60 * 60,
+    ):
+        self.logger = tel.logger()
+        self.meter = tel.meter()
+        self.telegram_client = telegram_client
+        self.ttl = ttl
+        self.window_size = window_size
+        self.idle_ttl = idle_ttl
+
+        self._windows: dict[str, _ChannelWindow] = {}
+        self._in_flight: dict[str, asyncio.Future] = {}
+
+        self.requests_counter = self.meter.create_counter(
+            "autoposting.channel_cache.requests",
+            description="Запросы постов канала по результату: hit, miss, incremental, coalesced",
+        )
+        self.fetched_posts_counter = self.meter.create_counter(
+            "autoposting.channel_cache.fetched_posts",
+            description="Количество постов, полученных из Telegram",
+        )
+
+    async def get_posts(self, channel_username: str, min_id: int = 0, limit: int = None) -> list[dict]:
+        key = channel_username.lstrip("@").lower()
+        limit = limit or self.window_size
+        now = time.monotonic()
+
+        window = self._windows.get(key)
+        if window is not None and window.expires_at > now:
+            self.requests_counter.add(1, {"result": "hit"})
+        else:
+            future = self._in_flight.get(key)
+            if future is None:
+                self.requests_counter.add(1, {"result": "incremental" if window is not None else "miss"})
+                future = asyncio.ensure_future(self._refresh(key, channel_username))
+                self._in_flight[key] = future
+                future.add_done_callback(lambda done: self._forget_in_flight(key, done))
+            else:
+                self.requests_counter.add(1, {"result": "coalesced"})
+
+            # shield: отмена одного ожидающего не должна отменять общий запрос
+            window = await asyncio.shield(future)
+
+        window.last_access = now
+        return [post for post in window.posts if post['id'] > min_id][:limit]
+
+    def invalidate(self, channel_username: str):
+        self._windows.pop(channel_username.lstrip("@").lower(), None)
+
+    async def _refresh(self, key: str, channel_username: str) -> _ChannelWindow:
+        window = self._windows.get(key)
+        newest_id = window.posts[0]['id'] if window is not None and window.posts else 0
+
+        new_posts = []
+        async for post in self.telegram_client.iter_channel_posts(
+                channel_username,
+                min_id=newest_id,
+                limit=self.window_size
+        ):
+            new_posts.append(post)
+        self.fetched_posts_counter.add(len(new_posts))
+
+        # Если новых постов не меньше окна, между ними и старым окном мог остаться разрыв
+        if window is None or len(new_posts) >= self.window_size:
+            posts = new_posts
+        else:
+            posts = (new_posts + window.posts)[:self.window_size]
+
+        now = time.monotonic()
+        self._evict_idle(now)
+
+        window = _ChannelWindow(posts=posts, expires_at=now + self.ttl, last_access=now)
+        self._windows[key] = window
+
+        return window
+
+    def _forget_in_flight(self, key: str, future: asyncio.Future):
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+
+        # Ошибку получат ожидающие; помечаем её полученной, если ждать было некому
+        if not future.cancelled():
+            future.exception()
+
+    def _evict_idle(self, now: float):
+        idle_keys = [key for key, window in self._windows.items() if now - window.last_access > self.idle_ttl]
+        for key in idle_keys:
+            del self._windows[key]
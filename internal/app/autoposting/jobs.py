@@ -0,0 +1,175 @@
+import asyncio
+
+from internal import interface, model
+from internal.app.job_worker.app import JobWorker
+from pkg.trace_wrapper import traced_method
+
+
+class AutopostingJobs:
+    """
+    Этапы генерации публикации автопостинга как задачи очереди jobs.
+
+    Цепочка: текст -> изображение (если нужно) -> создание публикации.
+    Каждый этап ставит следующий с ключом идемпотентности от исходного поста,
+    поэтому повторное выполнение этапа не порождает дублей следующих задач.
+    """
+
+    GENERATE_TEXT = "autoposting.generate_text"
+    GENERATE_IMAGE = "autoposting.generate_image"
+    PUBLISH = "autoposting.publish"
+
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            job_service: interface.IJobService,
+            publication_service: interface.IPublicationService,
+            loom_employee_client: interface.ILoomEmployeeClient,
+    ):
+        self.tracer = tel.tracer()
+        self.logger = tel.logger()
+        self.job_service = job_service
+        self.publication_service = publication_service
+        self.loom_employee_client = loom_employee_client
+
+    def register(self, job_worker: JobWorker):
+        job_worker.register(self.GENERATE_TEXT, self._generate_text_job)
+        job_worker.register(self.GENERATE_IMAGE, self._generate_image_job)
+        job_worker.register(self.PUBLISH, self._publish_job)
+
+    async def enqueue_publication(self, autoposting: model.Autoposting, post: dict) -> int:
+        payload = {
+            "autoposting_id": autoposting.id,
+            "organization_id": autoposting.organization_id,
+            "autoposting_category_id": autoposting.autoposting_category_id,
+            "need_image": autoposting.need_image,
+            "channel_username": post['channel_username'],
+            "source_link": post['link'],
+            "source_post_text": post['text'],
+        }
+
+        job_id = await self.job_service.enqueue_job(
+            job_type=self.GENERATE_TEXT,
+            idempotency_key=self._idempotency_key(payload, "text"),
+            payload=payload,
+        )
+        return job_id
+
+    async def _generate_text_job(self, job: model.Job) -> dict:
+        payload = job.payload
+        # Модераторов ищем, пока работает LLM; этапу публикации передаётся только факт их наличия
+        publication_text, moderators = await asyncio.gather(
+            self._generate_publication_text(
+                payload["autoposting_category_id"],
+                payload["source_post_text"]
+            ),
+            self._get_moderators(payload["organization_id"]),
+        )
+
+        next_payload = {**payload, "text": publication_text, "has_moderators": bool(moderators)}
+        if payload["need_image"]:
+            await self.job_service.enqueue_job(
+                job_type=self.GENERATE_IMAGE,
+                idempotency_key=self._idempotency_key(payload, "image"),
+                payload=next_payload,
+            )
+        else:
+            await self.job_service.enqueue_job(
+                job_type=self.PUBLISH,
+                idempotency_key=self._idempotency_key(payload, "publish"),
+                payload=next_payload,
+            )
+
+        return {"text": publication_text}
+
+    async def _generate_image_job(self, job: model.Job) -> dict:
+        payload = job.payload
+        image_url = await self._generate_publication_image(
+            payload["autoposting_category_id"],
+            payload["text"]
+        )
+
+        await self.job_service.enqueue_job(
+            job_type=self.PUBLISH,
+            idempotency_key=self._idempotency_key(payload, "publish"),
+            payload={**payload, "image_url": image_url},
+        )
+
+        return {"image_url": image_url}
+
+    async def _publish_job(self, job: model.Job) -> dict:
+        payload = job.payload
+        progress = dict(job.result or {})
+
+        has_moderators = payload.get("has_moderators")
+        if has_moderators is None:
+            # Задача поставлена до появления has_moderators в payload
+            has_moderators = bool(await self._get_moderators(payload["organization_id"]))
+
+        # Доставка at-least-once: созданная публикация сохраняется в задаче и переиспользуется при повторе
+        publication_id = progress.get("publication_id")
+        if publication_id is None:
+            publication_id = await self._create_publication(payload)
+            progress["publication_id"] = publication_id
+            await self.job_service.save_job_progress(job, progress)
+
+        if not has_moderators and not progress.get("approved"):
+            await self._approve_publication(publication_id)
+            progress["approved"] = True
+            await self.job_service.save_job_progress(job, progress)
+
+        self.logger.info(f"Публикация создана: {publication_id}")
+        return {"publication_id": publication_id}
+
+    @traced_method()
+    async def _generate_publication_text(self, autoposting_category_id: int, source_post_text: str) -> str:
+        publication_data = await self.publication_service.generate_autoposting_publication_text(
+            autoposting_category_id=autoposting_category_id,
+            source_post_text=source_post_text
+        )
+        return publication_data['text']
+
+    @traced_method()
+    async def _generate_publication_image(self, autoposting_category_id: int, publication_text: str) -> str:
+        images_url = await self.publication_service.generate_autoposting_publication_image(
+            autoposting_category_id=autoposting_category_id,
+            publication_text=publication_text
+        )
+        return images_url[0]
+
+    @traced_method()
+    async def _get_moderators(self, organization_id: int) -> list:
+        employees = await self.loom_employee_client.get_employees_by_organization(organization_id)
+        return [employee for employee in employees if employee.role == "moderator"]
+
+    @traced_method()
+    async def _create_publication(self, payload: dict) -> int:
+        publication_id = await self.publication_service.create_publication(
+            organization_id=payload["organization_id"],
+            category_id=payload["autoposting_category_id"],
+            creator_id=0,
+            text_reference=payload["source_post_text"],
+            text=payload["text"],
+            moderation_status="moderation",
+            image_url=payload.get("image_url"),
+            tg_source=True
+        )
+        return publication_id
+
+    @traced_method()
+    async def _approve_publication(self, publication_id: int):
+        # Предыдущая попытка могла упасть уже после отправки поста в Telegram
+        publication = await self.publication_service.get_publication_by_id(publication_id)
+        if publication.tg_link:
+            self.logger.info(f"Публикация {publication_id} уже опубликована, повторно не отправляем")
+            return
+
+        await self.publication_service.moderate_publication(
+            publication_id=publication_id,
+            moderator_id=0,
+            moderation_status="approved",
+            moderation_comment=""
+        )
+
+    @staticmethod
+    def _idempotency_key(payload: dict, stage: str) -> str:
+        return f"autoposting:{payload['autoposting_id']}:{payload['source_link']}:{stage}"
@@ -0,0 +1,225 @@
+import hashlib
+import math
+import re
+from abc import ABC, abstractmethod
+from collections import Counter
+from functools import lru_cache
+
+from internal import interface
+
+WORD_RE = re.compile(r"[^\W\d_]+", re.UNICODE)
+CYRILLIC_RE = re.compile(r"[а-яё]", re.IGNORECASE)
+LATIN_RE = re.compile(r"[a-z]", re.IGNORECASE)
+
+# Маркеры в filter_prompt, после которых через запятую перечислены исключаемые темы
+EXCLUDE_MARKERS_RE = re.compile(
+    r"(?:стоп-слова|исключ\w*|не\s+бер\w*|не\s+подход\w*|игнорир\w*|запрещ\w*)\s*:\s*(.+)",
+    re.IGNORECASE,
+)
+
+AD_MARKERS_RE = re.compile(
+    r"#реклама|#ad\b|#promo\b|\berid\s*[:=]|на\s+правах\s+рекламы|реклама\.\s|промокод|partner\s+content",
+    re.IGNORECASE,
+)
+
+
+class PrefilterStage(ABC):
+    name: str
+
+    @abstractmethod
+    def check(self, post: dict, filter_prompt: str) -> bool:
+        """Возвращает True, если пост проходит стадию"""
+
+
+class LengthStage(PrefilterStage):
+    name = "length"
+
+    def __init__(self, min_length: int):
+        self.min_length = min_length
+
+    def check(self, post: dict, filter_prompt: str) -> bool:
+        return len(post['text'].strip()) >= self.min_length
+
+
+class LanguageStage(PrefilterStage):
+    name = "language"
+
+    def __init__(self, allowed_scripts: list[str], min_letters_ratio: float = 0.3):
+        self.allowed_scripts = set(allowed_scripts)
+        self.min_letters_ratio = min_letters_ratio
+
+    def check(self, post: dict, filter_prompt: str) -> bool:
+        text = post['text']
+        letters = sum(1 for char in text if char.isalpha())
+
+        # Посты из эмодзи, ссылок и цифр не несут текста для рерайта
+        if letters < len(text.strip()) * self.min_letters_ratio:
+            return False
+
+        if not self.allowed_scripts:
+            return True
+
+        cyrillic = len(CYRILLIC_RE.findall(text))
+        latin = len(LATIN_RE.findall(text))
+        script = "cyrillic" if cyrillic >= latin else "latin"
+
+        return script in self.allowed_scripts
+
+
+class KeywordRulesStage(PrefilterStage):
+    """
+    Отсекает посты по явным исключениям из filter_prompt.
+
+    Учитываются только строки вида «Исключить: крипта, ставки» или «Стоп-слова: ...».
+    Термины ищутся как литералы: пользовательские регулярные выражения не выполняются,
+    так как могут быть невалидными после склейки или выполняться катастрофически долго.
+    """
+    name = "keywords"
+
+    def check(self, post: dict, filter_prompt: str) -> bool:
+        rules = self._compile_rules(filter_prompt)
+        if rules is None:
+            return True
+
+        return rules.search(post['text']) is None
+
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _compile_rules(filter_prompt: str) -> re.Pattern | None:
+        patterns = []
+
+        for line in filter_prompt.splitlines():
+            match = EXCLUDE_MARKERS_RE.search(line)
+            if not match:
+                continue
+
+            for term in match.group(1).split(","):
+                term = term.strip().strip(".;")
+                if not term:
+                    continue
+
+                # Не \b: термин может начинаться с пунктуации, например «(скидки»
+                patterns.append(r"(?<!\w)" + re.escape(term))
+
+        if not patterns:
+            return None
+
+        return re.compile("|".join(patterns), re.IGNORECASE)
+
+
+class AdStage(PrefilterStage):
+    name = "ads"
+
+    def __init__(self, reject_forwarded: bool = False):
+        # Репосты по умолчанию уходят в LLM-фильтр, как и остальные посты
+        self.reject_forwarded = reject_forwarded
+
+    def check(self, post: dict, filter_prompt: str) -> bool:
+        if self.reject_forwarded and post.get('forwarded'):
+            return False
+
+        return AD_MARKERS_RE.search(post['text']) is None
+
+
+class SimilarityStage(PrefilterStage):
+    """Косинусная близость поста к filter_prompt на хешированных словах"""
+    name = "similarity"
+
+    def __init__(self, threshold: float, n_features: int = 2 ** 18):
+        self.threshold = threshold
+        self.n_features = n_features
+
+    def check(self, post: dict, filter_prompt: str) -> bool:
+        prompt_vector = self._vectorize(filter_prompt)
+        post_vector = self._vectorize(post['text'])
+
+        return self._cosine(prompt_vector, post_vector) >= self.threshold
+
+    @lru_cache(maxsize=1024)
+    def _vectorize(self, text: str) -> dict[int, float]:
+        # Стемминг обрезанием: первые 5 букв слова достаточно устойчивы к окончаниям
+        tokens = [word[:5] for word in WORD_RE.findall(text.lower()) if len(word) > 2]
+        counts = Counter(
+            int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "big") % self.n_features
+            for token in tokens
+        )
+
+        return {feature: 1 + math.log(count) for feature, count in counts.items()}
+
+    @staticmethod
+    def _cosine(left: dict[int, float], right: dict[int, float]) -> float:
+        if not left or not right:
+            return 0.0
+
+        if len(left) > len(right):
+            left, right = right, left
+
+        dot = sum(weight * right.get(feature, 0.0) for feature, weight in left.items())
+        left_norm = math.sqrt(sum(weight * weight for weight in left.values()))
+        right_norm = math.sqrt(sum(weight * weight for weight in right.values()))
+
+        return dot / (left_norm * right_norm)
+
+
+class PostPrefilter:
+    def __init__(self, tel: interface.ITelemetry, stages: list[PrefilterStage]):
+        self.logger = tel.logger()
+        self.meter = tel.meter()
+        self.stages = stages
+
+        self.checked_counter = self.meter.create_counter(
+            "autoposting.prefilter.checked",
+            description="Количество постов, проверенных стадией предфильтра",
+        )
+        self.rejected_counter = self.meter.create_counter(
+            "autoposting.prefilter.rejected",
+            description="Количество постов, отсеянных стадией предфильтра",
+        )
+
+    def apply(self, filter_prompt: str, posts: list[dict]) -> tuple[list[dict], list[dict]]:
+        passed_posts = []
+        rejected_posts = []
+        rejected_by_stage = Counter()
+
+        for post in posts:
+            rejected_stage = None
+
+            for stage in self.stages:
+                self.checked_counter.add(1, {"stage": stage.name})
+                if not stage.check(post, filter_prompt):
+                    rejected_stage = stage.name
+                    break
+
+            if rejected_stage is None:
+                passed_posts.append(post)
+            else:
+                rejected_posts.append(post)
+                rejected_by_stage[rejected_stage] += 1
+                self.rejected_counter.add(1, {"stage": rejected_stage})
+
+        if rejected_posts:
+            self.logger.info(
+                f"Предфильтр отсеял {len(rejected_posts)} из {len(posts)} постов: {dict(rejected_by_stage)}"
+            )
+
+        return passed_posts, rejected_posts
+
+
+def new_post_prefilter(
+        tel: interface.ITelemetry,
+        min_length: int,
+        allowed_scripts: list[str],
+        similarity_threshold: float,
+        reject_forwarded: bool = False,
+) -> PostPrefilter:
+    stages: list[PrefilterStage] = [
+        LengthStage(min_length),
+        LanguageStage(allowed_scripts),
+        KeywordRulesStage(),
+        AdStage(reject_forwarded),
+    ]
+
+    if similarity_threshold > 0:
+        stages.append(SimilarityStage(similarity_threshold))
+
+    return PostPrefilter(tel, stages)
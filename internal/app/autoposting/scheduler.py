@@ -0,0 +1,156 @@
+import asyncio
+import heapq
+import itertools
+from datetime import datetime, timedelta
+
+from internal import interface, model
+
+
+class AutopostingScheduler:
+    """
+    Планировщик автопостингов по времени следующего запуска.
+
+    Автопостинги хранятся в min-куче по ключу last_active + period_in_hours.
+    Изменения подтягиваются инкрементально по водяной метке updated_at,
+    устаревшие записи кучи отбрасываются лениво при извлечении.
+    """
+
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            publication_service: interface.IPublicationService,
+            retry_delay: int = 60,
+            watermark_overlap: int = 5,
+    ):
+        self.logger = tel.logger()
+        self.publication_service = publication_service
+        self.retry_delay = timedelta(seconds=retry_delay)
+        # Перекрытие окна синхронизации на случай транзакций, закоммиченных позже своего updated_at
+        self.watermark_overlap = timedelta(seconds=watermark_overlap)
+
+        self._heap: list[tuple[datetime, int, int]] = []
+        self._entries: dict[int, int] = {}
+        self._autopostings: dict[int, model.Autoposting] = {}
+        self._in_flight: set[int] = set()
+        self._sequence = itertools.count()
+        self._watermark: datetime | None = None
+        self._wakeup = asyncio.Event()
+
+    async def sync(self):
+        if self._watermark is None:
+            autopostings = await self.publication_service.get_all_autopostings()
+            self.logger.info(f"Планировщик загрузил автопостингов: {len(autopostings)}")
+        else:
+            autopostings = await self.publication_service.get_autopostings_updated_since(
+                self._watermark - self.watermark_overlap
+            )
+
+        for autoposting in autopostings:
+            self.upsert(autoposting)
+
+            if autoposting.updated_at is not None:
+                if self._watermark is None or autoposting.updated_at > self._watermark:
+                    self._watermark = autoposting.updated_at
+
+        if self._watermark is None:
+            self._watermark = datetime.now()
+
+    def upsert(self, autoposting: model.Autoposting):
+        known = self._autopostings.get(autoposting.id)
+        if known is not None and known == autoposting:
+            return
+
+        self._autopostings[autoposting.id] = autoposting
+
+        if not autoposting.enabled:
+            self._entries.pop(autoposting.id, None)
+            return
+
+        if autoposting.id in self._in_flight:
+            # Перепланируется после завершения текущей обработки
+            return
+
+        self._schedule(autoposting.id, self._due_at(autoposting))
+
+    def remove(self, autoposting_id: int):
+        self._in_flight.discard(autoposting_id)
+        self._autopostings.pop(autoposting_id, None)
+        self._entries.pop(autoposting_id, None)
+
+    def pop_due(self, now: datetime) -> list[model.Autoposting]:
+        due_autopostings = []
+
+        while self._heap and self._heap[0][0] <= now:
+            _, sequence, autoposting_id = heapq.heappop(self._heap)
+
+            if self._entries.get(autoposting_id) != sequence:
+                continue
+
+            del self._entries[autoposting_id]
+            self._in_flight.add(autoposting_id)
+            due_autopostings.append(self._autopostings[autoposting_id])
+
+        return due_autopostings
+
+    def complete(self, autoposting_id: int, succeeded: bool):
+        if autoposting_id not in self._in_flight:
+            return
+        self._in_flight.discard(autoposting_id)
+
+        autoposting = self._autopostings.get(autoposting_id)
+        if autoposting is None or not autoposting.enabled:
+            return
+
+        if succeeded:
+            autoposting.last_active = datetime.now()
+            next_run_at = self._due_at(autoposting)
+        else:
+            next_run_at = datetime.now() + self.retry_delay
+
+        self._schedule(autoposting_id, next_run_at)
+
+    def reschedule(self, autoposting: model.Autoposting):
+        self._in_flight.discard(autoposting.id)
+        self._autopostings.pop(autoposting.id, None)
+        self.upsert(autoposting)
+
+    async def wait_next_due(self, max_wait: float):
+        self._wakeup.clear()
+
+        timeout = max_wait
+        next_due_at = self._next_due_at()
+        if next_due_at is not None:
+            timeout = min(timeout, max((next_due_at - datetime.now()).total_seconds(), 0))
+
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def _schedule(self, autoposting_id: int, due_at: datetime):
+        sequence = next(self._sequence)
+        self._entries[autoposting_id] = sequence
+        heapq.heappush(self._heap, (due_at, sequence, autoposting_id))
+
+        # Компактируем кучу, если в ней накопилось много устаревших записей
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [entry for entry in self._heap if self._entries.get(entry[2]) == entry[1]]
+            heapq.heapify(self._heap)
+
+        self._wakeup.set()
+
+    def _next_due_at(self) -> datetime | None:
+        while self._heap:
+            due_at, sequence, autoposting_id = self._heap[0]
+            if self._entries.get(autoposting_id) == sequence:
+                return due_at
+            heapq.heappop(self._heap)
+
+        return None
+
+    @staticmethod
+    def _due_at(autoposting: model.Autoposting) -> datetime:
+        if autoposting.last_active is None:
+            return datetime.min
+
+        return autoposting.last_active + timedelta(hours=autoposting.period_in_hours)
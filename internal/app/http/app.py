@@ -1,3 +1,6 @@
+import asyncio
+from typing import Awaitable, Callable
+
 from fastapi import FastAPI
 from starlette.responses import StreamingResponse
 
@@ -12,7 +15,8 @@ def NewHTTP(
         social_network_controller: interface.ISocialNetworkController,
         http_middleware: interface.IHttpMiddleware,
         prefix: str,
-        environment: str
+        environment: str,
+        background_tasks: list[Callable[[], Awaitable]] = None,
 ):
     app = FastAPI(
         openapi_url=prefix + "/openapi.json",
@@ -25,10 +29,30 @@ def NewHTTP(
     include_publication_handlers(app, publication_controller, prefix)
     include_video_cut_handlers(app, video_cut_controller, prefix)
     include_social_network_handlers(app, social_network_controller, prefix)
+    include_background_tasks(app, background_tasks or [])
 
     return app
 
 
+def include_background_tasks(
+        app: FastAPI,
+        background_tasks: list[Callable[[], Awaitable]],
+):
+    running_tasks: list[asyncio.Task] = []
+
+    async def start_background_tasks():
+        for background_task in background_tasks:
+            running_tasks.append(asyncio.create_task(background_task()))
+
+    async def stop_background_tasks():
+        for running_task in running_tasks:
+            running_task.cancel()
+        await asyncio.gather(*running_tasks, return_exceptions=True)
+
+    app.add_event_handler("startup", start_background_tasks)
+    app.add_event_handler("shutdown", stop_background_tasks)
+
+
 def include_middleware(
         app: FastAPI,
         http_middleware: interface.IHttpMiddleware,
@@ -51,6 +75,14 @@ def include_publication_handlers(
         tags=["Publication"],
     )
 
+    # Генерация публикации с потоковой отдачей через SSE
+    app.add_api_route(
+        prefix + "/publication/text/generate/stream",
+        publication_controller.generate_publication_text_stream,
+        methods=["POST"],
+        tags=["Publication"],
+    )
+
     # Тестовая генерация публикации (без сохранения категории в БД)
     app.add_api_route(
         prefix + "/publication/text/test-generate",
@@ -280,6 +312,13 @@ def include_publication_handlers(
         tags=["ImageEditing"]
     )
 
+    app.add_api_route(
+        prefix + "/image/draft/finalize",
+        publication_controller.finalize_image_draft,
+        methods=["POST"],
+        tags=["ImageEditing"]
+    )
+
     app.add_api_route(
         prefix + "/image/combine",
         publication_controller.combine_images,
@@ -287,6 +326,35 @@ def include_publication_handlers(
         tags=["ImageEditing"]
     )
 
+    # Фоновые задачи изображений: постановка возвращает 202 и id задачи
+    app.add_api_route(
+        prefix + "/publication/image/generate/async",
+        publication_controller.submit_generate_publication_image,
+        methods=["POST"],
+        tags=["ImageJob"]
+    )
+
+    app.add_api_route(
+        prefix + "/image/edit/async",
+        publication_controller.submit_edit_image,
+        methods=["POST"],
+        tags=["ImageJob"]
+    )
+
+    app.add_api_route(
+        prefix + "/image/combine/async",
+        publication_controller.submit_combine_images,
+        methods=["POST"],
+        tags=["ImageJob"]
+    )
+
+    app.add_api_route(
+        prefix + "/image/job/{job_id}",
+        publication_controller.get_image_job,
+        methods=["GET"],
+        tags=["ImageJob"]
+    )
+
 
 def include_video_cut_handlers(
         app: FastAPI,
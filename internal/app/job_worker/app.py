@@ -0,0 +1,127 @@
+import asyncio
+import time
+import traceback
+from typing import Awaitable, Callable
+
+from internal import interface, model
+
+JobHandler = Callable[[model.Job], Awaitable[dict]]
+
+
+class JobWorker:
+    """
+    Обработчик задач из очереди jobs.
+
+    Для каждого типа задачи крутится свой цикл захвата со своим лимитом
+    параллельности. Доставка at-least-once: задача с истекшей блокировкой
+    (упавший обработчик) будет захвачена повторно.
+    """
+
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            job_service: interface.IJobService,
+            worker_id: str,
+            concurrency: dict[str, int] = None,
+            default_concurrency: int = 2,
+            job_timeout: int = 10 * 60,
+            poll_interval: float = 2,
+    ):
+        self.logger = tel.logger()
+        self.meter = tel.meter()
+        self.job_service = job_service
+        self.worker_id = worker_id
+        self.concurrency = concurrency or {}
+        self.default_concurrency = default_concurrency
+        self.job_timeout = job_timeout
+        # Блокировка держится дольше таймаута, чтобы задачу не забрал другой обработчик
+        self.lock_seconds = job_timeout + 60
+        self.poll_interval = poll_interval
+
+        self.handlers: dict[str, JobHandler] = {}
+
+        self.processed_counter = self.meter.create_counter(
+            "job.processed",
+            description="Обработанные задачи по типу и результату: done, retry, dead",
+        )
+        self.job_duration_histogram = self.meter.create_histogram(
+            "job.duration",
+            unit="s",
+            description="Длительность выполнения задачи",
+        )
+
+    def register(self, job_type: str, handler: JobHandler):
+        self.handlers[job_type] = handler
+
+    async def run(self):
+        self.logger.info(f"Обработчик задач запущен, типы: {list(self.handlers)}")
+
+        await asyncio.gather(*[
+            self._run_job_type(job_type)
+            for job_type in self.handlers
+        ])
+
+    async def _run_job_type(self, job_type: str):
+        limit = self.concurrency.get(job_type, self.default_concurrency)
+        running: set[asyncio.Task] = set()
+
+        while True:
+            try:
+                free_slots = limit - len(running)
+                if free_slots > 0:
+                    jobs = await self.job_service.claim_jobs(
+                        job_type=job_type,
+                        worker_id=self.worker_id,
+                        limit=free_slots,
+                        lock_seconds=self.lock_seconds,
+                    )
+
+                    for job in jobs:
+                        task = asyncio.create_task(self._execute(job))
+                        running.add(task)
+                        task.add_done_callback(running.discard)
+
+                    # Очередь не пуста — сразу пробуем добрать ещё
+                    if jobs and len(jobs) == free_slots and len(running) < limit:
+                        continue
+
+                if running:
+                    await asyncio.wait(running, timeout=self.poll_interval, return_when=asyncio.FIRST_COMPLETED)
+                else:
+                    await asyncio.sleep(self.poll_interval)
+
+            except Exception as err:
+                self.logger.error(f"Ошибка в цикле задач {job_type}: {err}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def _execute(self, job: model.Job):
+        handler = self.handlers[job.job_type]
+        job_start = time.monotonic()
+
+        try:
+            # Задача могла исчерпать попытки, если обработчики падали, не успев её завершить
+            if job.attempts > job.max_attempts:
+                await self.job_service.fail_job(job, self.worker_id, job.last_error or "превышено число попыток")
+                self.processed_counter.add(1, {"job_type": job.job_type, "status": "dead"})
+                return
+
+            result = await asyncio.wait_for(handler(job), timeout=self.job_timeout)
+            await self.job_service.complete_job(job.id, self.worker_id, result or {})
+
+            self.processed_counter.add(1, {"job_type": job.job_type, "status": "done"})
+            self.logger.info(f"Задача {job.id} ({job.job_type}) выполнена, попытка {job.attempts}")
+
+        except Exception as err:
+            error = str(err) or err.__class__.__name__
+            self.logger.error(f"Ошибка задачи {job.id} ({job.job_type}), попытка {job.attempts}: {error}")
+            self.logger.error(traceback.format_exc())
+
+            try:
+                dead = await self.job_service.fail_job(job, self.worker_id, error)
+                self.processed_counter.add(1, {"job_type": job.job_type, "status": "dead" if dead else "retry"})
+            except Exception as fail_err:
+                # Блокировка истечёт, и задачу захватят повторно
+                self.logger.error(f"Не удалось сохранить ошибку задачи {job.id}: {fail_err}")
+
+        finally:
+            self.job_duration_histogram.record(time.monotonic() - job_start, {"job_type": job.job_type})
@@ -7,4 +7,16 @@ class ErrInsufficientBalance(Exception):
 class ErrNoImageData(Exception):
     def __init__(self, message="No image data returned from AI"):
         self.message = message
-        super().__init__(self.message)
\ No newline at end of file
+        super().__init__(self.message)
+
+
+class ErrInvalidWebhookUrl(Exception):
+    def __init__(self, message="Webhook URL must be an absolute http(s) URL"):
+        self.message = message
+        super().__init__(self.message)
+
+
+class ErrImageDraftNotFound(Exception):
+    def __init__(self, message="Image draft not found or expired"):
+        self.message = message
+        super().__init__(self.message)
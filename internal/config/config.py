@@ -1,4 +1,5 @@
 import os
+import socket
 
 
 class Config:
@@ -16,6 +17,14 @@ class Config:
         self.tg_api_id: int = int(os.environ.get('LOOM_TG_API_ID'))
         self.tg_api_hash: str = os.environ.get('LOOM_TG_API_HASH')
         self.tg_session_string: str = os.environ.get('LOOM_TG_SESSION_STRING')
+        # Несколько аккаунтов для чтения каналов через запятую, по умолчанию — одна сессия
+        self.tg_session_strings: list[str] = [
+            session_string.strip()
+            for session_string in os.environ.get('LOOM_TG_SESSION_STRINGS', self.tg_session_string or '').split(',')
+            if session_string.strip()
+        ]
+        # Сколько хранить id и access_hash канала, разрешённого по username
+        self.tg_entity_cache_ttl: int = int(os.getenv("LOOM_TG_ENTITY_CACHE_TTL", str(7 * 24 * 60 * 60)))
         self.domain: str = os.environ.get("LOOM_DOMAIN")
         self.proxy: str = os.environ.get("PROXY")
 
@@ -30,6 +39,7 @@ class Config:
 
         self.weed_master_host = os.getenv("LOOM_WEED_MASTER_CONTAINER_NAME", "localhost")
         self.weed_master_port = int(os.getenv("LOOM_WEED_MASTER_PORT", "9333"))
+        self.weed_volume_cache_ttl = int(os.getenv("LOOM_WEED_VOLUME_CACHE_TTL", "60"))
 
         # Настройки телеметрии
         self.alert_tg_bot_token = os.getenv("LOOM_ALERT_TG_BOT_TOKEN", "")
@@ -42,6 +52,11 @@ class Config:
         self.monitoring_redis_db = int(os.getenv("LOOM_MONITORING_DEDUPLICATE_ERROR_ALERT_REDIS_DB", "0"))
         self.monitoring_redis_password = os.getenv("LOOM_MONITORING_REDIS_PASSWORD", "")
 
+        self.redis_host = os.getenv("LOOM_CONTENT_REDIS_CONTAINER_NAME", "localhost")
+        self.redis_port = int(os.getenv("LOOM_CONTENT_REDIS_PORT", "6379"))
+        self.redis_db = int(os.getenv("LOOM_CONTENT_REDIS_DB", "0"))
+        self.redis_password = os.getenv("LOOM_CONTENT_REDIS_PASSWORD", "")
+
         # Настройки OpenTelemetry
         self.otlp_host = os.getenv("LOOM_OTEL_COLLECTOR_CONTAINER_NAME", "loom-otel-collector")
         self.otlp_port = int(os.getenv("LOOM_OTEL_COLLECTOR_GRPC_PORT", "4317"))
@@ -62,10 +77,73 @@ class Config:
         # Loom Organization service
         self.loom_organization_host = os.getenv("LOOM_ORGANIZATION_CONTAINER_NAME", "localhost")
         self.loom_organization_port = os.getenv("LOOM_ORGANIZATION_PORT", "8002")
+        # Организация несёт баланс и кешируется коротко, множители стоимости — надолго
+        self.organization_cache_ttl = float(os.getenv("LOOM_CONTENT_ORGANIZATION_CACHE_TTL", "5"))
+        self.cost_multiplier_cache_ttl = float(os.getenv("LOOM_CONTENT_COST_MULTIPLIER_CACHE_TTL", "300"))
+        self.category_cache_size = int(os.getenv("LOOM_CONTENT_CATEGORY_CACHE_SIZE", "512"))
+        self.category_cache_ttl = int(os.getenv("LOOM_CONTENT_CATEGORY_CACHE_TTL", "600"))
+        # Окно, в течение которого повторный платный запрос отдаётся из сохранённого результата
+        self.idempotency_ttl = int(os.getenv("LOOM_CONTENT_IDEMPOTENCY_TTL", "600"))
 
         # Loom TG Bot service
         self.loom_tg_bot_host = os.getenv("LOOM_TG_BOT_CONTAINER_NAME", "localhost")
         self.loom_tg_bot_port = os.getenv("LOOM_TG_BOT_PORT", "8003")
 
+        # Autoposting configuration
+        self.autoposting_max_workers = int(os.getenv("LOOM_AUTOPOSTING_MAX_WORKERS", "10"))
+        self.autoposting_max_workers_per_organization = int(
+            os.getenv("LOOM_AUTOPOSTING_MAX_WORKERS_PER_ORGANIZATION", "2")
+        )
+        self.autoposting_timeout = int(os.getenv("LOOM_AUTOPOSTING_TIMEOUT", "900"))
+        self.autoposting_worker_id = os.getenv(
+            "LOOM_AUTOPOSTING_WORKER_ID", f"{socket.gethostname()}-{os.getpid()}"
+        )
+        self.autoposting_sync_interval = int(os.getenv("LOOM_AUTOPOSTING_SYNC_INTERVAL", "10"))
+        self.autoposting_filter_batch_size = int(os.getenv("LOOM_AUTOPOSTING_FILTER_BATCH_SIZE", "20"))
+        self.autoposting_filter_batch_token_budget = int(
+            os.getenv("LOOM_AUTOPOSTING_FILTER_BATCH_TOKEN_BUDGET", "8000")
+        )
+        self.autoposting_prefilter_min_length = int(os.getenv("LOOM_AUTOPOSTING_PREFILTER_MIN_LENGTH", "50"))
+        self.autoposting_prefilter_scripts = [
+            script.strip()
+            for script in os.getenv("LOOM_AUTOPOSTING_PREFILTER_SCRIPTS", "").split(",")
+            if script.strip()
+        ]
+        self.autoposting_prefilter_similarity_threshold = float(
+            os.getenv("LOOM_AUTOPOSTING_PREFILTER_SIMILARITY_THRESHOLD", "0")
+        )
+        self.autoposting_prefilter_reject_forwarded = os.getenv(
+            "LOOM_AUTOPOSTING_PREFILTER_REJECT_FORWARDED", "false"
+        ).lower() == "true"
+        self.autoposting_channel_cache_ttl = int(os.getenv("LOOM_AUTOPOSTING_CHANNEL_CACHE_TTL", "120"))
+
+        # Job queue configuration
+        self.job_max_attempts = int(os.getenv("LOOM_JOB_MAX_ATTEMPTS", "5"))
+        self.job_base_retry_delay = int(os.getenv("LOOM_JOB_BASE_RETRY_DELAY", "30"))
+        self.job_max_retry_delay = int(os.getenv("LOOM_JOB_MAX_RETRY_DELAY", "3600"))
+        self.job_timeout = int(os.getenv("LOOM_JOB_TIMEOUT", "600"))
+        self.job_poll_interval = float(os.getenv("LOOM_JOB_POLL_INTERVAL", "2"))
+        self.job_concurrency = {
+            "autoposting.generate_text": int(os.getenv("LOOM_JOB_CONCURRENCY_GENERATE_TEXT", "4")),
+            "autoposting.generate_image": int(os.getenv("LOOM_JOB_CONCURRENCY_GENERATE_IMAGE", "2")),
+            "autoposting.publish": int(os.getenv("LOOM_JOB_CONCURRENCY_PUBLISH", "4")),
+        }
+
+        # Фоновые задачи изображений в HTTP-процессе
+        self.image_draft_ttl = int(os.getenv("LOOM_IMAGE_DRAFT_TTL", "86400"))
+        self.image_variants_concurrency = int(os.getenv("LOOM_IMAGE_VARIANTS_CONCURRENCY", "2"))
+        self.image_job_max_attempts = int(os.getenv("LOOM_IMAGE_JOB_MAX_ATTEMPTS", "2"))
+        self.image_job_timeout = int(os.getenv("LOOM_IMAGE_JOB_TIMEOUT", "1200"))
+        self.image_job_webhook_allowed_hosts = [
+            host.strip()
+            for host in os.getenv("LOOM_IMAGE_JOB_WEBHOOK_ALLOWED_HOSTS", "").split(",")
+            if host.strip()
+        ]
+        self.image_job_concurrency = {
+            "image.generate_publication_image": int(os.getenv("LOOM_IMAGE_JOB_CONCURRENCY_GENERATE", "4")),
+            "image.edit": int(os.getenv("LOOM_IMAGE_JOB_CONCURRENCY_EDIT", "4")),
+            "image.combine": int(os.getenv("LOOM_IMAGE_JOB_CONCURRENCY_COMBINE", "2")),
+        }
+
         # Vizard configuration
         self.vizard_api_key = os.getenv("VIZARD_API_KEY", "")
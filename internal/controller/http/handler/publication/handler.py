@@ -1,9 +1,19 @@
-from fastapi import Form, UploadFile, File
+import hashlib
+import json
+from typing import AsyncIterator
 
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi import Form, UploadFile, File, Header, Request
+
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 
 from internal import interface, common
 from internal.controller.http.handler.publication.model import *
+from internal.controller.http.handler.stream import (
+    storage_stream_response,
+    IMMUTABLE_CACHE_CONTROL,
+    REVALIDATE_CACHE_CONTROL
+)
+from internal.controller.http.middlerware.idempotency import IdempotencyGuard
 from pkg.log_wrapper import auto_log
 from pkg.trace_wrapper import traced_method
 
@@ -13,10 +23,14 @@ class PublicationController(interface.IPublicationController):
             self,
             tel: interface.ITelemetry,
             publication_service: interface.IPublicationService,
+            image_job_service: interface.IImageJobService,
+            idempotency_guard: IdempotencyGuard,
     ):
         self.tracer = tel.tracer()
         self.logger = tel.logger()
         self.publication_service = publication_service
+        self.image_job_service = image_job_service
+        self.idempotency_guard = idempotency_guard
 
     # ПУБЛИКАЦИИ
 
@@ -24,17 +38,50 @@ class PublicationController(interface.IPublicationController):
     @traced_method()
     async def generate_publication_text(
             self,
+            request: Request,
             body: GeneratePublicationTextBody,
-    ) -> JSONResponse:
+            idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
+    ) -> Response:
+        async def generate() -> JSONResponse:
+            try:
+                text_data = await self.publication_service.generate_publication_text(
+                    category_id=body.category_id,
+                    text_reference=body.text_reference
+                )
+                return JSONResponse(
+                    status_code=200,
+                    content=text_data
+                )
+            except common.ErrInsufficientBalance:
+                return JSONResponse(
+                    status_code=400,
+                    content={
+                        "insufficient_balance": True,
+                    }
+                )
+
+        key = self.idempotency_guard.key(
+            "generate_publication_text",
+            request,
+            idempotency_key,
+            {"category_id": body.category_id, "text_reference": body.text_reference}
+        )
+        return await self.idempotency_guard.run(key, "generate_publication_text", generate)
+
+    @auto_log()
+    @traced_method()
+    async def generate_publication_text_stream(
+            self,
+            body: GeneratePublicationTextBody,
+    ) -> StreamingResponse | JSONResponse:
+        events = self.publication_service.generate_publication_text_stream(
+            category_id=body.category_id,
+            text_reference=body.text_reference
+        )
+
+        # Баланс проверяется до первого события, пока ещё можно ответить кодом 400
         try:
-            text_data = await self.publication_service.generate_publication_text(
-                category_id=body.category_id,
-                text_reference=body.text_reference
-            )
-            return JSONResponse(
-                status_code=200,
-                content=text_data
-            )
+            first_event = await anext(events)
         except common.ErrInsufficientBalance:
             return JSONResponse(
                 status_code=400,
@@ -43,6 +90,15 @@ class PublicationController(interface.IPublicationController):
                 }
             )
 
+        return StreamingResponse(
+            self._sse_events(first_event, events),
+            media_type="text/event-stream",
+            headers={
+                "Cache-Control": "no-cache",
+                "X-Accel-Buffering": "no",
+            }
+        )
+
     @auto_log()
     @traced_method()
     async def test_generate_publication_text(
@@ -112,32 +168,61 @@ class PublicationController(interface.IPublicationController):
     @traced_method()
     async def generate_publication_image(
             self,
+            request: Request,
             category_id: int = Form(...),
             publication_text: str = Form(...),
             text_reference: str = Form(...),
             prompt: str | None = Form(None),
             image_file: UploadFile = File(None),
-    ) -> JSONResponse:
-        try:
-            images_url = await self.publication_service.generate_publication_image(
-                category_id=category_id,
-                publication_text=publication_text,
-                text_reference=text_reference,
-                prompt=prompt,
-                image_file=image_file,
-            )
-
-            return JSONResponse(
-                status_code=200,
-                content=images_url
-            )
-        except common.ErrInsufficientBalance:
-            return JSONResponse(
-                status_code=400,
-                content={
-                    "insufficient_balance": True,
-                }
-            )
+            variants: int = Form(1, ge=1, le=4),
+            draft: bool = Form(False),
+            idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
+    ) -> Response:
+        async def generate() -> JSONResponse:
+            try:
+                images_url, _ = await self.publication_service.generate_publication_image(
+                    category_id=category_id,
+                    publication_text=publication_text,
+                    text_reference=text_reference,
+                    prompt=prompt,
+                    image_file=image_file,
+                    variants=variants,
+                    draft=draft,
+                    account_id=self._account_id(request),
+                )
+
+                return JSONResponse(
+                    status_code=200,
+                    content=images_url
+                )
+            except common.ErrInsufficientBalance:
+                return JSONResponse(
+                    status_code=400,
+                    content={
+                        "insufficient_balance": True,
+                    }
+                )
+
+        image_hash = None
+        if image_file:
+            image_hash = hashlib.sha256(await image_file.read()).hexdigest()
+            await image_file.seek(0)
+
+        key = self.idempotency_guard.key(
+            "generate_publication_image",
+            request,
+            idempotency_key,
+            {
+                "category_id": category_id,
+                "publication_text": publication_text,
+                "text_reference": text_reference,
+                "prompt": prompt,
+                "image_hash": image_hash,
+                "variants": variants,
+                "draft": draft,
+            }
+        )
+        return await self.idempotency_guard.run(key, "generate_publication_image", generate)
 
     @auto_log()
     @traced_method()
@@ -267,26 +352,23 @@ class PublicationController(interface.IPublicationController):
     @traced_method()
     async def download_publication_image(
             self,
-            publication_id: int
-    ) -> StreamingResponse:
-        image_io, content_type = await self.publication_service.download_publication_image(publication_id)
-
-        def iterfile():
-            try:
-                while True:
-                    chunk = image_io.read(8192)
-                    if not chunk:
-                        break
-                    yield chunk
-            finally:
-                image_io.close()
-
-        return StreamingResponse(
-            iterfile(),
-            media_type=content_type or "image/png",
+            publication_id: int,
+            byte_range: str | None = Header(None, alias="Range"),
+            if_none_match: str | None = Header(None, alias="If-None-Match"),
+    ) -> Response:
+        image_stream = await self.publication_service.download_publication_image(
+            publication_id,
+            byte_range,
+            if_none_match
+        )
+
+        return storage_stream_response(
+            image_stream,
+            media_type=image_stream.content_type or "image/png",
             headers={
                 "Content-Disposition": f"attachment; filename=publication_{publication_id}_image.png"
-            }
+            },
+            cache_control=REVALIDATE_CACHE_CONTROL
         )
 
     @auto_log()
@@ -294,26 +376,25 @@ class PublicationController(interface.IPublicationController):
     async def download_other_image(
             self,
             image_fid: str,
-            image_name: str
-    ) -> StreamingResponse:
-        image_io, content_type = await self.publication_service.download_other_image(image_fid, image_name)
-
-        def iterfile():
-            try:
-                while True:
-                    chunk = image_io.read(8192)
-                    if not chunk:
-                        break
-                    yield chunk
-            finally:
-                image_io.close()
-
-        return StreamingResponse(
-            iterfile(),
-            media_type=content_type or "image/png",
+            image_name: str,
+            byte_range: str | None = Header(None, alias="Range"),
+            if_none_match: str | None = Header(None, alias="If-None-Match"),
+    ) -> Response:
+        image_stream = await self.publication_service.download_other_image(
+            image_fid,
+            image_name,
+            byte_range,
+            if_none_match
+        )
+
+        # URL содержит fid, поэтому по нему всегда отдаётся одно и то же содержимое
+        return storage_stream_response(
+            image_stream,
+            media_type=image_stream.content_type or "image/png",
             headers={
                 "Content-Disposition": f"attachment; filename={image_name}"
-            }
+            },
+            cache_control=IMMUTABLE_CACHE_CONTROL
         )
 
     @auto_log()
@@ -631,15 +712,19 @@ class PublicationController(interface.IPublicationController):
     @traced_method()
     async def edit_image(
             self,
+            request: Request,
             organization_id: int = Form(...),
             prompt: str = Form(...),
             image_file: UploadFile = File(...),
+            draft: bool = Form(False),
     ) -> JSONResponse:
         try:
-            images_url = await self.publication_service.edit_image(
+            images_url, _ = await self.publication_service.edit_image(
                 organization_id=organization_id,
                 image_file=image_file,
                 prompt=prompt,
+                draft=draft,
+                account_id=self._account_id(request),
             )
 
             return JSONResponse(
@@ -661,6 +746,55 @@ class PublicationController(interface.IPublicationController):
                 }
             )
 
+    @auto_log()
+    @traced_method()
+    async def finalize_image_draft(
+            self,
+            request: Request,
+            draft_image_url: str = Form(...),
+            idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
+    ) -> Response:
+        async def finalize() -> JSONResponse:
+            try:
+                images_url, _ = await self.publication_service.finalize_image_draft(
+                    draft_image_url,
+                    self._account_id(request)
+                )
+
+                return JSONResponse(
+                    status_code=200,
+                    content={"images_url": images_url}
+                )
+            except common.ErrImageDraftNotFound:
+                return JSONResponse(
+                    status_code=404,
+                    content={
+                        "image_draft_not_found": True
+                    }
+                )
+            except common.ErrInsufficientBalance:
+                return JSONResponse(
+                    status_code=400,
+                    content={
+                        "insufficient_balance": True,
+                    }
+                )
+            except common.ErrNoImageData:
+                return JSONResponse(
+                    status_code=200,
+                    content={
+                        "no_image_data": True
+                    }
+                )
+
+        key = self.idempotency_guard.key(
+            "finalize_image_draft",
+            request,
+            idempotency_key,
+            {"draft_image_url": draft_image_url}
+        )
+        return await self.idempotency_guard.run(key, "finalize_image_draft", finalize)
+
     @auto_log()
     @traced_method()
     async def combine_images(
@@ -671,7 +805,7 @@ class PublicationController(interface.IPublicationController):
             images_files: list[UploadFile] = File(...),
     ) -> JSONResponse:
         try:
-            images_url = await self.publication_service.combine_images(
+            images_url, _ = await self.publication_service.combine_images(
                 organization_id=organization_id,
                 category_id=category_id,
                 images_files=images_files,
@@ -696,3 +830,144 @@ class PublicationController(interface.IPublicationController):
                     "no_image_data": True
                 }
             )
+
+    # ФОНОВЫЕ ЗАДАЧИ ИЗОБРАЖЕНИЙ
+
+    @auto_log()
+    @traced_method()
+    async def submit_generate_publication_image(
+            self,
+            request: Request,
+            category_id: int = Form(...),
+            publication_text: str = Form(...),
+            text_reference: str = Form(...),
+            prompt: str | None = Form(None),
+            image_file: UploadFile = File(None),
+            variants: int = Form(1, ge=1, le=4),
+            webhook_url: str | None = Form(None),
+    ) -> JSONResponse:
+        try:
+            job_id = await self.image_job_service.submit_generate_publication_image(
+                account_id=self._account_id(request),
+                category_id=category_id,
+                publication_text=publication_text,
+                text_reference=text_reference,
+                prompt=prompt,
+                image_file=image_file,
+                variants=variants,
+                webhook_url=webhook_url,
+            )
+
+            return JSONResponse(
+                status_code=202,
+                content={"job_id": job_id}
+            )
+        except common.ErrInvalidWebhookUrl:
+            return JSONResponse(
+                status_code=400,
+                content={"invalid_webhook_url": True}
+            )
+
+    @auto_log()
+    @traced_method()
+    async def submit_edit_image(
+            self,
+            request: Request,
+            organization_id: int = Form(...),
+            prompt: str = Form(...),
+            image_file: UploadFile = File(...),
+            webhook_url: str | None = Form(None),
+    ) -> JSONResponse:
+        try:
+            job_id = await self.image_job_service.submit_edit_image(
+                account_id=self._account_id(request),
+                organization_id=organization_id,
+                image_file=image_file,
+                prompt=prompt,
+                webhook_url=webhook_url,
+            )
+
+            return JSONResponse(
+                status_code=202,
+                content={"job_id": job_id}
+            )
+        except common.ErrInvalidWebhookUrl:
+            return JSONResponse(
+                status_code=400,
+                content={"invalid_webhook_url": True}
+            )
+
+    @auto_log()
+    @traced_method()
+    async def submit_combine_images(
+            self,
+            request: Request,
+            organization_id: int = Form(...),
+            category_id: int = Form(...),
+            prompt: str = Form(...),
+            images_files: list[UploadFile] = File(...),
+            webhook_url: str | None = Form(None),
+    ) -> JSONResponse:
+        try:
+            job_id = await self.image_job_service.submit_combine_images(
+                account_id=self._account_id(request),
+                organization_id=organization_id,
+                category_id=category_id,
+                images_files=images_files,
+                prompt=prompt,
+                webhook_url=webhook_url,
+            )
+
+            return JSONResponse(
+                status_code=202,
+                content={"job_id": job_id}
+            )
+        except common.ErrInvalidWebhookUrl:
+            return JSONResponse(
+                status_code=400,
+                content={"invalid_webhook_url": True}
+            )
+
+    @auto_log()
+    @traced_method()
+    async def get_image_job(self, request: Request, job_id: int) -> JSONResponse:
+        job = await self.image_job_service.get_image_job(job_id, self._account_id(request))
+        if job is None:
+            return JSONResponse(
+                status_code=404,
+                content={"message": "job not found"}
+            )
+
+        return JSONResponse(
+            status_code=200,
+            content={
+                "job_id": job.id,
+                "job_type": job.job_type,
+                "status": job.status,
+                "attempts": job.attempts,
+                "result": job.result,
+                "last_error": job.last_error,
+                "created_at": job.created_at.isoformat(),
+                "updated_at": job.updated_at.isoformat(),
+            }
+        )
+
+    @staticmethod
+    def _account_id(request: Request) -> int:
+        authorization_data = getattr(request.state, "authorization_data", None)
+        return authorization_data.account_id if authorization_data else 0
+
+    async def _sse_events(self, first_event: dict, events: AsyncIterator[dict]) -> AsyncIterator[str]:
+        yield self._format_sse(first_event)
+
+        try:
+            async for event in events:
+                yield self._format_sse(event)
+        except Exception as err:
+            # Статус ответа уже отправлен, об ошибке сообщаем событием
+            self.logger.error(f"Ошибка потоковой генерации: {err}")
+            yield self._format_sse({"event": "error", "data": {"message": "generation_failed"}})
+
+    @staticmethod
+    def _format_sse(event: dict) -> str:
+        return f"event: {event['event']}\ndata: {json.dumps(event['data'], ensure_ascii=False)}\n\n"
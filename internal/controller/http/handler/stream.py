@@ -0,0 +1,47 @@
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
+
+from internal import model
+
+# Для URL, адресующих содержимое по fid: браузер не перезапрашивает его вовсе
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Для URL по id сущности: файл может быть заменён, поэтому кеш проверяется по ETag
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+
+def storage_stream_response(
+        stream: model.StorageStream,
+        media_type: str,
+        headers: dict[str, str],
+        cache_control: str,
+) -> Response:
+    headers = {
+        **headers,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": cache_control,
+    }
+    if stream.etag:
+        headers["ETag"] = stream.etag
+
+    if stream.status_code == 304:
+        return Response(status_code=304, headers={"ETag": headers["ETag"], "Cache-Control": cache_control})
+
+    if stream.status_code == 416:
+        return Response(
+            status_code=416,
+            headers={"Content-Range": stream.content_range or "bytes */*"}
+        )
+
+    if stream.content_length is not None:
+        headers["Content-Length"] = str(stream.content_length)
+    if stream.content_range:
+        headers["Content-Range"] = stream.content_range
+
+    return StreamingResponse(
+        stream.chunks,
+        status_code=stream.status_code,
+        media_type=media_type,
+        headers=headers,
+        # Соединение с volume-сервером освобождается, даже если клиент отключился раньше
+        background=BackgroundTask(stream.release)
+    )
@@ -1,8 +1,8 @@
-import io
-
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi import Header
+from fastapi.responses import JSONResponse, Response
 
 from internal import interface
+from internal.controller.http.handler.stream import storage_stream_response, REVALIDATE_CACHE_CONTROL
 from internal.controller.http.handler.video_cut.model import *
 from pkg.log_wrapper import auto_log
 from pkg.trace_wrapper import traced_method
@@ -146,31 +146,21 @@ class VideoCutController(interface.IVideoCutController):
     @traced_method()
     async def download_video_cut(
             self,
-            video_cut_id: int
-    ) -> StreamingResponse:
-        video_io, content_type, video_name = await self.video_cut_service.download_video_cut(video_cut_id)
-
-        video_content = video_io.read()
-        file_size = len(video_content)
-        video_io = io.BytesIO(video_content)
-
-        def iterfile():
-            try:
-                while True:
-                    chunk = video_io.read(8192)
-                    if not chunk:
-                        break
-                    yield chunk
-            finally:
-                video_io.close()
+            video_cut_id: int,
+            byte_range: str | None = Header(None, alias="Range"),
+            if_none_match: str | None = Header(None, alias="If-None-Match"),
+    ) -> Response:
+        video_stream, video_name = await self.video_cut_service.download_video_cut(
+            video_cut_id,
+            byte_range,
+            if_none_match
+        )
 
-        return StreamingResponse(
-            iterfile(),
+        return storage_stream_response(
+            video_stream,
             media_type="video/mp4",
             headers={
                 "Content-Disposition": f"attachment; filename={video_name}",
-                "Content-Type": "video/mp4",
-                "Accept-Ranges": "bytes",  # Важно для видео
-                "Content-Length": str(file_size)  # Если знаете размер
-            }
+            },
+            cache_control=REVALIDATE_CACHE_CONTROL
         )
@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+import json
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from fastapi import Request
+from fastapi.responses import Response, JSONResponse
+
+from internal import interface
+
+
+@dataclass(frozen=True)
+class IdempotencyKey:
+    key: str
+    inputs_hash: str
+
+
+class IdempotencyGuard:
+    """
+    Защита платных эндпоинтов от повторного выполнения.
+
+    Ключ — заголовок Idempotency-Key или хеш входных данных, в обоих случаях
+    в пределах аккаунта. Дубликат во время выполнения ждёт исходный вызов
+    (в этом процессе — напрямую, на другой реплике — через блокировку в Redis),
+    успешный ответ в течение ttl отдаётся из Redis без повторного списания.
+    Повтор Idempotency-Key с другими входными данными отклоняется с 422.
+    """
+
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            redis: interface.IRedis,
+            ttl: int = 10 * 60,
+            lock_ttl: int = 15 * 60,
+            poll_interval: float = 0.5,
+    ):
+        self.logger = tel.logger()
+        self.meter = tel.meter()
+        self.redis = redis
+        self.ttl = ttl
+        # Блокировка переживает самую долгую генерацию, но не зависает навсегда после падения реплики
+        self.lock_ttl = lock_ttl
+        self.poll_interval = poll_interval
+
+        # key -> (хеш входных данных, исходный вызов)
+        self._in_flight: dict[str, tuple[str, asyncio.Task]] = {}
+
+        self.requests_counter = self.meter.create_counter(
+            "http.idempotency.requests",
+            description="Запросы к платным эндпоинтам по результату: executed, replayed, attached, rejected",
+        )
+
+    def key(self, operation: str, request: Request, idempotency_key: str | None, inputs: dict) -> IdempotencyKey:
+        authorization_data = getattr(request.state, "authorization_data", None)
+        account_id = authorization_data.account_id if authorization_data else 0
+
+        inputs_hash = hashlib.sha256(
+            json.dumps(inputs, sort_keys=True, ensure_ascii=False, default=str).encode()
+        ).hexdigest()
+
+        if idempotency_key:
+            digest = hashlib.sha256(idempotency_key.encode()).hexdigest()
+        else:
+            digest = inputs_hash
+
+        return IdempotencyKey(f"idempotency:{operation}:{account_id}:{digest}", inputs_hash)
+
+    async def run(
+            self,
+            key: IdempotencyKey,
+            operation: str,
+            handler: Callable[[], Awaitable[Response]]
+    ) -> Response:
+        stored = await self.redis.get(key.key)
+        if stored:
+            return self._replay_stored(key, operation, stored)
+
+        in_flight = self._in_flight.get(key.key)
+        if in_flight is not None:
+            inputs_hash, task = in_flight
+            if inputs_hash != key.inputs_hash:
+                return self._reject_reused_key(operation)
+            self.requests_counter.add(1, {"operation": operation, "result": "attached"})
+        else:
+            task = asyncio.create_task(self._execute(key, operation, handler))
+            self._in_flight[key.key] = (key.inputs_hash, task)
+            task.add_done_callback(lambda _: self._in_flight.pop(key.key, None))
+
+        # Обрыв соединения дубликата не должен прерывать исходный вызов
+        return await asyncio.shield(task)
+
+    async def _execute(
+            self,
+            key: IdempotencyKey,
+            operation: str,
+            handler: Callable[[], Awaitable[Response]]
+    ) -> Response:
+        lock_key = f"{key.key}:lock"
+
+        deadline = time.monotonic() + self.lock_ttl
+        while not await self._acquire_lock(lock_key):
+            # Тот же запрос выполняется на другой реплике — ждём его результат
+            stored = await self.redis.get(key.key)
+            if stored:
+                return self._replay_stored(key, operation, stored)
+
+            if time.monotonic() > deadline:
+                return JSONResponse(status_code=409, content={"request_in_progress": True})
+
+            await asyncio.sleep(self.poll_interval)
+
+        try:
+            self.requests_counter.add(1, {"operation": operation, "result": "executed"})
+            response = await handler()
+
+            # Запоминаем только успех: отказ по балансу или ошибку можно повторить
+            if 200 <= response.status_code < 300:
+                await self._store(key, response)
+
+            return response
+        finally:
+            try:
+                await self.redis.delete(lock_key)
+            except Exception as err:
+                self.logger.warning(f"Не удалось снять блокировку {lock_key}: {err}")
+
+    async def _acquire_lock(self, lock_key: str) -> bool:
+        try:
+            return await self.redis.set_if_absent(lock_key, "1", ttl=self.lock_ttl)
+        except Exception as err:
+            # Без Redis остаётся защита только внутри процесса
+            self.logger.warning(f"Не удалось взять блокировку {lock_key}: {err}")
+            return True
+
+    async def _store(self, key: IdempotencyKey, response: Response):
+        try:
+            await self.redis.set(key.key, {
+                "status_code": response.status_code,
+                "body": response.body.decode(),
+                "media_type": response.media_type,
+                "inputs_hash": key.inputs_hash,
+            }, ttl=self.ttl)
+        except Exception as err:
+            self.logger.warning(f"Не удалось сохранить результат {key.key}: {err}")
+
+    def _replay_stored(self, key: IdempotencyKey, operation: str, stored: dict) -> Response:
+        # Записи без inputs_hash сохранены до проверки входных данных и отдаются как есть
+        if stored.get("inputs_hash", key.inputs_hash) != key.inputs_hash:
+            return self._reject_reused_key(operation)
+
+        self.requests_counter.add(1, {"operation": operation, "result": "replayed"})
+        return self._replay(stored)
+
+    def _reject_reused_key(self, operation: str) -> Response:
+        self.requests_counter.add(1, {"operation": operation, "result": "rejected"})
+        return JSONResponse(status_code=422, content={"idempotency_key_reused": True})
+
+    @staticmethod
+    def _replay(stored: dict) -> Response:
+        return Response(
+            status_code=stored["status_code"],
+            content=stored["body"],
+            media_type=stored["media_type"],
+            headers={"Idempotent-Replayed": "true"},
+        )
@@ -3,6 +3,8 @@ from internal.interface.publication import *
 from internal.interface.general import *
 from internal.interface.video_cut import *
 from internal.interface.social_network import *
+from internal.interface.job import *
+from internal.interface.image_job import *
 from internal.interface.client.loom_organization import *
 from internal.interface.client.loom_authorization import *
 from internal.interface.client.loom_tg_bot import *
@@ -12,4 +12,10 @@ class ILoomOrganizationClient(Protocol):
     async def get_organization_by_id(self, organization_id: int) -> model.Organization: pass
 
     @abstractmethod
-    async def get_cost_multiplier(self, organization_id: int) -> model.CostMultiplier: pass
\ No newline at end of file
+    async def get_cost_multiplier(self, organization_id: int) -> model.CostMultiplier: pass
+
+    @abstractmethod
+    async def get_organization_with_cost_multiplier(
+            self,
+            organization_id: int
+    ) -> tuple[model.Organization, model.CostMultiplier]: pass
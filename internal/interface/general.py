@@ -1,6 +1,6 @@
 import io
 from abc import abstractmethod
-from typing import Protocol, Sequence, Any, Literal
+from typing import Protocol, Sequence, Any, Literal, AsyncIterator, BinaryIO
 
 from fastapi import FastAPI
 from opentelemetry.metrics import Meter
@@ -59,6 +59,15 @@ class IRedis(Protocol):
     @abstractmethod
     async def get(self, key: str, default: Any = None) -> Any: pass
 
+    @abstractmethod
+    async def delete(self, *keys: str) -> int: pass
+
+    @abstractmethod
+    async def incr(self, key: str) -> int: pass
+
+    @abstractmethod
+    async def set_if_absent(self, key: str, value: Any, ttl: int) -> bool: pass
+
 
 class IStorage(Protocol):
     @abstractmethod
@@ -67,9 +76,29 @@ class IStorage(Protocol):
     @abstractmethod
     async def download(self, fid: str, name: str) -> tuple[io.BytesIO, str]: pass
 
+    @abstractmethod
+    async def download_stream(
+            self,
+            fid: str,
+            name: str,
+            byte_range: str = None,
+            if_none_match: str = None
+    ) -> model.StorageStream: pass
+
     @abstractmethod
     async def upload(self, file: io.BytesIO, name: str) -> model.AsyncWeedOperationResponse: pass
 
+    @abstractmethod
+    async def upload_many(self, files: list[tuple[io.BytesIO, str]]) -> list[model.AsyncWeedOperationResponse]: pass
+
+    @abstractmethod
+    async def upload_stream(
+            self,
+            source: AsyncIterator[bytes] | BinaryIO,
+            name: str,
+            content_type: str = 'application/octet-stream'
+    ) -> model.AsyncWeedOperationResponse: pass
+
     @abstractmethod
     async def update(self, file: io.BytesIO, fid: str, name: str): pass
 
@@ -88,6 +117,9 @@ class IDB(Protocol):
     @abstractmethod
     async def select(self, query: str, query_params: dict) -> Sequence[Any]: pass
 
+    @abstractmethod
+    async def update_returning(self, query: str, query_params: dict) -> Sequence[Any]: pass
+
     @abstractmethod
     async def multi_query(self, queries: list[str]) -> None: pass
 
@@ -155,7 +187,7 @@ class IAnthropicClient(Protocol):
     async def generate_str(
             self,
             history: list,
-            system_prompt: str,
+            system_prompt: str | list[model.PromptSegment],
             temperature: float = 1.0,
             llm_model: str = "claude-haiku-4-5",
             max_tokens: int = 4096,
@@ -167,11 +199,27 @@ class IAnthropicClient(Protocol):
             images: list[bytes] = None,
     ) -> tuple[str, dict]: pass
 
+    @abstractmethod
+    def stream_json(
+            self,
+            history: list,
+            system_prompt: str | list[model.PromptSegment],
+            temperature: float = 1.0,
+            llm_model: str = "claude-haiku-4-5",
+            max_tokens: int = 4096,
+            thinking_tokens: int = None,
+            enable_caching: bool = True,
+            cache_ttl: str = "5m",
+            enable_web_search: bool = True,
+            max_searches: int = 5,
+            images: list[bytes] = None,
+    ) -> AsyncIterator[dict]: pass
+
     @abstractmethod
     async def generate_json(
             self,
             history: list,
-            system_prompt: str,
+            system_prompt: str | list[model.PromptSegment],
             temperature: float = 1.0,
             llm_model: str = "claude-haiku-4-5",
             max_tokens: int = 4096,
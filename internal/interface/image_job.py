@@ -0,0 +1,53 @@
+from abc import abstractmethod
+from typing import Protocol, Awaitable, Callable
+
+from fastapi import UploadFile
+
+from internal import model
+
+
+class IImageJobService(Protocol):
+    @abstractmethod
+    def handlers(self) -> dict[str, Callable[[model.Job], Awaitable[dict]]]:
+        pass
+
+    @abstractmethod
+    async def submit_generate_publication_image(
+            self,
+            account_id: int,
+            category_id: int,
+            publication_text: str,
+            text_reference: str,
+            prompt: str = None,
+            image_file: UploadFile = None,
+            variants: int = 1,
+            webhook_url: str = None,
+    ) -> int:
+        pass
+
+    @abstractmethod
+    async def submit_edit_image(
+            self,
+            account_id: int,
+            organization_id: int,
+            image_file: UploadFile,
+            prompt: str,
+            webhook_url: str = None,
+    ) -> int:
+        pass
+
+    @abstractmethod
+    async def submit_combine_images(
+            self,
+            account_id: int,
+            organization_id: int,
+            category_id: int,
+            images_files: list[UploadFile],
+            prompt: str,
+            webhook_url: str = None,
+    ) -> int:
+        pass
+
+    @abstractmethod
+    async def get_image_job(self, job_id: int, account_id: int) -> model.Job | None:
+        pass
@@ -0,0 +1,98 @@
+from abc import abstractmethod
+from datetime import datetime
+from typing import Protocol
+
+from internal import model
+
+
+class IJobService(Protocol):
+    @abstractmethod
+    async def enqueue_job(
+            self,
+            job_type: str,
+            idempotency_key: str,
+            payload: dict,
+            run_at: datetime = None,
+            max_attempts: int = None,
+    ) -> int:
+        pass
+
+    @abstractmethod
+    async def claim_jobs(
+            self,
+            job_type: str,
+            worker_id: str,
+            limit: int,
+            lock_seconds: int
+    ) -> list[model.Job]:
+        pass
+
+    @abstractmethod
+    async def complete_job(self, job_id: int, worker_id: str, result: dict) -> None:
+        pass
+
+    @abstractmethod
+    async def save_job_progress(self, job: model.Job, result: dict) -> None:
+        pass
+
+    @abstractmethod
+    async def fail_job(self, job: model.Job, worker_id: str, error: str) -> bool:
+        pass
+
+    @abstractmethod
+    async def get_job_by_id(self, job_id: int) -> model.Job | None:
+        pass
+
+    @abstractmethod
+    async def get_job_by_idempotency_key(self, idempotency_key: str) -> model.Job | None:
+        pass
+
+
+class IJobRepo(Protocol):
+    @abstractmethod
+    async def create_job(
+            self,
+            job_type: str,
+            idempotency_key: str,
+            payload: dict,
+            run_at: datetime,
+            max_attempts: int,
+    ) -> int:
+        pass
+
+    @abstractmethod
+    async def claim_jobs(
+            self,
+            job_type: str,
+            worker_id: str,
+            limit: int,
+            lock_seconds: int,
+    ) -> list[model.Job]:
+        pass
+
+    @abstractmethod
+    async def complete_job(self, job_id: int, worker_id: str, result: dict) -> None:
+        pass
+
+    @abstractmethod
+    async def save_job_progress(self, job_id: int, worker_id: str, result: dict) -> None:
+        pass
+
+    @abstractmethod
+    async def fail_job(
+            self,
+            job_id: int,
+            worker_id: str,
+            status: str,
+            last_error: str,
+            retry_delay: float,
+    ) -> None:
+        pass
+
+    @abstractmethod
+    async def get_job_by_id(self, job_id: int) -> list[model.Job]:
+        pass
+
+    @abstractmethod
+    async def get_job_by_idempotency_key(self, idempotency_key: str) -> list[model.Job]:
+        pass
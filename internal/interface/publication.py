@@ -1,10 +1,9 @@
-import io
 from abc import abstractmethod
 from datetime import datetime
-from typing import Protocol
+from typing import Protocol, AsyncIterator
 
-from fastapi import UploadFile, Form, File
-from fastapi.responses import JSONResponse
+from fastapi import UploadFile, Form, File, Header, Request
+from fastapi.responses import JSONResponse, Response
 from starlette.responses import StreamingResponse
 
 from internal import model
@@ -17,8 +16,17 @@ class IPublicationController(Protocol):
     @abstractmethod
     async def generate_publication_text(
             self,
+            request: Request,
             body: GeneratePublicationTextBody,
-    ) -> JSONResponse:
+            idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
+    ) -> Response:
+        pass
+
+    @abstractmethod
+    async def generate_publication_text_stream(
+            self,
+            body: GeneratePublicationTextBody,
+    ) -> StreamingResponse | JSONResponse:
         pass
 
     @abstractmethod
@@ -38,12 +46,16 @@ class IPublicationController(Protocol):
     @abstractmethod
     async def generate_publication_image(
             self,
+            request: Request,
             category_id: int = Form(...),
             publication_text: str = Form(...),
             text_reference: str = Form(...),
             prompt: str | None = Form(None),
             image_file: UploadFile = File(None),
-    ) -> JSONResponse:
+            variants: int = Form(1, ge=1, le=4),
+            draft: bool = Form(False),
+            idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
+    ) -> Response:
         pass
 
     @abstractmethod
@@ -107,16 +119,20 @@ class IPublicationController(Protocol):
     @abstractmethod
     async def download_publication_image(
             self,
-            publication_id: int
-    ) -> StreamingResponse:
+            publication_id: int,
+            byte_range: str | None = Header(None, alias="Range"),
+            if_none_match: str | None = Header(None, alias="If-None-Match"),
+    ) -> Response:
         pass
 
     @abstractmethod
     async def download_other_image(
             self,
             image_fid: str,
-            image_name: str
-    ) -> StreamingResponse: pass
+            image_name: str,
+            byte_range: str | None = Header(None, alias="Range"),
+            if_none_match: str | None = Header(None, alias="If-None-Match"),
+    ) -> Response: pass
 
     # РУБРИКИ
     @abstractmethod
@@ -207,12 +223,23 @@ class IPublicationController(Protocol):
     @abstractmethod
     async def edit_image(
             self,
+            request: Request,
             organization_id: int = Form(...),
             prompt: str = Form(...),
             image_file: UploadFile = File(...),
+            draft: bool = Form(False),
     ) -> JSONResponse:
         pass
 
+    @abstractmethod
+    async def finalize_image_draft(
+            self,
+            request: Request,
+            draft_image_url: str = Form(...),
+            idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
+    ) -> Response:
+        pass
+
     @abstractmethod
     async def combine_images(
             self,
@@ -223,6 +250,48 @@ class IPublicationController(Protocol):
     ) -> JSONResponse:
         pass
 
+    # Фоновые задачи изображений
+    @abstractmethod
+    async def submit_generate_publication_image(
+            self,
+            request: Request,
+            category_id: int = Form(...),
+            publication_text: str = Form(...),
+            text_reference: str = Form(...),
+            prompt: str | None = Form(None),
+            image_file: UploadFile = File(None),
+            variants: int = Form(1, ge=1, le=4),
+            webhook_url: str | None = Form(None),
+    ) -> JSONResponse:
+        pass
+
+    @abstractmethod
+    async def submit_edit_image(
+            self,
+            request: Request,
+            organization_id: int = Form(...),
+            prompt: str = Form(...),
+            image_file: UploadFile = File(...),
+            webhook_url: str | None = Form(None),
+    ) -> JSONResponse:
+        pass
+
+    @abstractmethod
+    async def submit_combine_images(
+            self,
+            request: Request,
+            organization_id: int = Form(...),
+            category_id: int = Form(...),
+            prompt: str = Form(...),
+            images_files: list[UploadFile] = File(...),
+            webhook_url: str | None = Form(None),
+    ) -> JSONResponse:
+        pass
+
+    @abstractmethod
+    async def get_image_job(self, request: Request, job_id: int) -> JSONResponse:
+        pass
+
 class IPublicationService(Protocol):
     # Публикация
     @abstractmethod
@@ -232,6 +301,13 @@ class IPublicationService(Protocol):
             text_reference: str
     ) -> dict: pass
 
+    @abstractmethod
+    def generate_publication_text_stream(
+            self,
+            category_id: int,
+            text_reference: str
+    ) -> AsyncIterator[dict]: pass
+
     @abstractmethod
     async def test_generate_publication_text(
             self,
@@ -271,8 +347,11 @@ class IPublicationService(Protocol):
             publication_text: str,
             text_reference: str,
             prompt: str = None,
-            image_file: UploadFile = None
-    ) -> list[str]: pass
+            image_file: UploadFile = None,
+            variants: int = 1,
+            draft: bool = False,
+            account_id: int = 0,
+    ) -> tuple[list[str], str]: pass
 
     @abstractmethod
     async def create_publication(
@@ -285,6 +364,7 @@ class IPublicationService(Protocol):
             moderation_status: str,
             image_url: str = None,
             image_file: UploadFile = None,
+            tg_source: bool = False,
     ) -> int: pass
 
     @abstractmethod
@@ -340,16 +420,20 @@ class IPublicationService(Protocol):
     @abstractmethod
     async def download_publication_image(
             self,
-            publication_id: int
-    ) -> tuple[io.BytesIO, str]:
+            publication_id: int,
+            byte_range: str = None,
+            if_none_match: str = None
+    ) -> model.StorageStream:
         pass
 
     @abstractmethod
     async def download_other_image(
             self,
             image_fid: str,
-            image_name: str
-    ) -> tuple[io.BytesIO, str]: pass
+            image_name: str,
+            byte_range: str = None,
+            if_none_match: str = None
+    ) -> model.StorageStream: pass
 
     # РУБРИКИ
     @abstractmethod
@@ -497,6 +581,32 @@ class IPublicationService(Protocol):
     async def get_all_autopostings(self) -> list[model.Autoposting]:
         pass
 
+    @abstractmethod
+    async def get_autoposting_by_id(self, autoposting_id: int) -> list[model.Autoposting]:
+        pass
+
+    @abstractmethod
+    async def get_autopostings_updated_since(self, updated_at: datetime) -> list[model.Autoposting]:
+        pass
+
+    @abstractmethod
+    async def claim_autoposting(
+            self,
+            autoposting_id: int,
+            lease_owner: str,
+            lease_seconds: int
+    ) -> model.Autoposting | None:
+        pass
+
+    @abstractmethod
+    async def release_autoposting(
+            self,
+            autoposting_id: int,
+            lease_owner: str,
+            last_active: datetime = None
+    ) -> None:
+        pass
+
     @abstractmethod
     async def update_autoposting(
             self,
@@ -533,6 +643,49 @@ class IPublicationService(Protocol):
     ) -> list[model.ViewedTelegramPost]:
         pass
 
+    @abstractmethod
+    async def create_viewed_telegram_posts(
+            self,
+            autoposting_id: int,
+            tg_channel_username: str,
+            links: list[str]
+    ) -> None:
+        pass
+
+    @abstractmethod
+    async def get_viewed_telegram_post_links(
+            self,
+            autoposting_id: int,
+            tg_channel_username: str,
+            links: list[str]
+    ) -> set[str]:
+        pass
+
+    @abstractmethod
+    async def delete_expired_viewed_telegram_posts(
+            self,
+            autoposting_id: int,
+            created_before: datetime
+    ) -> None:
+        pass
+
+    @abstractmethod
+    async def get_telegram_channel_watermark(
+            self,
+            autoposting_id: int,
+            tg_channel_username: str
+    ) -> int:
+        pass
+
+    @abstractmethod
+    async def update_telegram_channel_watermark(
+            self,
+            autoposting_id: int,
+            tg_channel_username: str,
+            last_message_id: int
+    ) -> None:
+        pass
+
     @abstractmethod
     async def transcribe_audio(
             self,
@@ -562,8 +715,14 @@ class IPublicationService(Protocol):
             self,
             organization_id: int,
             image_file: UploadFile,
-            prompt: str
-    ) -> list[str]:
+            prompt: str,
+            draft: bool = False,
+            account_id: int = 0,
+    ) -> tuple[list[str], str]:
+        pass
+
+    @abstractmethod
+    async def finalize_image_draft(self, draft_image_url: str, account_id: int) -> tuple[list[str], str]:
         pass
 
     @abstractmethod
@@ -573,7 +732,7 @@ class IPublicationService(Protocol):
             category_id: int,
             images_files: list[UploadFile],
             prompt: str
-    ) -> list[str]:
+    ) -> tuple[list[str], str]:
         pass
 
 
@@ -587,6 +746,9 @@ class IPublicationRepo(Protocol):
             text_reference: str,
             text: str,
             moderation_status: str,
+            tg_source: bool = False,
+            image_fid: str = None,
+            image_name: str = None,
     ) -> int:
         pass
 
@@ -781,6 +943,29 @@ class IPublicationRepo(Protocol):
     @abstractmethod
     async def get_autoposting_by_id(self, autoposting_id: int) -> list[model.Autoposting]: pass
 
+    @abstractmethod
+    async def get_autopostings_updated_since(self, updated_at: datetime) -> list[model.Autoposting]:
+        pass
+
+    @abstractmethod
+    async def claim_autoposting(
+            self,
+            autoposting_id: int,
+            lease_owner: str,
+            lease_seconds: int,
+            now: datetime
+    ) -> list[model.Autoposting]:
+        pass
+
+    @abstractmethod
+    async def release_autoposting(
+            self,
+            autoposting_id: int,
+            lease_owner: str,
+            last_active: datetime = None
+    ) -> None:
+        pass
+
     @abstractmethod
     async def delete_autoposting(self, autoposting_id: int) -> None:
         pass
@@ -802,6 +987,57 @@ class IPublicationRepo(Protocol):
     ) -> list[model.ViewedTelegramPost]:
         pass
 
+    @abstractmethod
+    async def create_viewed_telegram_posts(
+            self,
+            autoposting_id: int,
+            tg_channel_username: str,
+            links: list[str]
+    ) -> None:
+        pass
+
+    @abstractmethod
+    async def get_viewed_telegram_posts_by_links(
+            self,
+            autoposting_id: int,
+            tg_channel_username: str,
+            links: list[str]
+    ) -> list[model.ViewedTelegramPost]:
+        pass
+
+    @abstractmethod
+    async def delete_viewed_telegram_posts_created_before(
+            self,
+            autoposting_id: int,
+            created_before: datetime
+    ) -> None:
+        pass
+
+    @abstractmethod
+    async def delete_viewed_telegram_posts_by_autoposting(self, autoposting_id: int) -> None:
+        pass
+
+    @abstractmethod
+    async def get_telegram_channel_watermark(
+            self,
+            autoposting_id: int,
+            tg_channel_username: str
+    ) -> list[model.TelegramChannelWatermark]:
+        pass
+
+    @abstractmethod
+    async def update_telegram_channel_watermark(
+            self,
+            autoposting_id: int,
+            tg_channel_username: str,
+            last_message_id: int
+    ) -> None:
+        pass
+
+    @abstractmethod
+    async def delete_telegram_channel_watermarks(self, autoposting_id: int) -> None:
+        pass
+
 
 class IPublicationPromptGenerator(Protocol):
 
@@ -811,7 +1047,7 @@ class IPublicationPromptGenerator(Protocol):
             user_text_reference: str,
             category: model.Category,
             organization: model.Organization,
-    ) -> str:
+    ) -> list[model.PromptSegment]:
         pass
 
     @abstractmethod
@@ -860,6 +1096,14 @@ class IPublicationPromptGenerator(Protocol):
     ) -> str:
         pass
 
+    @abstractmethod
+    async def get_filter_posts_batch_system_prompt(
+            self,
+            filter_prompt: str,
+            posts_text: list[str]
+    ) -> str:
+        pass
+
     @abstractmethod
     async def get_generate_autoposting_text_system_prompt(
             self,
@@ -1,7 +1,7 @@
 import io
 
 from abc import abstractmethod
-from typing import Protocol, Dict, List
+from typing import Protocol, Dict, List, AsyncIterator
 
 from fastapi.responses import JSONResponse
 
@@ -270,6 +270,17 @@ class ITelegramClient(Protocol):
             limit: int = None
     ) -> list[dict]: pass
 
+    @abstractmethod
+    def iter_channel_posts(
+            self,
+            channel_id: str,
+            min_id: int = 0,
+            limit: int = None
+    ) -> AsyncIterator[dict]: pass
+
+    @abstractmethod
+    async def invalidate_channel_entity(self, channel_id: str): pass
+
 
 class IVkClient(Protocol):
     @abstractmethod
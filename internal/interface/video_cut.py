@@ -1,7 +1,7 @@
-import io
 from abc import abstractmethod
 from typing import Protocol
 
+from fastapi import Header
 from fastapi.responses import JSONResponse, Response
 from starlette.responses import StreamingResponse
 
@@ -58,7 +58,9 @@ class IVideoCutController(Protocol):
     @abstractmethod
     async def download_video_cut(
             self,
-            video_cut_id: int
+            video_cut_id: int,
+            byte_range: str | None = Header(None, alias="Range"),
+            if_none_match: str | None = Header(None, alias="If-None-Match"),
     ) -> Response:
         pass
 
@@ -129,8 +131,10 @@ class IVideoCutService(Protocol):
     @abstractmethod
     async def download_video_cut(
             self,
-            video_cut_id: int
-    ) -> tuple[io.BytesIO, str, str]:
+            video_cut_id: int,
+            byte_range: str = None,
+            if_none_match: str = None
+    ) -> tuple[model.StorageStream, str]:
         pass
 
 
@@ -0,0 +1,46 @@
+from internal import interface
+from internal.migration.base import Migration, MigrationInfo
+
+
+class AddAutopostingUpdatedAt(Migration):
+
+    def get_info(self) -> MigrationInfo:
+        return MigrationInfo(
+            version="v1_0_1",
+            name="add_autoposting_updated_at",
+            depends_on="v1_0_0"
+        )
+
+    async def up(self, db: interface.IDB):
+        queries = [
+            alter_autopostings_add_updated_at,
+            create_autopostings_updated_at_index
+        ]
+
+        await db.multi_query(queries)
+
+    async def down(self, db: interface.IDB):
+        queries = [
+            drop_autopostings_updated_at_index,
+            alter_autopostings_drop_updated_at
+        ]
+
+        await db.multi_query(queries)
+
+alter_autopostings_add_updated_at = """
+ALTER TABLE autopostings
+    ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+"""
+
+create_autopostings_updated_at_index = """
+CREATE INDEX IF NOT EXISTS idx_autopostings_updated_at ON autopostings (updated_at);
+"""
+
+drop_autopostings_updated_at_index = """
+DROP INDEX IF EXISTS idx_autopostings_updated_at;
+"""
+
+alter_autopostings_drop_updated_at = """
+ALTER TABLE autopostings
+    DROP COLUMN IF EXISTS updated_at;
+"""
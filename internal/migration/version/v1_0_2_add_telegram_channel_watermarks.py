@@ -0,0 +1,42 @@
+from internal import interface
+from internal.migration.base import Migration, MigrationInfo
+
+
+class AddTelegramChannelWatermarks(Migration):
+
+    def get_info(self) -> MigrationInfo:
+        return MigrationInfo(
+            version="v1_0_2",
+            name="add_telegram_channel_watermarks",
+            depends_on="v1_0_1"
+        )
+
+    async def up(self, db: interface.IDB):
+        queries = [
+            create_telegram_channel_watermarks_table
+        ]
+
+        await db.multi_query(queries)
+
+    async def down(self, db: interface.IDB):
+        queries = [
+            drop_telegram_channel_watermarks_table
+        ]
+
+        await db.multi_query(queries)
+
+create_telegram_channel_watermarks_table = """
+CREATE TABLE IF NOT EXISTS telegram_channel_watermarks (
+    autoposting_id INTEGER NOT NULL,
+    tg_channel_username TEXT NOT NULL,
+
+    last_message_id BIGINT NOT NULL DEFAULT 0,
+
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (autoposting_id, tg_channel_username)
+);
+"""
+
+drop_telegram_channel_watermarks_table = """
+DROP TABLE IF EXISTS telegram_channel_watermarks CASCADE;
+"""
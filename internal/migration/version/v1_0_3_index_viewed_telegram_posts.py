@@ -0,0 +1,56 @@
+from internal import interface
+from internal.migration.base import Migration, MigrationInfo
+
+
+class IndexViewedTelegramPosts(Migration):
+
+    def get_info(self) -> MigrationInfo:
+        return MigrationInfo(
+            version="v1_0_3",
+            name="index_viewed_telegram_posts",
+            depends_on="v1_0_2"
+        )
+
+    async def up(self, db: interface.IDB):
+        queries = [
+            delete_duplicate_viewed_telegram_posts,
+            create_viewed_telegram_posts_unique_index,
+            create_viewed_telegram_posts_created_at_index
+        ]
+
+        await db.multi_query(queries)
+
+    async def down(self, db: interface.IDB):
+        queries = [
+            drop_viewed_telegram_posts_created_at_index,
+            drop_viewed_telegram_posts_unique_index
+        ]
+
+        await db.multi_query(queries)
+
+delete_duplicate_viewed_telegram_posts = """
+DELETE FROM viewed_telegram_posts duplicate
+USING viewed_telegram_posts original
+WHERE duplicate.autoposting_id = original.autoposting_id
+  AND duplicate.tg_channel_username = original.tg_channel_username
+  AND duplicate.link = original.link
+  AND duplicate.id > original.id;
+"""
+
+create_viewed_telegram_posts_unique_index = """
+CREATE UNIQUE INDEX IF NOT EXISTS uq_viewed_telegram_posts_autoposting_channel_link
+    ON viewed_telegram_posts (autoposting_id, tg_channel_username, link);
+"""
+
+create_viewed_telegram_posts_created_at_index = """
+CREATE INDEX IF NOT EXISTS idx_viewed_telegram_posts_autoposting_created_at
+    ON viewed_telegram_posts (autoposting_id, created_at);
+"""
+
+drop_viewed_telegram_posts_created_at_index = """
+DROP INDEX IF EXISTS idx_viewed_telegram_posts_autoposting_created_at;
+"""
+
+drop_viewed_telegram_posts_unique_index = """
+DROP INDEX IF EXISTS uq_viewed_telegram_posts_autoposting_channel_link;
+"""
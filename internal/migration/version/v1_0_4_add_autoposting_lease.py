@@ -0,0 +1,38 @@
+from internal import interface
+from internal.migration.base import Migration, MigrationInfo
+
+
+class AddAutopostingLease(Migration):
+
+    def get_info(self) -> MigrationInfo:
+        return MigrationInfo(
+            version="v1_0_4",
+            name="add_autoposting_lease",
+            depends_on="v1_0_3"
+        )
+
+    async def up(self, db: interface.IDB):
+        queries = [
+            alter_autopostings_add_lease
+        ]
+
+        await db.multi_query(queries)
+
+    async def down(self, db: interface.IDB):
+        queries = [
+            alter_autopostings_drop_lease
+        ]
+
+        await db.multi_query(queries)
+
+alter_autopostings_add_lease = """
+ALTER TABLE autopostings
+    ADD COLUMN IF NOT EXISTS lease_owner TEXT DEFAULT NULL,
+    ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMP DEFAULT NULL;
+"""
+
+alter_autopostings_drop_lease = """
+ALTER TABLE autopostings
+    DROP COLUMN IF EXISTS lease_owner,
+    DROP COLUMN IF EXISTS lease_expires_at;
+"""
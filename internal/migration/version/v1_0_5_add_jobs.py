@@ -0,0 +1,58 @@
+from internal import interface
+from internal.migration.base import Migration, MigrationInfo
+
+
+class AddJobs(Migration):
+
+    def get_info(self) -> MigrationInfo:
+        return MigrationInfo(
+            version="v1_0_5",
+            name="add_jobs",
+            depends_on="v1_0_4"
+        )
+
+    async def up(self, db: interface.IDB):
+        queries = [
+            create_jobs_table,
+            create_jobs_claim_index
+        ]
+
+        await db.multi_query(queries)
+
+    async def down(self, db: interface.IDB):
+        queries = [
+            drop_jobs_table
+        ]
+
+        await db.multi_query(queries)
+
+create_jobs_table = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id SERIAL PRIMARY KEY,
+    job_type TEXT NOT NULL,
+    idempotency_key TEXT NOT NULL UNIQUE,
+
+    payload JSONB NOT NULL DEFAULT '{}',
+    result JSONB DEFAULT NULL,
+
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+
+    run_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    locked_by TEXT DEFAULT NULL,
+    locked_until TIMESTAMP DEFAULT NULL,
+    last_error TEXT NOT NULL DEFAULT '',
+
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+create_jobs_claim_index = """
+CREATE INDEX IF NOT EXISTS idx_jobs_type_status_run_at ON jobs (job_type, status, run_at);
+"""
+
+drop_jobs_table = """
+DROP TABLE IF EXISTS jobs CASCADE;
+"""
@@ -3,6 +3,7 @@ from internal.model.general import *
 from internal.model.social_network import *
 from internal.model.publication import *
 from internal.model.video_cut import *
+from internal.model.job import *
 
 from internal.model.client.loom_organization import *
 from internal.model.client.loom_employee import *
\ No newline at end of file
@@ -1,8 +1,15 @@
 from dataclasses import dataclass
-from typing import Optional
+from typing import AsyncIterator, Callable, Optional
 from pydantic import BaseModel
 
 
+@dataclass
+class PromptSegment:
+    text: str
+    # Ставить ли после сегмента точку кеширования промпта
+    cache: bool = False
+
+
 @dataclass
 class OpenAICostInfo:
     input_tokens: int
@@ -52,6 +59,19 @@ class AsyncWeedOperationResponse:
     size: Optional[int] = None
 
 
+@dataclass
+class StorageStream:
+    content_type: str
+    content_length: Optional[int]
+    chunks: AsyncIterator[bytes]
+    # Освобождает соединение, если тело так и не было дочитано
+    release: Callable[[], None]
+    # 200, 206 для Range, 304 при совпадении If-None-Match, 416 для недопустимого диапазона
+    status_code: int = 200
+    etag: Optional[str] = None
+    content_range: Optional[str] = None
+
+
 class AuthorizationData(BaseModel):
     account_id: int
     two_fa_status: bool
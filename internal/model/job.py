@@ -0,0 +1,78 @@
+import json
+from datetime import datetime
+from dataclasses import dataclass
+from enum import Enum
+
+
+class JobStatus(Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    DEAD = "dead"
+
+
+@dataclass
+class Job:
+    id: int
+    job_type: str
+    idempotency_key: str
+
+    payload: dict
+    result: dict | None
+
+    status: str
+    attempts: int
+    max_attempts: int
+
+    run_at: datetime
+    locked_by: str | None
+    locked_until: datetime | None
+    last_error: str
+
+    updated_at: datetime
+    created_at: datetime
+
+    @classmethod
+    def serialize(cls, rows) -> list['Job']:
+        return [
+            cls(
+                id=row.id,
+                job_type=row.job_type,
+                idempotency_key=row.idempotency_key,
+                payload=_load_json(row.payload) or {},
+                result=_load_json(row.result),
+                status=row.status,
+                attempts=row.attempts,
+                max_attempts=row.max_attempts,
+                run_at=row.run_at,
+                locked_by=row.locked_by,
+                locked_until=row.locked_until,
+                last_error=row.last_error,
+                updated_at=row.updated_at,
+                created_at=row.created_at
+            )
+            for row in rows
+        ]
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "job_type": self.job_type,
+            "idempotency_key": self.idempotency_key,
+            "payload": self.payload,
+            "result": self.result,
+            "status": self.status,
+            "attempts": self.attempts,
+            "max_attempts": self.max_attempts,
+            "run_at": self.run_at.isoformat(),
+            "last_error": self.last_error,
+            "updated_at": self.updated_at.isoformat(),
+            "created_at": self.created_at.isoformat()
+        }
+
+
+def _load_json(value):
+    # asyncpg без зарегистрированного кодека отдаёт JSONB строкой
+    if isinstance(value, str):
+        return json.loads(value)
+    return value
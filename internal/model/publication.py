@@ -70,6 +70,10 @@ class Category:
             for row in rows
         ]
 
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Category':
+        return cls(**{**data, "created_at": datetime.fromisoformat(data["created_at"])})
+
     def to_dict(self) -> dict:
         return {
             "id": self.id,
@@ -237,6 +241,10 @@ class AutopostingCategory:
             for row in rows
         ]
 
+    @classmethod
+    def from_dict(cls, data: dict) -> 'AutopostingCategory':
+        return cls(**{**data, "created_at": datetime.fromisoformat(data["created_at"])})
+
     def to_dict(self) -> dict:
         return {
             "id": self.id,
@@ -278,6 +286,7 @@ class Autoposting:
     need_image: bool
 
     last_active: datetime
+    updated_at: datetime
     created_at: datetime
 
     @classmethod
@@ -294,6 +303,7 @@ class Autoposting:
                 required_moderation=row.required_moderation,
                 need_image=row.need_image,
                 last_active=row.last_active,
+                updated_at=row.updated_at,
                 created_at=row.created_at
             )
             for row in rows
@@ -311,6 +321,7 @@ class Autoposting:
             "required_moderation": self.required_moderation,
             "need_image": self.need_image,
             "last_active": self.last_active.isoformat() if self.last_active else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
             "created_at": self.created_at.isoformat()
         }
 
@@ -346,3 +357,33 @@ class ViewedTelegramPost:
             "link": self.link,
             "created_at": self.created_at.isoformat()
         }
+
+
+@dataclass
+class TelegramChannelWatermark:
+    autoposting_id: int
+    tg_channel_username: str
+
+    last_message_id: int
+
+    updated_at: datetime
+
+    @classmethod
+    def serialize(cls, rows) -> list['TelegramChannelWatermark']:
+        return [
+            cls(
+                autoposting_id=row.autoposting_id,
+                tg_channel_username=row.tg_channel_username,
+                last_message_id=row.last_message_id,
+                updated_at=row.updated_at
+            )
+            for row in rows
+        ]
+
+    def to_dict(self) -> dict:
+        return {
+            "autoposting_id": self.autoposting_id,
+            "tg_channel_username": self.tg_channel_username,
+            "last_message_id": self.last_message_id,
+            "updated_at": self.updated_at.isoformat()
+        }
@@ -103,6 +103,9 @@ CREATE TABLE IF NOT EXISTS autopostings (
     need_image BOOLEAN DEFAULT FALSE,
 
     last_active TIMESTAMP DEFAULT NULL,
+    lease_owner TEXT DEFAULT NULL,
+    lease_expires_at TIMESTAMP DEFAULT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 """
@@ -119,6 +122,55 @@ CREATE TABLE IF NOT EXISTS viewed_telegram_posts (
 );
 """
 
+create_viewed_telegram_posts_unique_index = """
+CREATE UNIQUE INDEX IF NOT EXISTS uq_viewed_telegram_posts_autoposting_channel_link
+    ON viewed_telegram_posts (autoposting_id, tg_channel_username, link);
+"""
+
+create_viewed_telegram_posts_created_at_index = """
+CREATE INDEX IF NOT EXISTS idx_viewed_telegram_posts_autoposting_created_at
+    ON viewed_telegram_posts (autoposting_id, created_at);
+"""
+
+create_telegram_channel_watermarks_table = """
+CREATE TABLE IF NOT EXISTS telegram_channel_watermarks (
+    autoposting_id INTEGER NOT NULL,
+    tg_channel_username TEXT NOT NULL,
+
+    last_message_id BIGINT NOT NULL DEFAULT 0,
+
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (autoposting_id, tg_channel_username)
+);
+"""
+
+create_jobs_table = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id SERIAL PRIMARY KEY,
+    job_type TEXT NOT NULL,
+    idempotency_key TEXT NOT NULL UNIQUE,
+
+    payload JSONB NOT NULL DEFAULT '{}',
+    result JSONB DEFAULT NULL,
+
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+
+    run_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    locked_by TEXT DEFAULT NULL,
+    locked_until TIMESTAMP DEFAULT NULL,
+    last_error TEXT NOT NULL DEFAULT '',
+
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+create_jobs_claim_index = """
+CREATE INDEX IF NOT EXISTS idx_jobs_type_status_run_at ON jobs (job_type, status, run_at);
+"""
+
 create_autoposting_categories_table = """
 CREATE TABLE IF NOT EXISTS autoposting_categories (
     id SERIAL PRIMARY KEY,
@@ -234,6 +286,14 @@ drop_viewed_telegram_posts_table = """
 DROP TABLE IF EXISTS viewed_telegram_posts CASCADE;
 """
 
+drop_telegram_channel_watermarks_table = """
+DROP TABLE IF EXISTS telegram_channel_watermarks CASCADE;
+"""
+
+drop_jobs_table = """
+DROP TABLE IF EXISTS jobs CASCADE;
+"""
+
 drop_autoposting_categories_table = """
 DROP TABLE IF EXISTS autoposting_categories CASCADE;
 """
@@ -248,6 +308,11 @@ create_organization_tables_queries = [
     create_telegrams_table,
     create_vkontakte_table,
     create_viewed_telegram_posts_table,
+    create_viewed_telegram_posts_unique_index,
+    create_viewed_telegram_posts_created_at_index,
+    create_telegram_channel_watermarks_table,
+    create_jobs_table,
+    create_jobs_claim_index,
     create_autoposting_categories_table
 ]
 
@@ -261,5 +326,7 @@ drop_queries = [
     drop_telegrams_table,
     drop_vkontakte_table,
     drop_viewed_telegram_posts_table,
+    drop_telegram_channel_watermarks_table,
+    drop_jobs_table,
     drop_autoposting_categories_table
 ]
\ No newline at end of file
@@ -0,0 +1,107 @@
+import json
+from datetime import datetime
+
+from pkg.trace_wrapper import traced_method
+from .sql_query import *
+from internal import interface, model
+
+
+class JobRepo(interface.IJobRepo):
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            db: interface.IDB,
+    ):
+        self.tracer = tel.tracer()
+        self.db = db
+
+    @traced_method()
+    async def create_job(
+            self,
+            job_type: str,
+            idempotency_key: str,
+            payload: dict,
+            run_at: datetime,
+            max_attempts: int,
+    ) -> int:
+        args = {
+            'job_type': job_type,
+            'idempotency_key': idempotency_key,
+            'payload': json.dumps(payload),
+            'run_at': run_at,
+            'max_attempts': max_attempts,
+        }
+
+        job_id = await self.db.insert(create_job, args)
+        return job_id
+
+    @traced_method()
+    async def claim_jobs(
+            self,
+            job_type: str,
+            worker_id: str,
+            limit: int,
+            lock_seconds: int,
+    ) -> list[model.Job]:
+        args = {
+            'job_type': job_type,
+            'worker_id': worker_id,
+            'limit': limit,
+            'lock_seconds': lock_seconds,
+        }
+        rows = await self.db.update_returning(claim_jobs, args)
+        jobs = model.Job.serialize(rows) if rows else []
+
+        return jobs
+
+    @traced_method()
+    async def complete_job(self, job_id: int, worker_id: str, result: dict) -> None:
+        args = {
+            'job_id': job_id,
+            'worker_id': worker_id,
+            'result': json.dumps(result),
+        }
+        await self.db.update(complete_job, args)
+
+    @traced_method()
+    async def save_job_progress(self, job_id: int, worker_id: str, result: dict) -> None:
+        args = {
+            'job_id': job_id,
+            'worker_id': worker_id,
+            'result': json.dumps(result),
+        }
+        await self.db.update(save_job_progress, args)
+
+    @traced_method()
+    async def fail_job(
+            self,
+            job_id: int,
+            worker_id: str,
+            status: str,
+            last_error: str,
+            retry_delay: float,
+    ) -> None:
+        args = {
+            'job_id': job_id,
+            'worker_id': worker_id,
+            'status': status,
+            'last_error': last_error,
+            'retry_delay': retry_delay,
+        }
+        await self.db.update(fail_job, args)
+
+    @traced_method()
+    async def get_job_by_id(self, job_id: int) -> list[model.Job]:
+        args = {'job_id': job_id}
+        rows = await self.db.select(get_job_by_id, args)
+        jobs = model.Job.serialize(rows) if rows else []
+
+        return jobs
+
+    @traced_method()
+    async def get_job_by_idempotency_key(self, idempotency_key: str) -> list[model.Job]:
+        args = {'idempotency_key': idempotency_key}
+        rows = await self.db.select(get_job_by_idempotency_key, args)
+        jobs = model.Job.serialize(rows) if rows else []
+
+        return jobs
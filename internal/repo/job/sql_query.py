@@ -0,0 +1,87 @@
+create_job = """
+INSERT INTO jobs (
+    job_type,
+    idempotency_key,
+    payload,
+    run_at,
+    max_attempts
+)
+VALUES (
+    :job_type,
+    :idempotency_key,
+    :payload,
+    COALESCE(:run_at, CURRENT_TIMESTAMP),
+    :max_attempts
+)
+ON CONFLICT (idempotency_key) DO UPDATE
+SET idempotency_key = EXCLUDED.idempotency_key
+RETURNING id;
+"""
+
+claim_jobs = """
+WITH claimable AS (
+    SELECT id FROM jobs
+    WHERE job_type = :job_type
+      AND (
+          (status = 'pending' AND run_at <= CURRENT_TIMESTAMP)
+          OR (status = 'running' AND locked_until < CURRENT_TIMESTAMP)
+      )
+    ORDER BY run_at
+    LIMIT :limit
+    FOR UPDATE SKIP LOCKED
+)
+UPDATE jobs
+SET
+    status = 'running',
+    attempts = jobs.attempts + 1,
+    locked_by = :worker_id,
+    locked_until = CURRENT_TIMESTAMP + make_interval(secs => :lock_seconds),
+    updated_at = CURRENT_TIMESTAMP
+FROM claimable
+WHERE jobs.id = claimable.id
+RETURNING jobs.*;
+"""
+
+complete_job = """
+UPDATE jobs
+SET
+    status = 'done',
+    result = :result,
+    locked_by = NULL,
+    locked_until = NULL,
+    updated_at = CURRENT_TIMESTAMP
+WHERE id = :job_id
+  AND locked_by = :worker_id;
+"""
+
+save_job_progress = """
+UPDATE jobs
+SET
+    result = :result,
+    updated_at = CURRENT_TIMESTAMP
+WHERE id = :job_id
+  AND locked_by = :worker_id;
+"""
+
+fail_job = """
+UPDATE jobs
+SET
+    status = :status,
+    last_error = :last_error,
+    run_at = CURRENT_TIMESTAMP + make_interval(secs => :retry_delay),
+    locked_by = NULL,
+    locked_until = NULL,
+    updated_at = CURRENT_TIMESTAMP
+WHERE id = :job_id
+  AND locked_by = :worker_id;
+"""
+
+get_job_by_id = """
+SELECT * FROM jobs
+WHERE id = :job_id;
+"""
+
+get_job_by_idempotency_key = """
+SELECT * FROM jobs
+WHERE idempotency_key = :idempotency_key;
+"""
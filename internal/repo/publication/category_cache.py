@@ -0,0 +1,113 @@
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+from internal import interface
+
+
+class CategoryCache:
+    """
+    Read-through кеш рубрик: LRU в процессе и, опционально, Redis вторым уровнем.
+
+    С Redis у каждой рубрики есть версия, которая увеличивается при изменении.
+    Локальная запись используется, только если её версия совпадает с текущей,
+    так что изменение рубрики на одной реплике сразу видно на остальных.
+    Без Redis инвалидация локальная, а расхождение между репликами ограничено ttl.
+    """
+
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            redis: interface.IRedis = None,
+            max_size: int = 512,
+            ttl: int = 10 * 60,
+    ):
+        self.logger = tel.logger()
+        self.meter = tel.meter()
+        self.redis = redis
+        self.max_size = max_size
+        self.ttl = ttl
+
+        self._entries: OrderedDict[tuple[str, int], tuple[float, int, Any]] = OrderedDict()
+
+        self.requests_counter = self.meter.create_counter(
+            "publication_repo.category_cache.requests",
+            description="Обращения к кешу рубрик по уровню и результату: local_hit, redis_hit, miss",
+        )
+
+    async def get(
+            self,
+            kind: str,
+            category_id: int,
+            loader: Callable[[], Awaitable[list]],
+            to_dict: Callable[[Any], dict],
+            from_dict: Callable[[dict], Any],
+    ) -> list:
+        key = (kind, category_id)
+        version = await self._get_version(kind, category_id)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, entry_version, value = entry
+            if expires_at > time.monotonic() and entry_version == version:
+                self._entries.move_to_end(key)
+                self.requests_counter.add(1, {"kind": kind, "result": "local_hit"})
+                return value
+
+        if self.redis is not None:
+            cached = await self.redis.get(self._redis_key(kind, category_id, version))
+            if cached:
+                value = [from_dict(item) for item in cached]
+                self._put(key, version, value)
+                self.requests_counter.add(1, {"kind": kind, "result": "redis_hit"})
+                return value
+
+        self.requests_counter.add(1, {"kind": kind, "result": "miss"})
+        value = await loader()
+
+        # Отсутствующую рубрику не кешируем: её могут создать с тем же id только после удаления
+        if value:
+            self._put(key, version, value)
+
+            if self.redis is not None:
+                try:
+                    await self.redis.set(
+                        self._redis_key(kind, category_id, version),
+                        [to_dict(item) for item in value],
+                        ttl=self.ttl
+                    )
+                except Exception as err:
+                    self.logger.warning(f"Не удалось сохранить рубрику {kind}:{category_id} в Redis: {err}")
+
+        return value
+
+    async def invalidate(self, kind: str, category_id: int):
+        self._entries.pop((kind, category_id), None)
+
+        if self.redis is not None:
+            try:
+                # Старые версии в Redis больше не читаются и истекут по ttl
+                await self.redis.incr(self._version_key(kind, category_id))
+            except Exception as err:
+                self.logger.error(f"Не удалось сбросить версию рубрики {kind}:{category_id}: {err}")
+
+    async def _get_version(self, kind: str, category_id: int) -> int:
+        if self.redis is None:
+            return 0
+
+        return int(await self.redis.get(self._version_key(kind, category_id), 0))
+
+    def _put(self, key: tuple[str, int], version: int, value: list):
+        self._entries[key] = (time.monotonic() + self.ttl, version, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    @staticmethod
+    def _version_key(kind: str, category_id: int) -> str:
+        return f"content:{kind}:{category_id}:version"
+
+    @staticmethod
+    def _redis_key(kind: str, category_id: int, version: int) -> str:
+        return f"content:{kind}:{category_id}:v{version}"
@@ -3,6 +3,7 @@ from datetime import datetime
 
 from pkg.trace_wrapper import traced_method
 from .sql_query import *
+from .category_cache import CategoryCache
 from internal import interface, model
 
 
@@ -11,9 +12,11 @@ class PublicationRepo(interface.IPublicationRepo):
             self,
             tel: interface.ITelemetry,
             db: interface.IDB,
+            category_cache: CategoryCache = None,
     ):
         self.tracer = tel.tracer()
         self.db = db
+        self.category_cache = category_cache or CategoryCache(tel)
 
     # ПУБЛИКАЦИИ
     @traced_method()
@@ -25,6 +28,9 @@ class PublicationRepo(interface.IPublicationRepo):
             text_reference: str,
             text: str,
             moderation_status: str,
+            tg_source: bool = False,
+            image_fid: str = None,
+            image_name: str = None,
     ) -> int:
         args = {
             'organization_id': organization_id,
@@ -33,6 +39,9 @@ class PublicationRepo(interface.IPublicationRepo):
             'text_reference': text_reference,
             'text': text,
             'moderation_status': moderation_status,
+            'tg_source': tg_source,
+            'image_fid': image_fid,
+            'image_name': image_name,
         }
 
         publication_id = await self.db.insert(create_publication, args)
@@ -189,9 +198,19 @@ class PublicationRepo(interface.IPublicationRepo):
         }
 
         await self.db.update(update_category, args)
+        await self.category_cache.invalidate("category", category_id)
 
     @traced_method()
     async def get_category_by_id(self, category_id: int) -> list[model.Category]:
+        return await self.category_cache.get(
+            "category",
+            category_id,
+            lambda: self._get_category_by_id(category_id),
+            model.Category.to_dict,
+            model.Category.from_dict,
+        )
+
+    async def _get_category_by_id(self, category_id: int) -> list[model.Category]:
         args = {'category_id': category_id}
         rows = await self.db.select(get_category_by_id, args)
         categories = model.Category.serialize(rows) if rows else []
@@ -210,6 +229,7 @@ class PublicationRepo(interface.IPublicationRepo):
     async def delete_category(self, category_id: int) -> None:
         args = {'category_id': category_id}
         await self.db.delete(delete_category, args)
+        await self.category_cache.invalidate("category", category_id)
 
     # РУБРИКИ ДЛЯ АВТОПОСТИНГА
 
@@ -311,14 +331,25 @@ class PublicationRepo(interface.IPublicationRepo):
         }
 
         await self.db.update(update_autoposting_category, args)
+        await self.category_cache.invalidate("autoposting_category", autoposting_category_id)
 
     @traced_method()
     async def delete_autoposting_category(self, autoposting_category_id: int) -> None:
         args = {'autoposting_category_id': autoposting_category_id}
         await self.db.delete(delete_autoposting_category, args)
+        await self.category_cache.invalidate("autoposting_category", autoposting_category_id)
 
     @traced_method()
     async def get_autoposting_category_by_id(self, autoposting_category_id: int) -> list[model.AutopostingCategory]:
+        return await self.category_cache.get(
+            "autoposting_category",
+            autoposting_category_id,
+            lambda: self._get_autoposting_category_by_id(autoposting_category_id),
+            model.AutopostingCategory.to_dict,
+            model.AutopostingCategory.from_dict,
+        )
+
+    async def _get_autoposting_category_by_id(self, autoposting_category_id: int) -> list[model.AutopostingCategory]:
         args = {'autoposting_category_id': autoposting_category_id}
         rows = await self.db.select(get_autoposting_category_by_id, args)
 
@@ -401,6 +432,47 @@ class PublicationRepo(interface.IPublicationRepo):
 
         return autopostings
 
+    @traced_method()
+    async def get_autopostings_updated_since(self, updated_at: datetime) -> list[model.Autoposting]:
+        args = {'updated_at': updated_at}
+        rows = await self.db.select(get_autopostings_updated_since, args)
+        autopostings = model.Autoposting.serialize(rows) if rows else []
+
+        return autopostings
+
+    @traced_method()
+    async def claim_autoposting(
+            self,
+            autoposting_id: int,
+            lease_owner: str,
+            lease_seconds: int,
+            now: datetime
+    ) -> list[model.Autoposting]:
+        args = {
+            'autoposting_id': autoposting_id,
+            'lease_owner': lease_owner,
+            'lease_seconds': lease_seconds,
+            'now': now
+        }
+        rows = await self.db.update_returning(claim_autoposting, args)
+        autopostings = model.Autoposting.serialize(rows) if rows else []
+
+        return autopostings
+
+    @traced_method()
+    async def release_autoposting(
+            self,
+            autoposting_id: int,
+            lease_owner: str,
+            last_active: datetime = None
+    ) -> None:
+        args = {
+            'autoposting_id': autoposting_id,
+            'lease_owner': lease_owner,
+            'last_active': last_active
+        }
+        await self.db.update(release_autoposting, args)
+
     @traced_method()
     async def delete_autoposting(self, autoposting_id: int) -> None:
         args = {'autoposting_id': autoposting_id}
@@ -438,3 +510,87 @@ class PublicationRepo(interface.IPublicationRepo):
         viewed_posts = model.ViewedTelegramPost.serialize(rows) if rows else []
 
         return viewed_posts
+
+    @traced_method()
+    async def create_viewed_telegram_posts(
+            self,
+            autoposting_id: int,
+            tg_channel_username: str,
+            links: list[str]
+    ) -> None:
+        args = {
+            'autoposting_id': autoposting_id,
+            'tg_channel_username': tg_channel_username,
+            'links': links
+        }
+        await self.db.update(create_viewed_telegram_posts, args)
+
+    @traced_method()
+    async def get_viewed_telegram_posts_by_links(
+            self,
+            autoposting_id: int,
+            tg_channel_username: str,
+            links: list[str]
+    ) -> list[model.ViewedTelegramPost]:
+        args = {
+            'autoposting_id': autoposting_id,
+            'tg_channel_username': tg_channel_username,
+            'links': links
+        }
+        rows = await self.db.select(get_viewed_telegram_posts_by_links, args)
+        viewed_posts = model.ViewedTelegramPost.serialize(rows) if rows else []
+
+        return viewed_posts
+
+    @traced_method()
+    async def delete_viewed_telegram_posts_created_before(
+            self,
+            autoposting_id: int,
+            created_before: datetime
+    ) -> None:
+        args = {
+            'autoposting_id': autoposting_id,
+            'created_before': created_before
+        }
+        await self.db.delete(delete_viewed_telegram_posts_created_before, args)
+
+    @traced_method()
+    async def delete_viewed_telegram_posts_by_autoposting(self, autoposting_id: int) -> None:
+        args = {'autoposting_id': autoposting_id}
+        await self.db.delete(delete_viewed_telegram_posts_by_autoposting, args)
+
+    # ВОДЯНЫЕ МЕТКИ TELEGRAM КАНАЛОВ
+
+    @traced_method()
+    async def get_telegram_channel_watermark(
+            self,
+            autoposting_id: int,
+            tg_channel_username: str
+    ) -> list[model.TelegramChannelWatermark]:
+        args = {
+            'autoposting_id': autoposting_id,
+            'tg_channel_username': tg_channel_username
+        }
+        rows = await self.db.select(get_telegram_channel_watermark, args)
+        watermarks = model.TelegramChannelWatermark.serialize(rows) if rows else []
+
+        return watermarks
+
+    @traced_method()
+    async def update_telegram_channel_watermark(
+            self,
+            autoposting_id: int,
+            tg_channel_username: str,
+            last_message_id: int
+    ) -> None:
+        args = {
+            'autoposting_id': autoposting_id,
+            'tg_channel_username': tg_channel_username,
+            'last_message_id': last_message_id
+        }
+        await self.db.update(upsert_telegram_channel_watermark, args)
+
+    @traced_method()
+    async def delete_telegram_channel_watermarks(self, autoposting_id: int) -> None:
+        args = {'autoposting_id': autoposting_id}
+        await self.db.delete(delete_telegram_channel_watermarks, args)
@@ -6,7 +6,10 @@ INSERT INTO publications (
     creator_id,
     text_reference,
     text,
-    moderation_status
+    moderation_status,
+    tg_source,
+    image_fid,
+    image_name
 )
 VALUES (
     :organization_id,
@@ -14,7 +17,10 @@ VALUES (
     :creator_id,
     :text_reference,
     :text,
-    :moderation_status
+    :moderation_status,
+    :tg_source,
+    :image_fid,
+    :image_name
 )
 RETURNING id;
 """
@@ -260,7 +266,8 @@ SET
     tg_channels = COALESCE(:tg_channels, tg_channels),
     required_moderation = COALESCE(:required_moderation, required_moderation),
     need_image = COALESCE(:need_image, need_image),
-    last_active = COALESCE(:last_active, last_active)
+    last_active = COALESCE(:last_active, last_active),
+    updated_at = CURRENT_TIMESTAMP
 WHERE id = :autoposting_id;
 """
 
@@ -281,6 +288,39 @@ SELECT * FROM autopostings
 ORDER BY created_at DESC;
 """
 
+get_autopostings_updated_since = """
+SELECT * FROM autopostings
+WHERE updated_at > :updated_at
+ORDER BY updated_at;
+"""
+
+claim_autoposting = """
+UPDATE autopostings
+SET
+    lease_owner = :lease_owner,
+    lease_expires_at = CURRENT_TIMESTAMP + make_interval(secs => :lease_seconds)
+WHERE id = (
+    SELECT id FROM autopostings
+    WHERE id = :autoposting_id
+      AND enabled = TRUE
+      AND (last_active IS NULL OR last_active + make_interval(hours => period_in_hours) <= :now)
+      AND (lease_owner IS NULL OR lease_owner = :lease_owner OR lease_expires_at < CURRENT_TIMESTAMP)
+    FOR UPDATE SKIP LOCKED
+)
+RETURNING *;
+"""
+
+release_autoposting = """
+UPDATE autopostings
+SET
+    last_active = COALESCE(:last_active, last_active),
+    updated_at = CASE WHEN :last_active IS NULL THEN updated_at ELSE CURRENT_TIMESTAMP END,
+    lease_owner = NULL,
+    lease_expires_at = NULL
+WHERE id = :autoposting_id
+  AND lease_owner = :lease_owner;
+"""
+
 delete_autoposting = """
 DELETE FROM autopostings
 WHERE id = :autoposting_id;
@@ -298,11 +338,70 @@ VALUES (
     :tg_channel_username,
     :link
 )
+ON CONFLICT (autoposting_id, tg_channel_username, link) DO UPDATE
+SET created_at = CURRENT_TIMESTAMP
 RETURNING id;
 """
 
+create_viewed_telegram_posts = """
+INSERT INTO viewed_telegram_posts (
+    autoposting_id,
+    tg_channel_username,
+    link
+)
+SELECT :autoposting_id, :tg_channel_username, unnest(CAST(:links AS TEXT[]))
+ON CONFLICT (autoposting_id, tg_channel_username, link) DO NOTHING;
+"""
+
 get_viewed_telegram_post = """
 SELECT * FROM viewed_telegram_posts
 WHERE autoposting_id = :autoposting_id
   AND tg_channel_username = :tg_channel_username;
-"""
\ No newline at end of file
+"""
+
+get_viewed_telegram_posts_by_links = """
+SELECT * FROM viewed_telegram_posts
+WHERE autoposting_id = :autoposting_id
+  AND tg_channel_username = :tg_channel_username
+  AND link = ANY(CAST(:links AS TEXT[]));
+"""
+
+delete_viewed_telegram_posts_created_before = """
+DELETE FROM viewed_telegram_posts
+WHERE autoposting_id = :autoposting_id
+  AND created_at < :created_before;
+"""
+
+delete_viewed_telegram_posts_by_autoposting = """
+DELETE FROM viewed_telegram_posts
+WHERE autoposting_id = :autoposting_id;
+"""
+
+# ВОДЯНЫЕ МЕТКИ TELEGRAM КАНАЛОВ
+get_telegram_channel_watermark = """
+SELECT * FROM telegram_channel_watermarks
+WHERE autoposting_id = :autoposting_id
+  AND tg_channel_username = :tg_channel_username;
+"""
+
+upsert_telegram_channel_watermark = """
+INSERT INTO telegram_channel_watermarks (
+    autoposting_id,
+    tg_channel_username,
+    last_message_id
+)
+VALUES (
+    :autoposting_id,
+    :tg_channel_username,
+    :last_message_id
+)
+ON CONFLICT (autoposting_id, tg_channel_username) DO UPDATE
+SET
+    last_message_id = GREATEST(telegram_channel_watermarks.last_message_id, EXCLUDED.last_message_id),
+    updated_at = CURRENT_TIMESTAMP;
+"""
+
+delete_telegram_channel_watermarks = """
+DELETE FROM telegram_channel_watermarks
+WHERE autoposting_id = :autoposting_id;
+"""
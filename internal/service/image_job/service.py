@@ -0,0 +1,303 @@
+import asyncio
+import io
+import ipaddress
+import socket
+import uuid
+from typing import Awaitable, Callable
+from urllib.parse import urlparse
+
+import httpx
+from fastapi import UploadFile
+
+from internal import interface, model, common
+from pkg.trace_wrapper import traced_method
+
+
+class ImageJobService(interface.IImageJobService):
+    """
+    Фоновая генерация и редактирование изображений через очередь jobs.
+
+    Входные файлы сохраняются в хранилище при постановке задачи и удаляются
+    после её завершения. Результат и стоимость сохраняются в задаче,
+    по окончании опционально отправляется webhook.
+    """
+
+    GENERATE_PUBLICATION_IMAGE = "image.generate_publication_image"
+    EDIT_IMAGE = "image.edit"
+    COMBINE_IMAGES = "image.combine"
+
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            job_service: interface.IJobService,
+            publication_service: interface.IPublicationService,
+            storage: interface.IStorage,
+            max_attempts: int = 2,
+            webhook_timeout: float = 10,
+            webhook_attempts: int = 3,
+            webhook_allowed_hosts: list[str] = None,
+    ):
+        self.tracer = tel.tracer()
+        self.logger = tel.logger()
+        self.job_service = job_service
+        self.publication_service = publication_service
+        self.storage = storage
+        # Генерация платная и не идемпотентна, поэтому попыток меньше, чем у остальных задач
+        self.max_attempts = max_attempts
+        self.webhook_timeout = webhook_timeout
+        self.webhook_attempts = webhook_attempts
+        # Если список задан, webhook принимается только на эти хосты
+        self.webhook_allowed_hosts = set(webhook_allowed_hosts or [])
+        # Ссылки на фоновые задачи, чтобы их не собрал GC до завершения
+        self.background_tasks: set[asyncio.Task] = set()
+
+    def handlers(self) -> dict[str, Callable[[model.Job], Awaitable[dict]]]:
+        return {
+            self.GENERATE_PUBLICATION_IMAGE: self._generate_publication_image_job,
+            self.EDIT_IMAGE: self._edit_image_job,
+            self.COMBINE_IMAGES: self._combine_images_job,
+        }
+
+    @traced_method()
+    async def submit_generate_publication_image(
+            self,
+            account_id: int,
+            category_id: int,
+            publication_text: str,
+            text_reference: str,
+            prompt: str = None,
+            image_file: UploadFile = None,
+            variants: int = 1,
+            webhook_url: str = None,
+    ) -> int:
+        await self._check_webhook_url(webhook_url)
+
+        payload = {
+            "account_id": account_id,
+            "category_id": category_id,
+            "publication_text": publication_text,
+            "text_reference": text_reference,
+            "prompt": prompt,
+            "input_files": await self._store_input_files([image_file] if image_file else []),
+            "variants": variants,
+            "webhook_url": webhook_url,
+        }
+        return await self._enqueue(self.GENERATE_PUBLICATION_IMAGE, payload)
+
+    @traced_method()
+    async def submit_edit_image(
+            self,
+            account_id: int,
+            organization_id: int,
+            image_file: UploadFile,
+            prompt: str,
+            webhook_url: str = None,
+    ) -> int:
+        await self._check_webhook_url(webhook_url)
+
+        payload = {
+            "account_id": account_id,
+            "organization_id": organization_id,
+            "prompt": prompt,
+            "input_files": await self._store_input_files([image_file]),
+            "webhook_url": webhook_url,
+        }
+        return await self._enqueue(self.EDIT_IMAGE, payload)
+
+    @traced_method()
+    async def submit_combine_images(
+            self,
+            account_id: int,
+            organization_id: int,
+            category_id: int,
+            images_files: list[UploadFile],
+            prompt: str,
+            webhook_url: str = None,
+    ) -> int:
+        await self._check_webhook_url(webhook_url)
+
+        payload = {
+            "account_id": account_id,
+            "organization_id": organization_id,
+            "category_id": category_id,
+            "prompt": prompt,
+            "input_files": await self._store_input_files(images_files),
+            "webhook_url": webhook_url,
+        }
+        return await self._enqueue(self.COMBINE_IMAGES, payload)
+
+    @traced_method()
+    async def get_image_job(self, job_id: int, account_id: int) -> model.Job | None:
+        job = await self.job_service.get_job_by_id(job_id)
+        if job is None or job.job_type not in self.handlers():
+            return None
+
+        # Чужая задача неотличима от несуществующей
+        if job.payload.get("account_id") != account_id:
+            return None
+        return job
+
+    async def _generate_publication_image_job(self, job: model.Job) -> dict:
+        payload = job.payload
+
+        async def generate(input_files: list[UploadFile]) -> tuple[list[str], str]:
+            return await self.publication_service.generate_publication_image(
+                category_id=payload["category_id"],
+                publication_text=payload["publication_text"],
+                text_reference=payload["text_reference"],
+                prompt=payload["prompt"],
+                image_file=input_files[0] if input_files else None,
+                variants=payload.get("variants", 1),
+            )
+
+        return await self._run_job(job, generate)
+
+    async def _edit_image_job(self, job: model.Job) -> dict:
+        payload = job.payload
+
+        async def edit(input_files: list[UploadFile]) -> tuple[list[str], str]:
+            return await self.publication_service.edit_image(
+                organization_id=payload["organization_id"],
+                image_file=input_files[0],
+                prompt=payload["prompt"],
+            )
+
+        return await self._run_job(job, edit)
+
+    async def _combine_images_job(self, job: model.Job) -> dict:
+        payload = job.payload
+
+        async def combine(input_files: list[UploadFile]) -> tuple[list[str], str]:
+            return await self.publication_service.combine_images(
+                organization_id=payload["organization_id"],
+                category_id=payload["category_id"],
+                images_files=input_files,
+                prompt=payload["prompt"],
+            )
+
+        return await self._run_job(job, combine)
+
+    async def _run_job(
+            self,
+            job: model.Job,
+            action: Callable[[list[UploadFile]], Awaitable[tuple[list[str], str]]],
+    ) -> dict:
+        try:
+            input_files = await self._load_input_files(job.payload["input_files"])
+            images_url, cost_rub = await action(input_files)
+            result = {"images_url": images_url, "cost_rub": cost_rub}
+
+        # Бизнес-отказы не повторяем: это результат задачи, а не сбой
+        except common.ErrInsufficientBalance:
+            result = {"insufficient_balance": True}
+        except common.ErrNoImageData:
+            result = {"no_image_data": True}
+
+        except asyncio.CancelledError:
+            # Таймаут обработчика отменяет задачу; на последней попытке она станет dead,
+            # а уборку и webhook выполняем вне отменённой задачи
+            if job.attempts >= job.max_attempts:
+                finish = asyncio.create_task(self._finish(job, "dead", {"error": "timeout"}))
+                self.background_tasks.add(finish)
+                finish.add_done_callback(self.background_tasks.discard)
+            raise
+
+        except Exception as err:
+            if job.attempts >= job.max_attempts:
+                await self._finish(job, "dead", {"error": str(err) or err.__class__.__name__})
+            raise
+
+        await self._finish(job, "done", result)
+        return result
+
+    async def _finish(self, job: model.Job, status: str, result: dict):
+        await self._delete_input_files(job.payload["input_files"])
+
+        webhook_url = job.payload.get("webhook_url")
+        if webhook_url:
+            await self._send_webhook(webhook_url, {
+                "job_id": job.id,
+                "job_type": job.job_type,
+                "status": status,
+                "result": result,
+            })
+
+    async def _enqueue(self, job_type: str, payload: dict) -> int:
+        return await self.job_service.enqueue_job(
+            job_type=job_type,
+            idempotency_key=f"{job_type}:{uuid.uuid4()}",
+            payload=payload,
+            max_attempts=self.max_attempts,
+        )
+
+    async def _check_webhook_url(self, webhook_url: str | None):
+        if not webhook_url:
+            return
+
+        parsed_url = urlparse(webhook_url)
+        if parsed_url.scheme not in ("http", "https") or not parsed_url.hostname:
+            raise common.ErrInvalidWebhookUrl()
+
+        if self.webhook_allowed_hosts and parsed_url.hostname not in self.webhook_allowed_hosts:
+            raise common.ErrInvalidWebhookUrl()
+
+        # Webhook отправляется из внутренней сети, поэтому внутренние адреса запрещены
+        try:
+            addresses = await asyncio.get_running_loop().getaddrinfo(
+                parsed_url.hostname,
+                parsed_url.port or (443 if parsed_url.scheme == "https" else 80),
+            )
+        except (socket.gaierror, UnicodeError):
+            raise common.ErrInvalidWebhookUrl()
+
+        for *_, sockaddr in addresses:
+            address = ipaddress.ip_address(sockaddr[0])
+            if not address.is_global or address.is_multicast:
+                raise common.ErrInvalidWebhookUrl()
+
+    async def _store_input_files(self, files: list[UploadFile]) -> list[dict]:
+        names = [file.filename or "image.png" for file in files]
+        upload_responses = await self.storage.upload_many([
+            (io.BytesIO(await file.read()), name)
+            for file, name in zip(files, names)
+        ])
+
+        return [
+            {"fid": upload_response.fid, "name": name}
+            for upload_response, name in zip(upload_responses, names)
+        ]
+
+    async def _load_input_files(self, input_files: list[dict]) -> list[UploadFile]:
+        async def load(input_file: dict) -> UploadFile:
+            file, _ = await self.storage.download(input_file["fid"], input_file["name"])
+            return UploadFile(file=file, filename=input_file["name"])
+
+        return list(await asyncio.gather(*[load(input_file) for input_file in input_files]))
+
+    async def _delete_input_files(self, input_files: list[dict]):
+        for input_file in input_files:
+            try:
+                await self.storage.delete(input_file["fid"], input_file["name"])
+            except Exception as err:
+                self.logger.warning(f"Не удалось удалить входной файл {input_file['fid']}: {err}")
+
+    async def _send_webhook(self, webhook_url: str, body: dict):
+        # Адрес проверяется повторно: DNS мог измениться с момента постановки задачи
+        try:
+            await self._check_webhook_url(webhook_url)
+        except common.ErrInvalidWebhookUrl:
+            self.logger.error(f"Webhook {webhook_url} указывает на недопустимый адрес, задача {body['job_id']}")
+            return
+
+        async with httpx.AsyncClient(timeout=self.webhook_timeout, follow_redirects=False) as client:
+            for attempt in range(1, self.webhook_attempts + 1):
+                try:
+                    response = await client.post(webhook_url, json=body)
+                    response.raise_for_status()
+                    return
+                except Exception as err:
+                    self.logger.warning(f"Webhook {webhook_url} не доставлен, попытка {attempt}: {err}")
+                    await asyncio.sleep(attempt)
+
+        # Результат остаётся доступен через опрос задачи
+        self.logger.error(f"Webhook {webhook_url} не доставлен для задачи {body['job_id']}")
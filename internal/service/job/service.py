@@ -0,0 +1,106 @@
+import random
+from datetime import datetime
+
+from internal import interface, model
+from pkg.trace_wrapper import traced_method
+
+
+class JobService(interface.IJobService):
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            repo: interface.IJobRepo,
+            max_attempts: int = 5,
+            base_retry_delay: int = 30,
+            max_retry_delay: int = 60 * 60,
+    ):
+        self.tracer = tel.tracer()
+        self.logger = tel.logger()
+        self.repo = repo
+        self.max_attempts = max_attempts
+        self.base_retry_delay = base_retry_delay
+        self.max_retry_delay = max_retry_delay
+
+    @traced_method()
+    async def enqueue_job(
+            self,
+            job_type: str,
+            idempotency_key: str,
+            payload: dict,
+            run_at: datetime = None,
+            max_attempts: int = None,
+    ) -> int:
+        # Повторная постановка с тем же ключом возвращает уже существующую задачу
+        job_id = await self.repo.create_job(
+            job_type=job_type,
+            idempotency_key=idempotency_key,
+            payload=payload,
+            run_at=run_at,
+            max_attempts=max_attempts or self.max_attempts,
+        )
+
+        return job_id
+
+    @traced_method()
+    async def claim_jobs(
+            self,
+            job_type: str,
+            worker_id: str,
+            limit: int,
+            lock_seconds: int
+    ) -> list[model.Job]:
+        jobs = await self.repo.claim_jobs(
+            job_type=job_type,
+            worker_id=worker_id,
+            limit=limit,
+            lock_seconds=lock_seconds,
+        )
+
+        return jobs
+
+    @traced_method()
+    async def complete_job(self, job_id: int, worker_id: str, result: dict) -> None:
+        await self.repo.complete_job(job_id=job_id, worker_id=worker_id, result=result)
+
+    @traced_method()
+    async def save_job_progress(self, job: model.Job, result: dict) -> None:
+        """Промежуточный результат переживает повторную попытку задачи"""
+        await self.repo.save_job_progress(job_id=job.id, worker_id=job.locked_by, result=result)
+        job.result = result
+
+    @traced_method()
+    async def fail_job(self, job: model.Job, worker_id: str, error: str) -> bool:
+        """Возвращает True, если задача ушла в dead letter"""
+        if job.attempts >= job.max_attempts:
+            self.logger.error(f"Задача {job.id} ({job.job_type}) исчерпала попытки: {error}")
+            await self.repo.fail_job(
+                job_id=job.id,
+                worker_id=worker_id,
+                status=model.JobStatus.DEAD.value,
+                last_error=error,
+                retry_delay=0,
+            )
+            return True
+
+        # Экспоненциальная задержка с джиттером
+        retry_delay = min(self.base_retry_delay * 2 ** (job.attempts - 1), self.max_retry_delay)
+        retry_delay = retry_delay * random.uniform(0.8, 1.2)
+
+        await self.repo.fail_job(
+            job_id=job.id,
+            worker_id=worker_id,
+            status=model.JobStatus.PENDING.value,
+            last_error=error,
+            retry_delay=retry_delay,
+        )
+        return False
+
+    @traced_method()
+    async def get_job_by_id(self, job_id: int) -> model.Job | None:
+        jobs = await self.repo.get_job_by_id(job_id)
+        return jobs[0] if jobs else None
+
+    @traced_method()
+    async def get_job_by_idempotency_key(self, idempotency_key: str) -> model.Job | None:
+        jobs = await self.repo.get_job_by_idempotency_key(idempotency_key)
+        return jobs[0] if jobs else None
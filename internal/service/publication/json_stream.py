@@ -0,0 +1,82 @@
+import json
+import re
+
+
+class StreamingJsonField:
+    """
+    Достаёт значение строкового поля из JSON по мере его генерации.
+
+    feed принимает очередной фрагмент ответа LLM и возвращает новую,
+    уже раскодированную часть значения поля.
+    """
+
+    def __init__(self, field: str):
+        self.start_re = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self.buffer = ""
+        self.position: int | None = None
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        self.buffer += chunk
+        if self.done:
+            return ""
+
+        if self.position is None:
+            match = self.start_re.search(self.buffer)
+            if not match:
+                return ""
+            self.position = match.end()
+
+        decoded = []
+        buffer = self.buffer
+        i = self.position
+
+        while i < len(buffer):
+            char = buffer[i]
+
+            if char == '"':
+                self.done = True
+                break
+
+            if char != '\\':
+                decoded.append(char)
+                i += 1
+                continue
+
+            # Неполную escape-последовательность дочитаем со следующим фрагментом
+            escape_length = self._escape_length(buffer, i)
+            if escape_length is None:
+                break
+
+            try:
+                decoded.append(json.loads('"' + buffer[i:i + escape_length] + '"'))
+            except ValueError:
+                pass
+            i += escape_length
+
+        self.position = i
+        return "".join(decoded)
+
+    @staticmethod
+    def _escape_length(buffer: str, i: int) -> int | None:
+        if i + 1 >= len(buffer):
+            return None
+
+        if buffer[i + 1] != 'u':
+            return 2
+
+        if i + 6 > len(buffer):
+            return None
+
+        try:
+            code_point = int(buffer[i + 2:i + 6], 16)
+        except ValueError:
+            return 6
+
+        # Суррогатную пару раскодируем целиком, иначе получится невалидный символ
+        if 0xD800 <= code_point <= 0xDBFF:
+            if i + 12 > len(buffer):
+                return None
+            return 12
+
+        return 6
@@ -2,17 +2,10 @@ from datetime import datetime
 
 from internal import interface, model
 
-
-class PublicationPromptGenerator(interface.IPublicationPromptGenerator):
-    async def get_generate_publication_text_system_prompt(
-            self,
-            user_text_reference: str,
-            category: model.Category,
-            organization: model.Organization,
-    ) -> str:
-        return f"""
+# Неизменная часть системного промпта генерации поста: кешируется Claude между всеми вызовами
+GENERATE_PUBLICATION_TEXT_INSTRUCTIONS = """
 <role>
-Ты — профессиональный редактор социальных сетей организации {organization.name}.
+Ты — профессиональный редактор социальных сетей организации, описанной в <organization_context>.
 Твоя задача — создавать качественный контент, строго следуя брендбуку организации и параметрам рубрики.
 </role>
 
@@ -28,67 +21,6 @@ class PublicationPromptGenerator(interface.IPublicationPromptGenerator):
 ВАЖНО: Каждый тег содержит критически важную информацию. Игнорирование любого раздела приведет к некачественному результату.
 </processing_instructions>
 
-<organization_context>
-    <name>{organization.name}</name>
-    <description>{organization.description}</description>
-    <tone_of_voice>{organization.tone_of_voice}</tone_of_voice>
-    <compliance_rules priority="absolute">
-{organization.compliance_rules}
-    </compliance_rules>
-    <products>{organization.products}</products>
-    <locale>{organization.locale}</locale>
-    <additional_info>{organization.additional_info}</additional_info>
-
-    <note>Compliance rules являются абсолютным приоритетом и не могут быть нарушены ни при каких условиях.</note>
-</organization_context>
-
-<category_parameters>
-    <basic_info>
-        <name>{category.name}</name>
-        <goal>{category.goal}</goal>
-        <tone_of_voice priority="high">{category.tone_of_voice}</tone_of_voice>
-        <brand_rules>{category.brand_rules}</brand_rules>
-        <creativity_level scale="1-10">{category.creativity_level}</creativity_level>
-        <audience_segment>{category.audience_segment}</audience_segment>
-    </basic_info>
-
-    <technical_requirements>
-        <length_min>{category.len_min}</length_min>
-        <length_max>{category.len_max}</length_max>
-        <length_unit>символы включая пробелы и HTML-теги</length_unit>
-        <hashtags_min>{category.n_hashtags_min}</hashtags_min>
-        <hashtags_max>{category.n_hashtags_max}</hashtags_max>
-    </technical_requirements>
-
-    <call_to_action>
-        <type>{category.cta_type}</type>
-        <strategy>{category.cta_strategy}</strategy>
-    </call_to_action>
-
-    <quality_references>
-        <good_samples>
-            {category.good_samples if category.good_samples else 'не указаны'}
-        </good_samples>
-        <bad_samples>
-            {category.bad_samples if category.bad_samples else 'не указаны'}
-        </bad_samples>
-        <note>Используй good_samples как образцы качества, избегай паттернов из bad_samples</note>
-    </quality_references>
-
-    <additional_info>{category.additional_info}</additional_info>
-</category_parameters>
-
-<user_request>
-{user_text_reference}
-</user_request>
-
-<web_search>
-<instruction>Используй поиск в интернете, если посчитаешь, что тебе нужна достоверная информация для улучшения контента в посте</instruction>
-<current_date>
-{datetime.now().isoformat()}
-</current_date>
-</web_search>
-
 <content_guidelines>
     <formatting>
         <html_tags>
@@ -128,7 +60,7 @@ class PublicationPromptGenerator(interface.IPublicationPromptGenerator):
             <medium>4-7: баланс между проверенным и новым</medium>
             <high>8-10: экспериментальный, креативный подход</high>
         </scale>
-        <current_level>{category.creativity_level}</current_level>
+        <current_level>см. creativity_level в category_parameters</current_level>
     </creativity_interpretation>
     
     <quality_references>
@@ -223,9 +155,9 @@ class PublicationPromptGenerator(interface.IPublicationPromptGenerator):
     <instruction>Твой ответ должен быть ТОЛЬКО валидным JSON объектом без дополнительного текста до или после.</instruction>
 
     <structure>
-    {{
+    {
         "text": "здесь полный текст поста с HTML-тегами для форматирования, включая хештеги"
-    }}
+    }
     </structure>
 
     <validation_checklist>
@@ -237,6 +169,83 @@ class PublicationPromptGenerator(interface.IPublicationPromptGenerator):
         <item>Соблюдены все compliance_rules</item>
     </validation_checklist>
 </response_format>
+"""
+
+
+class PublicationPromptGenerator(interface.IPublicationPromptGenerator):
+    async def get_generate_publication_text_system_prompt(
+            self,
+            user_text_reference: str,
+            category: model.Category,
+            organization: model.Organization,
+    ) -> list[model.PromptSegment]:
+        # Сегменты идут от самого стабильного к самому изменчивому:
+        # кеш Claude работает по префиксу, поэтому запрос пользователя — последним
+        return [
+            model.PromptSegment(text=GENERATE_PUBLICATION_TEXT_INSTRUCTIONS, cache=True),
+            model.PromptSegment(text=f"""
+<organization_context>
+    <name>{organization.name}</name>
+    <description>{organization.description}</description>
+    <tone_of_voice>{organization.tone_of_voice}</tone_of_voice>
+    <compliance_rules priority="absolute">
+{organization.compliance_rules}
+    </compliance_rules>
+    <products>{organization.products}</products>
+    <locale>{organization.locale}</locale>
+    <additional_info>{organization.additional_info}</additional_info>
+
+    <note>Compliance rules являются абсолютным приоритетом и не могут быть нарушены ни при каких условиях.</note>
+</organization_context>
+""", cache=True),
+            model.PromptSegment(text=f"""
+<category_parameters>
+    <basic_info>
+        <name>{category.name}</name>
+        <goal>{category.goal}</goal>
+        <tone_of_voice priority="high">{category.tone_of_voice}</tone_of_voice>
+        <brand_rules>{category.brand_rules}</brand_rules>
+        <creativity_level scale="1-10">{category.creativity_level}</creativity_level>
+        <audience_segment>{category.audience_segment}</audience_segment>
+    </basic_info>
+
+    <technical_requirements>
+        <length_min>{category.len_min}</length_min>
+        <length_max>{category.len_max}</length_max>
+        <length_unit>символы включая пробелы и HTML-теги</length_unit>
+        <hashtags_min>{category.n_hashtags_min}</hashtags_min>
+        <hashtags_max>{category.n_hashtags_max}</hashtags_max>
+    </technical_requirements>
+
+    <call_to_action>
+        <type>{category.cta_type}</type>
+        <strategy>{category.cta_strategy}</strategy>
+    </call_to_action>
+
+    <quality_references>
+        <good_samples>
+            {category.good_samples if category.good_samples else 'не указаны'}
+        </good_samples>
+        <bad_samples>
+            {category.bad_samples if category.bad_samples else 'не указаны'}
+        </bad_samples>
+        <note>Используй good_samples как образцы качества, избегай паттернов из bad_samples</note>
+    </quality_references>
+
+    <additional_info>{category.additional_info}</additional_info>
+</category_parameters>
+""", cache=True),
+            model.PromptSegment(text=f"""
+<user_request>
+{user_text_reference}
+</user_request>
+
+<web_search>
+<instruction>Используй поиск в интернете, если посчитаешь, что тебе нужна достоверная информация для улучшения контента в посте</instruction>
+<current_date>
+{datetime.now().isoformat()}
+</current_date>
+</web_search>
 
 <final_reminder>
 Перед отправкой ответа убедись, что ты:
@@ -247,7 +256,8 @@ class PublicationPromptGenerator(interface.IPublicationPromptGenerator):
 5. Соблюдал все critical_rules
 6. Вернул валидный JSON согласно response_format
 </final_reminder>
-"""
+"""),
+        ]
 
     async def get_regenerate_publication_text_system_prompt(
             self,
@@ -2438,6 +2448,53 @@ class PublicationPromptGenerator(interface.IPublicationPromptGenerator):
 Где:
 - is_suitable: true — если пост соответствует критериям фильтрации
 - is_suitable: false — если пост НЕ соответствует критериям фильтрации
+"""
+
+    async def get_filter_posts_batch_system_prompt(
+            self,
+            filter_prompt: str,
+            posts_text: list[str]
+    ) -> str:
+        posts_block = "\n\n".join(
+            f"<post index=\"{index}\">\n{post_text}\n</post>"
+            for index, post_text in enumerate(posts_text)
+        )
+
+        return f"""Ты — эксперт по анализу контента в социальных сетях.
+
+ТВОЯ ЗАДАЧА:
+Проанализируй каждый из постов Telegram-канала ниже и для каждого определи, соответствует ли он критериям фильтрации.
+Оценивай каждый пост независимо от остальных.
+
+КРИТЕРИИ ФИЛЬТРАЦИИ:
+{filter_prompt}
+
+ПОСТЫ (всего {len(posts_text)}):
+{posts_block}
+
+ИНСТРУКЦИИ:
+1. Внимательно прочитай каждый пост
+2. Сравни его с критериями фильтрации
+3. Определи, подходит ли пост под заданные критерии
+4. Верни вердикт для КАЖДОГО поста, не пропуская ни одного индекса
+5. Верни результат в формате JSON
+
+ФОРМАТ ОТВЕТА:
+Ответ должен быть ТОЛЬКО в формате JSON без дополнительного текста:
+{{
+  "results": [
+    {{
+      "index": индекс поста,
+      "is_suitable": true или false,
+      "reason": причина
+    }}
+  ]
+}}
+
+Где:
+- index — значение атрибута index у поста
+- is_suitable: true — если пост соответствует критериям фильтрации
+- is_suitable: false — если пост НЕ соответствует критериям фильтрации
 """
 
     async def get_generate_autoposting_text_system_prompt(
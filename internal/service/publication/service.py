@@ -1,14 +1,23 @@
+import asyncio
 import base64
 import io
 import uuid
 from datetime import datetime
 from decimal import Decimal
+from typing import AsyncIterator, Awaitable, Callable
 
 from fastapi import UploadFile
 
 from internal import interface, model, common
 
 from pkg.trace_wrapper import traced_method
+from .json_stream import StreamingJsonField
+
+IMAGE_MODEL = "gemini-3-pro-image-preview"
+# Черновики рисуются быстрой моделью в базовом разрешении, финал — IMAGE_MODEL в 2K
+DRAFT_IMAGE_MODEL = "gemini-2.5-flash-image"
+# Промпт для черновика собирает лёгкая модель без размышлений, иначе он дольше самого рендера
+DRAFT_PROMPT_LLM_MODEL = "claude-haiku-4-5"
 
 
 class PublicationService(interface.IPublicationService):
@@ -28,15 +37,20 @@ class PublicationService(interface.IPublicationService):
             loom_tg_bot_client: interface.ILoomTgBotClient,
             loom_domain: str,
             environment: str,
+            redis: interface.IRedis,
+            image_concurrency_per_organization: int = 2,
+            image_draft_ttl: int = 24 * 60 * 60,
     ):
         self.tracer = tel.tracer()
         self.logger = tel.logger()
+        self.meter = tel.meter()
         self.repo = repo
         self.social_network_repo = social_network_repo
         self.openai_client = openai_client
         self.anthropic_client = anthropic_client
         self.googleai_client = googleai_client
         self.storage = storage
+        self.redis = redis
         self.prompt_generator = prompt_generator
         self.organization_client = organization_client
         self.vizard_client = vizard_client
@@ -49,6 +63,18 @@ class PublicationService(interface.IPublicationService):
         self.avg_edit_image_rub_cost = 5
         self.avg_transcribe_audio_rub_cost = 1
 
+        # Ограничение одновременных запросов к Gemini от одной организации
+        self.image_concurrency_per_organization = image_concurrency_per_organization
+        self.image_semaphores: dict[int, asyncio.Semaphore] = {}
+        self.image_draft_ttl = image_draft_ttl
+        # Ссылки на фоновые задачи, чтобы их не собрал GC до завершения
+        self.background_tasks: set[asyncio.Task] = set()
+
+        self.llm_input_tokens_counter = self.meter.create_counter(
+            "publication.llm.input_tokens",
+            description="Входные токены Claude по операции и виду: cache_read, cache_creation, regular",
+        )
+
     # ПУБЛИКАЦИИ
 
     @traced_method()
@@ -58,8 +84,9 @@ class PublicationService(interface.IPublicationService):
             text_reference: str
     ) -> dict:
         category = (await self.repo.get_category_by_id(category_id))[0]
-        organization = await self.organization_client.get_organization_by_id(category.organization_id)
-        organization_cost_multiplier = await self.organization_client.get_cost_multiplier(organization.id)
+        organization, organization_cost_multiplier = await self.organization_client.get_organization_with_cost_multiplier(
+            category.organization_id
+        )
 
         if self._check_balance(organization, organization_cost_multiplier, "generate_text"):
             self.logger.info("Недостаточно средств на балансе")
@@ -72,29 +99,13 @@ class PublicationService(interface.IPublicationService):
         )
 
         publication_data, generate_cost = await self.anthropic_client.generate_json(
-            history=[
-                {
-                    "role": "user",
-                    "content": """
-<system>
-Очень хорошо подумай, чтобы соответсовать всему что промпте, ты должен учесть все что относится к рубрике и организации
-Обрати внимание на каждый XML тег и проанализуй данные в нем
-Большое внимание на <good_samples> и <bad_samples>
-
-ultrathink
-<system/>
-
-<user>
-Создай текст для поста
-</user>
-                        """
-                }
-            ],
+            history=self._publication_text_history(),
             system_prompt=text_system_prompt,
             max_tokens=20000,
             thinking_tokens=15000,
             llm_model="claude-sonnet-4-5",
         )
+        self._record_llm_input_tokens("generate_publication_text", generate_cost)
         publication_data["text"] = publication_data["text"].replace("\n", "<br>")
 
         await self._debit_organization_balance(
@@ -104,6 +115,94 @@ ultrathink
 
         return publication_data
 
+    async def generate_publication_text_stream(
+            self,
+            category_id: int,
+            text_reference: str
+    ) -> AsyncIterator[dict]:
+        """
+        Потоковая версия generate_publication_text.
+
+        Первое событие отдаётся сразу после проверки баланса, поэтому
+        ErrInsufficientBalance вызывающий получает до начала стрима.
+        """
+        category = (await self.repo.get_category_by_id(category_id))[0]
+        organization, organization_cost_multiplier = await self.organization_client.get_organization_with_cost_multiplier(
+            category.organization_id
+        )
+
+        if self._check_balance(organization, organization_cost_multiplier, "generate_text"):
+            self.logger.info("Недостаточно средств на балансе")
+            raise common.ErrInsufficientBalance()
+
+        yield {"event": "progress", "data": {"stage": "started"}}
+
+        text_system_prompt = await self.prompt_generator.get_generate_publication_text_system_prompt(
+            text_reference,
+            category,
+            organization
+        )
+
+        yield {"event": "progress", "data": {"stage": "generating"}}
+
+        # Генерация и списание идут в отдельной задаче: отключение клиента отменяет
+        # только чтение событий, а уже запущенная генерация всё равно будет оплачена
+        events: asyncio.Queue[dict | None] = asyncio.Queue()
+        generation = asyncio.create_task(self._stream_publication_text(
+            category.organization_id,
+            organization_cost_multiplier,
+            text_system_prompt,
+            events
+        ))
+        self.background_tasks.add(generation)
+        generation.add_done_callback(self.background_tasks.discard)
+
+        while (event := await events.get()) is not None:
+            yield event
+
+        await generation
+
+    async def _stream_publication_text(
+            self,
+            organization_id: int,
+            organization_cost_multiplier: model.CostMultiplier,
+            text_system_prompt: list[model.PromptSegment],
+            events: asyncio.Queue
+    ):
+        try:
+            text_field = StreamingJsonField("text")
+            publication_data, generate_cost = None, None
+
+            async for llm_event in self.anthropic_client.stream_json(
+                    history=self._publication_text_history(),
+                    system_prompt=text_system_prompt,
+                    max_tokens=20000,
+                    thinking_tokens=15000,
+                    llm_model="claude-sonnet-4-5",
+            ):
+                if llm_event["type"] == "thinking":
+                    events.put_nowait({"event": "thinking", "data": {"status": llm_event["status"]}})
+                elif llm_event["type"] == "web_search":
+                    events.put_nowait({"event": "progress", "data": {"stage": "web_search"}})
+                elif llm_event["type"] == "text_delta":
+                    text_delta = text_field.feed(llm_event["text"])
+                    if text_delta:
+                        events.put_nowait({"event": "text", "data": {"delta": text_delta.replace("\n", "<br>")}})
+                elif llm_event["type"] == "result":
+                    publication_data, generate_cost = llm_event["json"], llm_event["cost"]
+
+            self._record_llm_input_tokens("generate_publication_text", generate_cost)
+            publication_data["text"] = publication_data["text"].replace("\n", "<br>")
+
+            cost_rub = await self._debit_organization_balance(
+                organization_id,
+                generate_cost["total_cost"] * organization_cost_multiplier.generate_text_cost_multiplier
+            )
+
+            events.put_nowait({"event": "result", "data": {**publication_data, "cost_rub": cost_rub}})
+        finally:
+            events.put_nowait(None)
+
     @traced_method()
     async def test_generate_publication_text(
             self,
@@ -159,29 +258,13 @@ ultrathink
         )
 
         publication_data, generate_cost = await self.anthropic_client.generate_json(
-            history=[
-                {
-                    "role": "user",
-                    "content": """
-<system>
-Очень хорошо подумай, чтобы соответсовать всему что промпте, ты должен учесть все что относится к рубрике и организации
-Обрати внимание на каждый XML тег и проанализуй данные в нем
-Большое внимание на <good_samples> и <bad_samples>
-
-ultrathink
-<system/>
-
-<user>
-Создай текст для поста
-</user>
-                        """
-                }
-            ],
+            history=self._publication_text_history(),
             system_prompt=text_system_prompt,
             max_tokens=20000,
             thinking_tokens=15000,
             llm_model="claude-sonnet-4-5",
         )
+        self._record_llm_input_tokens("test_generate_publication_text", generate_cost)
         publication_data["text"] = publication_data["text"].replace("\n", "<br>")
         return publication_data
 
@@ -193,8 +276,9 @@ ultrathink
             prompt: str = None
     ) -> dict:
         category = (await self.repo.get_category_by_id(category_id))[0]
-        organization = await self.organization_client.get_organization_by_id(category.organization_id)
-        organization_cost_multiplier = await self.organization_client.get_cost_multiplier(organization.id)
+        organization, organization_cost_multiplier = await self.organization_client.get_organization_with_cost_multiplier(
+            category.organization_id
+        )
 
         if self._check_balance(organization, organization_cost_multiplier, "generate_text"):
             self.logger.info("Недостаточно средств на балансе")
@@ -279,16 +363,26 @@ ultrathink
             publication_text: str,
             text_reference: str,
             prompt: str = None,
-            image_file: UploadFile = None
-    ) -> list[str]:
+            image_file: UploadFile = None,
+            variants: int = 1,
+            draft: bool = False,
+            account_id: int = 0,
+    ) -> tuple[list[str], str]:
         category = (await self.repo.get_category_by_id(category_id))[0]
-        organization = await self.organization_client.get_organization_by_id(category.organization_id)
-        organization_cost_multiplier = await self.organization_client.get_cost_multiplier(organization.id)
+        organization, organization_cost_multiplier = await self.organization_client.get_organization_with_cost_multiplier(
+            category.organization_id
+        )
 
-        if self._check_balance(organization, organization_cost_multiplier, "generate_image"):
+        if self._check_balance(organization, organization_cost_multiplier, "generate_image", variants):
             self.logger.info("Недостаточно средств на балансе")
             raise common.ErrInsufficientBalance()
 
+        if draft:
+            prompt_llm_model, prompt_thinking_tokens = DRAFT_PROMPT_LLM_MODEL, 0
+        else:
+            prompt_llm_model, prompt_thinking_tokens = "claude-sonnet-4-5", 15000
+
+        image_content = None
         if prompt:
             if image_file:
                 self.logger.info("Генерация изображения с промптом и файлом")
@@ -316,18 +410,11 @@ ultrathink
                         }
                     ],
                     system_prompt=generate_image_system_prompt,
-                    llm_model="claude-sonnet-4-5",
+                    llm_model=prompt_llm_model,
                     max_tokens=20000,
-                    thinking_tokens=15000,
+                    thinking_tokens=prompt_thinking_tokens,
                     images=[image_content]
                 )
-
-                images, generate_cost = await self.googleai_client.edit_image(
-                    prompt=str(generate_image_prompt),
-                    image_data=image_content,
-                    model_name="gemini-3-pro-image-preview",
-                )
-                images = [images]
             else:
                 self.logger.info("Генерация изображения с промптом")
                 generate_image_system_prompt = await self.prompt_generator.get_generate_image_with_user_prompt_system(
@@ -355,17 +442,10 @@ ultrathink
                         }
                     ],
                     system_prompt=generate_image_system_prompt,
-                    llm_model="claude-sonnet-4-5",
+                    llm_model=prompt_llm_model,
                     max_tokens=20000,
-                    thinking_tokens=15000,
-                )
-
-                images, generate_cost = await self.googleai_client.generate_image(
-                    prompt=str(generate_image_prompt),
-                    aspect_ratio="16:9",
-                    model_name="gemini-3-pro-image-preview",
+                    thinking_tokens=prompt_thinking_tokens,
                 )
-                images = [images]
 
         else:
             self.logger.info("Генерация изображения без промпта")
@@ -392,30 +472,35 @@ ultrathink
                     }
                 ],
                 system_prompt=generate_image_system_prompt,
-                llm_model="claude-sonnet-4-5",
+                llm_model=prompt_llm_model,
                 max_tokens=20000,
-                thinking_tokens=15000,
-            )
-
-            images, generate_cost = await self.googleai_client.generate_image(
-                prompt=str(generate_image_prompt),
-                aspect_ratio="16:9",
-                model_name="gemini-3-pro-image-preview",
+                thinking_tokens=prompt_thinking_tokens,
             )
-            images = [images]
 
-        images_url = await self._upload_images(images)
+        model_name = DRAFT_IMAGE_MODEL if draft else IMAGE_MODEL
 
-        await self._debit_organization_balance(
+        # Промпт строится один раз, варианты рендерятся параллельно
+        images_url, images_cost = await self._render_image_variants(
             category.organization_id,
-            generate_prompt_cost["total_cost"] * organization_cost_multiplier.generate_text_cost_multiplier
+            lambda: self._render_image(str(generate_image_prompt), image_content, model_name),
+            variants
         )
 
-        await self._debit_organization_balance(
+        if draft:
+            await self._save_image_drafts(
+                images_url,
+                category.organization_id,
+                account_id,
+                str(generate_image_prompt),
+                image_content
+            )
+
+        cost_rub = await self._debit_organization_balance(
             category.organization_id,
-            generate_cost["total_cost"] * organization_cost_multiplier.generate_image_cost_multiplier
+            generate_prompt_cost["total_cost"] * organization_cost_multiplier.generate_text_cost_multiplier +
+            images_cost * organization_cost_multiplier.generate_image_cost_multiplier
         )
-        return images_url
+        return images_url, cost_rub
 
     @traced_method()
     async def create_publication(
@@ -428,17 +513,12 @@ ultrathink
             moderation_status: str,
             image_url: str = None,
             image_file: UploadFile = None,
+            tg_source: bool = False,
     ) -> int:
-        publication_id = await self.repo.create_publication(
-            organization_id=organization_id,
-            category_id=category_id,
-            creator_id=creator_id,
-            text_reference=text_reference,
-            text=text,
-            moderation_status=moderation_status
-        )
+        image_fid = None
+        image_name = None
 
-        # Обрабатываем изображение
+        # Обрабатываем изображение до вставки, чтобы создать публикацию одной записью
         if image_file and image_file.filename:
             self.logger.info("Загрузка изображения из файла")
 
@@ -447,12 +527,7 @@ ultrathink
             image_name = image_file.filename
 
             upload_response = await self.storage.upload(image_io, image_name)
-
-            await self.repo.change_publication(
-                publication_id=publication_id,
-                image_fid=upload_response.fid,
-                image_name=image_name
-            )
+            image_fid = upload_response.fid
 
         elif image_url:
             self.logger.info("Загрузка изображения по URL")
@@ -462,12 +537,19 @@ ultrathink
             image_name = f"{uuid.uuid4().hex}.png"
 
             upload_response = await self.storage.upload(image_io, image_name)
+            image_fid = upload_response.fid
 
-            await self.repo.change_publication(
-                publication_id=publication_id,
-                image_fid=upload_response.fid,
-                image_name=image_name
-            )
+        publication_id = await self.repo.create_publication(
+            organization_id=organization_id,
+            category_id=category_id,
+            creator_id=creator_id,
+            text_reference=text_reference,
+            text=text,
+            moderation_status=moderation_status,
+            tg_source=tg_source,
+            image_fid=image_fid,
+            image_name=image_name
+        )
 
         return publication_id
 
@@ -619,30 +701,34 @@ ultrathink
     @traced_method()
     async def download_publication_image(
             self,
-            publication_id: int
-    ) -> tuple[io.BytesIO, str]:
+            publication_id: int,
+            byte_range: str = None,
+            if_none_match: str = None
+    ) -> model.StorageStream:
         publication = (await self.repo.get_publication_by_id(publication_id))[0]
 
-        image_io, content_type = await self.storage.download(
+        return await self.storage.download_stream(
             publication.image_fid,
-            publication.image_name
+            publication.image_name,
+            byte_range,
+            if_none_match
         )
 
-        return image_io, content_type
-
     @traced_method()
     async def download_other_image(
             self,
             image_fid: str,
-            image_name: str
-    ) -> tuple[io.BytesIO, str]:
-        image_io, content_type = await self.storage.download(
+            image_name: str,
+            byte_range: str = None,
+            if_none_match: str = None
+    ) -> model.StorageStream:
+        return await self.storage.download_stream(
             image_fid,
-            "open_ai_image.png"
+            "open_ai_image.png",
+            byte_range,
+            if_none_match
         )
 
-        return image_io, content_type
-
     # РУБРИКИ
     @traced_method()
     async def create_category(
@@ -918,10 +1004,9 @@ ultrathink
             source_post_text: str
     ) -> dict:
         autoposting_category = (await self.repo.get_autoposting_category_by_id(autoposting_category_id))[0]
-        organization = await self.organization_client.get_organization_by_id(
+        organization, organization_cost_multiplier = await self.organization_client.get_organization_with_cost_multiplier(
             autoposting_category.organization_id
         )
-        organization_cost_multiplier = await self.organization_client.get_cost_multiplier(organization.id)
 
         if self._check_balance(organization, organization_cost_multiplier, "generate_text"):
             self.logger.info("Недостаточно средств на балансе")
@@ -961,10 +1046,9 @@ ultrathink
             publication_text: str
     ) -> list[str]:
         autoposting_category = (await self.repo.get_autoposting_category_by_id(autoposting_category_id))[0]
-        organization = await self.organization_client.get_organization_by_id(
+        organization, organization_cost_multiplier = await self.organization_client.get_organization_with_cost_multiplier(
             autoposting_category.organization_id
         )
-        organization_cost_multiplier = await self.organization_client.get_cost_multiplier(organization.id)
 
         if self._check_balance(organization, organization_cost_multiplier, "generate_image"):
             self.logger.info("Недостаточно средств на балансе")
@@ -978,7 +1062,7 @@ ultrathink
         images, generate_cost = await self.googleai_client.generate_image(
             prompt=str(image_system_prompt),
             aspect_ratio="16:9",
-            model_name="gemini-3-pro-image-preview",
+            model_name=IMAGE_MODEL,
         )
         images = [images]
 
@@ -1047,11 +1131,52 @@ ultrathink
         autopostings = await self.repo.get_all_autopostings()
         return autopostings
 
+    @traced_method()
+    async def get_autoposting_by_id(self, autoposting_id: int) -> list[model.Autoposting]:
+        autopostings = await self.repo.get_autoposting_by_id(autoposting_id)
+        return autopostings
+
+    @traced_method()
+    async def get_autopostings_updated_since(self, updated_at: datetime) -> list[model.Autoposting]:
+        autopostings = await self.repo.get_autopostings_updated_since(updated_at)
+        return autopostings
+
+    @traced_method()
+    async def claim_autoposting(
+            self,
+            autoposting_id: int,
+            lease_owner: str,
+            lease_seconds: int
+    ) -> model.Autoposting | None:
+        autopostings = await self.repo.claim_autoposting(
+            autoposting_id=autoposting_id,
+            lease_owner=lease_owner,
+            lease_seconds=lease_seconds,
+            now=datetime.now()
+        )
+
+        return autopostings[0] if autopostings else None
+
+    @traced_method()
+    async def release_autoposting(
+            self,
+            autoposting_id: int,
+            lease_owner: str,
+            last_active: datetime = None
+    ) -> None:
+        await self.repo.release_autoposting(
+            autoposting_id=autoposting_id,
+            lease_owner=lease_owner,
+            last_active=last_active
+        )
+
     @traced_method()
     async def delete_autoposting(self, autoposting_id: int) -> None:
         autoposting = (await self.repo.get_autoposting_by_id(autoposting_id))[0]
         await self.repo.delete_publication_by_category_id(autoposting.autoposting_category_id)
         await self.repo.delete_autoposting_category(autoposting.autoposting_category_id)
+        await self.repo.delete_viewed_telegram_posts_by_autoposting(autoposting_id)
+        await self.repo.delete_telegram_channel_watermarks(autoposting_id)
         await self.repo.delete_autoposting(autoposting_id)
         # TODO нормально удалять публикации
 
@@ -1084,6 +1209,78 @@ ultrathink
 
         return viewed_posts
 
+    @traced_method()
+    async def create_viewed_telegram_posts(
+            self,
+            autoposting_id: int,
+            tg_channel_username: str,
+            links: list[str]
+    ) -> None:
+        if not links:
+            return
+
+        await self.repo.create_viewed_telegram_posts(
+            autoposting_id=autoposting_id,
+            tg_channel_username=tg_channel_username,
+            links=links
+        )
+
+    @traced_method()
+    async def get_viewed_telegram_post_links(
+            self,
+            autoposting_id: int,
+            tg_channel_username: str,
+            links: list[str]
+    ) -> set[str]:
+        if not links:
+            return set()
+
+        viewed_posts = await self.repo.get_viewed_telegram_posts_by_links(
+            autoposting_id=autoposting_id,
+            tg_channel_username=tg_channel_username,
+            links=links
+        )
+
+        return {viewed_post.link for viewed_post in viewed_posts}
+
+    @traced_method()
+    async def delete_expired_viewed_telegram_posts(
+            self,
+            autoposting_id: int,
+            created_before: datetime
+    ) -> None:
+        await self.repo.delete_viewed_telegram_posts_created_before(
+            autoposting_id=autoposting_id,
+            created_before=created_before
+        )
+
+    # ВОДЯНЫЕ МЕТКИ TELEGRAM КАНАЛОВ
+    @traced_method()
+    async def get_telegram_channel_watermark(
+            self,
+            autoposting_id: int,
+            tg_channel_username: str
+    ) -> int:
+        watermarks = await self.repo.get_telegram_channel_watermark(
+            autoposting_id=autoposting_id,
+            tg_channel_username=tg_channel_username
+        )
+
+        return watermarks[0].last_message_id if watermarks else 0
+
+    @traced_method()
+    async def update_telegram_channel_watermark(
+            self,
+            autoposting_id: int,
+            tg_channel_username: str,
+            last_message_id: int
+    ) -> None:
+        await self.repo.update_telegram_channel_watermark(
+            autoposting_id=autoposting_id,
+            tg_channel_username=tg_channel_username,
+            last_message_id=last_message_id
+        )
+
     @traced_method()
     async def transcribe_audio(
             self,
@@ -1100,8 +1297,9 @@ ultrathink
             )
             return transcribed_text
 
-        organization = await self.organization_client.get_organization_by_id(organization_id)
-        organization_cost_multiplier = await self.organization_client.get_cost_multiplier(organization.id)
+        organization, organization_cost_multiplier = await self.organization_client.get_organization_with_cost_multiplier(
+            organization_id
+        )
 
         if self._check_balance(organization, organization_cost_multiplier, "transcribe_audio"):
             self.logger.info("Недостаточно средств на балансе")
@@ -1127,9 +1325,12 @@ ultrathink
             organization_id: int,
             image_file: UploadFile,
             prompt: str,
-    ) -> list[str]:
-        organization = await self.organization_client.get_organization_by_id(organization_id)
-        organization_cost_multiplier = await self.organization_client.get_cost_multiplier(organization.id)
+            draft: bool = False,
+            account_id: int = 0,
+    ) -> tuple[list[str], str]:
+        organization, organization_cost_multiplier = await self.organization_client.get_organization_with_cost_multiplier(
+            organization_id
+        )
 
         if self._check_balance(organization, organization_cost_multiplier, "edit_image"):
             self.logger.info("Недостаточно средств на балансе")
@@ -1140,19 +1341,22 @@ ultrathink
 
         result_image_data, generate_cost = await self.googleai_client.edit_image(
             image_data=image_content,
-            model_name="gemini-3-pro-image-preview",
+            model_name=DRAFT_IMAGE_MODEL if draft else IMAGE_MODEL,
             prompt=prompt,
         )
 
         result_image_base64 = base64.b64encode(result_image_data).decode('utf-8')
         images_url = await self._upload_images([result_image_base64])
 
-        await self._debit_organization_balance(
+        if draft:
+            await self._save_image_drafts(images_url, organization_id, account_id, prompt, image_content)
+
+        cost_rub = await self._debit_organization_balance(
             organization_id,
             generate_cost["total_cost"] * organization_cost_multiplier.generate_image_cost_multiplier
         )
 
-        return images_url
+        return images_url, cost_rub
 
     @traced_method()
     async def combine_images(
@@ -1161,9 +1365,10 @@ ultrathink
             category_id: int,
             images_files: list[UploadFile],
             prompt: str,
-    ) -> list[str]:
-        organization = await self.organization_client.get_organization_by_id(organization_id)
-        organization_cost_multiplier = await self.organization_client.get_cost_multiplier(organization.id)
+    ) -> tuple[list[str], str]:
+        organization, organization_cost_multiplier = await self.organization_client.get_organization_with_cost_multiplier(
+            organization_id
+        )
 
         if self._check_balance(organization, organization_cost_multiplier, "edit_image"):
             self.logger.info("Недостаточно средств на балансе")
@@ -1177,46 +1382,228 @@ ultrathink
         result_image_data, generate_cost = await self.googleai_client.combine_images(
             images_data=images_data,
             prompt=prompt,
-            model_name="gemini-3-pro-image-preview",
+            model_name=IMAGE_MODEL,
         )
 
         result_image_base64 = base64.b64encode(result_image_data).decode('utf-8')
         images_url = await self._upload_images([result_image_base64])
 
-        await self._debit_organization_balance(
+        cost_rub = await self._debit_organization_balance(
             organization_id,
             generate_cost["total_cost"] * organization_cost_multiplier.generate_image_cost_multiplier
         )
 
-        return images_url
+        return images_url, cost_rub
+
+    @traced_method()
+    async def finalize_image_draft(self, draft_image_url: str, account_id: int) -> tuple[list[str], str]:
+        draft_fid, _ = self._parse_image_url(draft_image_url)
+        image_draft = await self.redis.get(self._image_draft_key(draft_fid))
+        # URL черновика публичный, поэтому чужой черновик неотличим от несуществующего
+        if image_draft is None or image_draft.get("account_id") != account_id:
+            raise common.ErrImageDraftNotFound()
+
+        organization_id = image_draft["organization_id"]
+        organization, organization_cost_multiplier = await self.organization_client.get_organization_with_cost_multiplier(
+            organization_id
+        )
+
+        if self._check_balance(organization, organization_cost_multiplier, "generate_image"):
+            self.logger.info("Недостаточно средств на балансе")
+            raise common.ErrInsufficientBalance()
+
+        source_image = None
+        if image_draft.get("source_image_key"):
+            image_draft_source = await self.redis.get(image_draft["source_image_key"])
+            if image_draft_source is None:
+                raise common.ErrImageDraftNotFound()
+            source_image = base64.b64decode(image_draft_source["data"])
+
+        # JSON-промпт уже оплачен при генерации черновика, повторно перерисовываем только изображение
+        self.logger.info("Финализация черновика изображения")
+        result_image_data, generate_cost = await self._render_image(image_draft["prompt"], source_image, IMAGE_MODEL)
+        images_url = await self._upload_images([result_image_data])
+
+        cost_rub = await self._debit_organization_balance(
+            organization_id,
+            generate_cost["total_cost"] * organization_cost_multiplier.generate_image_cost_multiplier
+        )
+
+        return images_url, cost_rub
+
+    async def _render_image(
+            self,
+            image_prompt: str,
+            source_image: bytes | None,
+            model_name: str
+    ) -> tuple[bytes, dict]:
+        if source_image:
+            return await self.googleai_client.edit_image(
+                prompt=image_prompt,
+                image_data=source_image,
+                model_name=model_name,
+            )
+
+        return await self.googleai_client.generate_image(
+            prompt=image_prompt,
+            aspect_ratio="16:9",
+            model_name=model_name,
+        )
+
+    async def _save_image_drafts(
+            self,
+            images_url: list[str],
+            organization_id: int,
+            account_id: int,
+            image_prompt: str,
+            source_image: bytes | None
+    ):
+        # Исходник хранится в Redis одной копией на все варианты и истекает вместе с черновиками,
+        # поэтому в SeaweedFS не остаётся файлов от нефинализированных черновиков
+        source_image_key = None
+        if source_image:
+            source_image_key = f"publication:image_draft_source:{uuid.uuid4().hex}"
+            await self.redis.set(
+                source_image_key,
+                {"data": base64.b64encode(source_image).decode("ascii")},
+                ttl=self.image_draft_ttl
+            )
+
+        image_draft = {
+            "organization_id": organization_id,
+            "account_id": account_id,
+            "prompt": image_prompt,
+            "source_image_key": source_image_key,
+        }
+        for image_url in images_url:
+            draft_fid, _ = self._parse_image_url(image_url)
+            await self.redis.set(self._image_draft_key(draft_fid), image_draft, ttl=self.image_draft_ttl)
+
+    @staticmethod
+    def _image_draft_key(draft_fid: str) -> str:
+        return f"publication:image_draft:{draft_fid}"
+
+    @staticmethod
+    def _parse_image_url(image_url: str) -> tuple[str, str]:
+        fid, name = image_url.rstrip("/").split("/")[-2:]
+        return fid, name
+
+    async def _render_image_variants(
+            self,
+            organization_id: int,
+            render_image: Callable[[], Awaitable[tuple[bytes, dict]]],
+            variants: int
+    ) -> tuple[list[str], float]:
+        semaphore = self.image_semaphores.setdefault(
+            organization_id,
+            asyncio.Semaphore(self.image_concurrency_per_organization)
+        )
+
+        async def render_and_upload() -> tuple[str, float]:
+            async with semaphore:
+                image, generate_cost = await render_image()
+            image_url = (await self._upload_images([image]))[0]
+            return image_url, generate_cost["total_cost"]
+
+        tasks = [asyncio.create_task(render_and_upload()) for _ in range(variants)]
 
-    async def _upload_images(self, images: list[str | bytes]) -> list[str]:
         images_url = []
+        images_cost = 0.0
+        errors = []
+        try:
+            # Итоговый список упорядочен по готовности, неудачный вариант не отменяет остальные
+            for next_variant in asyncio.as_completed(tasks):
+                try:
+                    image_url, image_cost = await next_variant
+                except Exception as err:
+                    self.logger.warning(f"Вариант изображения не сгенерирован: {err}")
+                    errors.append(err)
+                    continue
+
+                images_url.append(image_url)
+                images_cost += image_cost
+        finally:
+            # При отмене запроса списание не выполнится, поэтому незавершённые рендеры останавливаем
+            for task in tasks:
+                task.cancel()
+
+        if not images_url:
+            raise errors[0]
+
+        return images_url, images_cost
+
+    async def _upload_images(self, images: list[str | bytes]) -> list[str]:
+        image_name = "autoposting_image.png"
+
+        files = []
         for image in images:
             if isinstance(image, str):
                 image_bytes = base64.b64decode(image)
             else:
                 image_bytes = image
-            image_name = "autoposting_image.png"
+            files.append((io.BytesIO(image_bytes), image_name))
 
-            upload_response = await self.storage.upload(io.BytesIO(image_bytes), image_name)
+        upload_responses = await self.storage.upload_many(files)
 
-            image_url = f"https://{self.loom_domain}/api/content/image/{upload_response.fid}/{image_name}"
-            images_url.append(image_url)
-        return images_url
+        return [
+            f"https://{self.loom_domain}/api/content/image/{upload_response.fid}/{image_name}"
+            for upload_response in upload_responses
+        ]
+
+    @staticmethod
+    def _publication_text_history() -> list[dict]:
+        return [
+            {
+                "role": "user",
+                "content": """
+<system>
+Очень хорошо подумай, чтобы соответсовать всему что промпте, ты должен учесть все что относится к рубрике и организации
+Обрати внимание на каждый XML тег и проанализуй данные в нем
+Большое внимание на <good_samples> и <bad_samples>
+
+ultrathink
+<system/>
+
+<user>
+Создай текст для поста
+</user>
+                        """
+            }
+        ]
+
+    def _record_llm_input_tokens(self, operation: str, generate_cost: dict):
+        tokens = generate_cost.get("details", {}).get("tokens")
+        if not tokens:
+            return
+
+        cache_read_tokens = tokens.get("cached_tokens", 0)
+        cache_creation_tokens = tokens.get("cache_creation_tokens", 0)
+        regular_tokens = tokens.get("regular_input_tokens", 0)
+
+        self.llm_input_tokens_counter.add(cache_read_tokens, {"operation": operation, "kind": "cache_read"})
+        self.llm_input_tokens_counter.add(cache_creation_tokens, {"operation": operation, "kind": "cache_creation"})
+        self.llm_input_tokens_counter.add(regular_tokens, {"operation": operation, "kind": "regular"})
+
+        self.logger.info("Токены промпта Claude", {
+            "operation": operation,
+            "cache_read_tokens": cache_read_tokens,
+            "cache_creation_tokens": cache_creation_tokens,
+            "regular_input_tokens": regular_tokens,
+        })
 
     def _check_balance(
             self,
             organization: model.Organization,
             organization_cost_multiplier: model.CostMultiplier,
-            operation: str
+            operation: str,
+            units: int = 1
     ) -> bool:
+        if operation == "generate_image":
+            return float(
+                organization.rub_balance) < organization_cost_multiplier.generate_image_cost_multiplier * self.avg_generate_image_rub_cost * units
         if operation == "generate_text":
             return float(
                 organization.rub_balance) < organization_cost_multiplier.generate_text_cost_multiplier * self.avg_generate_text_rub_cost
-        elif operation == "generate_image":
-            return float(
-                organization.rub_balance) < organization_cost_multiplier.generate_image_cost_multiplier * self.avg_generate_image_rub_cost
         elif operation == "edit_image":
             return float(
                 organization.rub_balance) < organization_cost_multiplier.generate_image_cost_multiplier * self.avg_edit_image_rub_cost
@@ -1225,11 +1612,12 @@ ultrathink
                 organization.rub_balance) < organization_cost_multiplier.transcribe_audio_cost_multiplier * self.avg_transcribe_audio_rub_cost
         return True
 
-    async def _debit_organization_balance(self, organization_id: int, usd_cost: float):
+    async def _debit_organization_balance(self, organization_id: int, usd_cost: float) -> str:
         usd_cost = Decimal(str(usd_cost))
         usd_to_rub_rate = Decimal("90.00")
         rub_amount_str = str((usd_cost * usd_to_rub_rate).quantize(Decimal("0.01")))
         await self.organization_client.debit_balance(organization_id, rub_amount_str)
+        return rub_amount_str
 
     async def _publish_to_telegram(self, publication: model.Publication) -> str:
         telegram_account = (await self.social_network_repo.get_telegrams_by_organization(
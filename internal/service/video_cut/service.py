@@ -1,9 +1,10 @@
-import io
+import asyncio
 import json
+from typing import AsyncIterator
 
 import aiohttp
 from aiogram import Bot
-from aiogram.types import BufferedInputFile
+from aiogram.types import URLInputFile
 
 from internal import interface, model
 
@@ -20,8 +21,8 @@ class VideoCutService(interface.IVideoCutService):
             organization_client: interface.ILoomOrganizationClient,
             loom_tg_bot_client: interface.ILoomTgBotClient,
             vizard_client: interface.IVizardClient,
-            bot: Bot
-
+            bot: Bot,
+            upload_concurrency: int = 4,
     ):
         self.tracer = tel.tracer()
         self.logger = tel.logger()
@@ -31,6 +32,8 @@ class VideoCutService(interface.IVideoCutService):
         self.loom_tg_bot_client = loom_tg_bot_client
         self.vizard_client = vizard_client
         self.bot = bot
+        # Тот же предел, что у storage.upload_many: каждая нарезка держит в памяти свой чанк
+        self.upload_concurrency = upload_concurrency
 
     @traced_method()
     async def generate_vizard_video_cuts(
@@ -82,15 +85,27 @@ class VideoCutService(interface.IVideoCutService):
         total_rub_cost = credit_usage * rub_cost_per_credit
         rub_cost_per_video = total_rub_cost // len(videos)
 
-        for video in videos:
-            video_content, content_type = await self._download_video_from_url(video.videoUrl)
-            video_io = io.BytesIO(video_content)
+        extension = ".mp4"
+        videos_name = [f"video_cut_{video.videoId}_{project_id}{extension}" for video in videos]
+
+        # Нарезки перекачиваются из Vizard в хранилище потоком, не оседая в памяти;
+        # число одновременных загрузок ограничено, чтобы пик памяти не рос с числом нарезок
+        semaphore = asyncio.Semaphore(self.upload_concurrency)
 
-            extension = ".mp4"
-            video_name = f"video_cut_{video.videoId}_{project_id}{extension}"
+        async def upload_video(video: Video, video_name: str) -> model.AsyncWeedOperationResponse:
+            async with semaphore:
+                return await self.storage.upload_stream(
+                    self._stream_video_from_url(video.videoUrl),
+                    video_name,
+                    "video/mp4"
+                )
 
-            upload_response = await self.storage.upload(video_io, video_name)
+        upload_responses = await asyncio.gather(*[
+            upload_video(video, video_name)
+            for video, video_name in zip(videos, videos_name)
+        ])
 
+        for video, video_name, upload_response in zip(videos, videos_name, upload_responses):
             tags = json.loads(video.relatedTopic)
 
             video_cut_id = await self.repo.create_vizard_video_cut(
@@ -107,9 +122,10 @@ class VideoCutService(interface.IVideoCutService):
                 video_fid=upload_response.fid,
                 vizard_rub_cost=rub_cost_per_video
             )
+            # aiogram сам стримит файл по ссылке в Telegram
             resp = await self.bot.send_video(
                 7529376518,
-                video=BufferedInputFile(video_content, filename=video_name)
+                video=URLInputFile(video.videoUrl, filename=video_name)
             )
             await self.loom_tg_bot_client.set_cache_file(
                 video_name,
@@ -217,26 +233,26 @@ class VideoCutService(interface.IVideoCutService):
     @traced_method()
     async def download_video_cut(
             self,
-            video_cut_id: int
-    ) -> tuple[io.BytesIO, str, str]:
+            video_cut_id: int,
+            byte_range: str = None,
+            if_none_match: str = None
+    ) -> tuple[model.StorageStream, str]:
         video_cut = (await self.repo.get_video_cut_by_id(video_cut_id))[0]
 
-        video_io, content_type = await self.storage.download(
+        video_stream = await self.storage.download_stream(
             video_cut.video_fid,
-            video_cut.video_name
+            video_cut.video_name,
+            byte_range,
+            if_none_match
         )
 
-        return video_io, content_type, video_cut.video_name
+        return video_stream, video_cut.video_name
 
-    async def _download_video_from_url(self, video_url: str) -> tuple[bytes, str]:
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(video_url) as response:
-                    if response.status == 200:
-                        content_type = response.headers.get('content-type', 'video/mp4')
-                        content = await response.read()
-                        return content, content_type
-                    else:
-                        raise Exception(f"Failed to download video: HTTP {response.status}")
-        except Exception as err:
-            raise err
+    async def _stream_video_from_url(self, video_url: str) -> AsyncIterator[bytes]:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(video_url) as response:
+                if response.status != 200:
+                    raise Exception(f"Failed to download video: HTTP {response.status}")
+
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    yield chunk
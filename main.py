@@ -10,6 +10,7 @@ from aiogram.client.telegram import TelegramAPIServer
 from infrastructure.pg.pg import PG
 from infrastructure.telemetry.telemetry import Telemetry, AlertManager
 from infrastructure.weedfs.weedfs import AsyncWeed
+from infrastructure.redis_client.redis_client import RedisClient
 from pkg.client.external.claude.client import AnthropicClient
 from pkg.client.external.telegram.client import LTelegramClient
 
@@ -19,10 +20,12 @@ from pkg.client.external.googleai.client import GoogleAIClient
 
 from pkg.client.internal.loom_authorization.client import LoomAuthorizationClient
 from pkg.client.internal.loom_organization.client import LoomOrganizationClient
+from pkg.client.internal.loom_organization.cached_client import CachedLoomOrganizationClient
 from pkg.client.internal.loom_tg_bot.client import LoomTgBotClient
 from pkg.client.internal.loom_employee.client import LoomEmployeeClient
 
 from internal.controller.http.middlerware.middleware import HttpMiddleware
+from internal.controller.http.middlerware.idempotency import IdempotencyGuard
 from internal.controller.http.handler.publication.handler import PublicationController
 from internal.controller.http.handler.video_cut.handler import VideoCutController
 from internal.controller.http.handler.social_network.handler import SocialNetworkController
@@ -31,13 +34,21 @@ from internal.service.video_cut.service import VideoCutService
 from internal.service.publication.service import PublicationService
 from internal.service.social_network.service import SocialNetworkService
 from internal.service.publication.prompt import PublicationPromptGenerator
+from internal.service.job.service import JobService
+from internal.service.image_job.service import ImageJobService
 
 from internal.repo.publication.repo import PublicationRepo
+from internal.repo.publication.category_cache import CategoryCache
 from internal.repo.video_cut.repo import VideoCutRepo
 from internal.repo.social_network.repo import SocialNetworkRepo
+from internal.repo.job.repo import JobRepo
 
 from internal.app.http.app import NewHTTP
 from internal.app.autoposting.app import Autoposting
+from internal.app.autoposting.prefilter import new_post_prefilter
+from internal.app.autoposting.channel_cache import ChannelPostCache
+from internal.app.autoposting.jobs import AutopostingJobs
+from internal.app.job_worker.app import JobWorker
 
 from internal.config.config import Config
 
@@ -81,7 +92,8 @@ tel = Telemetry(
 
 # Инициализация базы данных
 db = PG(tel, cfg.db_user, cfg.db_pass, cfg.db_host, cfg.db_port, cfg.db_name)
-storage = AsyncWeed(cfg.weed_master_host, cfg.weed_master_port)
+storage = AsyncWeed(cfg.weed_master_host, cfg.weed_master_port, volume_cache_ttl=cfg.weed_volume_cache_ttl)
+redis = RedisClient(cfg.redis_host, cfg.redis_port, cfg.redis_db, cfg.redis_password)
 
 session = AiohttpSession(api=TelegramAPIServer.from_base(f'https://{cfg.domain}/telegram-bot-api'))
 bot = Bot(token=cfg.tg_bot_token, session=session)
@@ -108,6 +120,12 @@ loom_organization_client = LoomOrganizationClient(
     interserver_secret_key=cfg.interserver_secret_key,
     log_context=log_context
 )
+loom_organization_client = CachedLoomOrganizationClient(
+    tel=tel,
+    client=loom_organization_client,
+    organization_ttl=cfg.organization_cache_ttl,
+    cost_multiplier_ttl=cfg.cost_multiplier_cache_ttl,
+)
 loom_tg_bot_client = LoomTgBotClient(
     tel=tel,
     host=cfg.loom_tg_bot_host,
@@ -137,16 +155,21 @@ vizard_client = VizardClient(
 )
 
 telegram_client = LTelegramClient(
+    tel,
+    redis,
     cfg.tg_bot_token,
-    cfg.tg_session_string,
+    cfg.tg_session_strings,
     cfg.tg_api_id,
     cfg.tg_api_hash,
+    cfg.tg_entity_cache_ttl,
 )
 
 # Инициализация репозиториев
-publication_repo = PublicationRepo(tel, db)
+category_cache = CategoryCache(tel, redis, cfg.category_cache_size, cfg.category_cache_ttl)
+publication_repo = PublicationRepo(tel, db, category_cache)
 video_cut_repo = VideoCutRepo(tel, db)
 social_network_repo = SocialNetworkRepo(tel, db)
+job_repo = JobRepo(tel, db)
 
 
 # Инициализация генератора промптов
@@ -167,7 +190,10 @@ publication_service = PublicationService(
     telegram_client=telegram_client,
     loom_tg_bot_client=loom_tg_bot_client,
     loom_domain=cfg.domain,
-    environment=cfg.environment
+    environment=cfg.environment,
+    redis=redis,
+    image_concurrency_per_organization=cfg.image_variants_concurrency,
+    image_draft_ttl=cfg.image_draft_ttl
 )
 
 video_cut_service = VideoCutService(
@@ -177,7 +203,8 @@ video_cut_service = VideoCutService(
     organization_client=loom_organization_client,
     loom_tg_bot_client=loom_tg_bot_client,
     vizard_client=vizard_client,
-    bot=bot
+    bot=bot,
+    upload_concurrency=storage.upload_concurrency,
 )
 
 social_network_service = SocialNetworkService(
@@ -186,21 +213,90 @@ social_network_service = SocialNetworkService(
     telegram_client=telegram_client,
 )
 
+job_service = JobService(
+    tel=tel,
+    repo=job_repo,
+    max_attempts=cfg.job_max_attempts,
+    base_retry_delay=cfg.job_base_retry_delay,
+    max_retry_delay=cfg.job_max_retry_delay,
+)
+
+job_worker = JobWorker(
+    tel=tel,
+    job_service=job_service,
+    worker_id=cfg.autoposting_worker_id,
+    concurrency=cfg.job_concurrency,
+    job_timeout=cfg.job_timeout,
+    poll_interval=cfg.job_poll_interval,
+)
+
+autoposting_jobs = AutopostingJobs(
+    tel=tel,
+    job_service=job_service,
+    publication_service=publication_service,
+    loom_employee_client=loom_employee_client,
+)
+autoposting_jobs.register(job_worker)
+
+image_job_service = ImageJobService(
+    tel=tel,
+    job_service=job_service,
+    publication_service=publication_service,
+    storage=storage,
+    max_attempts=cfg.image_job_max_attempts,
+    webhook_allowed_hosts=cfg.image_job_webhook_allowed_hosts,
+)
+
+image_job_worker = JobWorker(
+    tel=tel,
+    job_service=job_service,
+    worker_id=cfg.autoposting_worker_id,
+    concurrency=cfg.image_job_concurrency,
+    job_timeout=cfg.image_job_timeout,
+    poll_interval=cfg.job_poll_interval,
+)
+for job_type, handler in image_job_service.handlers().items():
+    image_job_worker.register(job_type, handler)
+
 # Инициализация контроллеров
-publication_controller = PublicationController(tel, publication_service)
+idempotency_guard = IdempotencyGuard(tel, redis, cfg.idempotency_ttl)
+publication_controller = PublicationController(tel, publication_service, image_job_service, idempotency_guard)
 video_cut_controller = VideoCutController(tel, video_cut_service)
 social_network_controller = SocialNetworkController(tel, social_network_service)
 
 # Инициализация middleware
 http_middleware = HttpMiddleware(tel, loom_authorization_client, cfg.prefix, log_context)
 
+post_prefilter = new_post_prefilter(
+    tel=tel,
+    min_length=cfg.autoposting_prefilter_min_length,
+    allowed_scripts=cfg.autoposting_prefilter_scripts,
+    similarity_threshold=cfg.autoposting_prefilter_similarity_threshold,
+    reject_forwarded=cfg.autoposting_prefilter_reject_forwarded,
+)
+
+channel_post_cache = ChannelPostCache(
+    tel=tel,
+    telegram_client=telegram_client,
+    ttl=cfg.autoposting_channel_cache_ttl,
+)
+
 autoposting = Autoposting(
     tel=tel,
     publication_service=publication_service,
     telegram_client=telegram_client,
     openai_client=openai_client,
     prompt_generator=publication_prompt_generator,
-    loom_employee_client=loom_employee_client
+    autoposting_jobs=autoposting_jobs,
+    post_prefilter=post_prefilter,
+    channel_post_cache=channel_post_cache,
+    max_workers=cfg.autoposting_max_workers,
+    max_workers_per_organization=cfg.autoposting_max_workers_per_organization,
+    autoposting_timeout=cfg.autoposting_timeout,
+    worker_id=cfg.autoposting_worker_id,
+    sync_interval=cfg.autoposting_sync_interval,
+    filter_batch_size=cfg.autoposting_filter_batch_size,
+    filter_batch_token_budget=cfg.autoposting_filter_batch_token_budget,
 )
 
 app = NewHTTP(
@@ -210,7 +306,8 @@ app = NewHTTP(
     social_network_controller=social_network_controller,
     http_middleware=http_middleware,
     prefix=cfg.prefix,
-    environment=cfg.environment
+    environment=cfg.environment,
+    background_tasks=[image_job_worker.run],
 )
 
 if __name__ == "__main__":
@@ -230,6 +327,12 @@ if __name__ == "__main__":
         )
 
     elif args.mode == "autoposting":
+        async def run_autoposting():
+            await asyncio.gather(
+                autoposting.run(),
+                job_worker.run(),
+            )
+
         asyncio.run(
-            autoposting.run()
+            run_autoposting()
         )
@@ -2,6 +2,7 @@ import re
 import json
 import ast
 import base64
+from typing import AsyncIterator
 
 import httpx
 from anthropic import AsyncAnthropic
@@ -9,7 +10,7 @@ from anthropic.types import Message
 
 from opentelemetry.trace import SpanKind
 
-from internal import interface
+from internal import interface, model
 from pkg.trace_wrapper import traced_method
 
 from .price import *
@@ -48,7 +49,7 @@ class AnthropicClient(interface.IAnthropicClient):
     async def generate_str(
             self,
             history: list,
-            system_prompt: str,
+            system_prompt: str | list[model.PromptSegment],
             temperature: float = 1.0,
             llm_model: str = "claude-haiku-4-5",
             max_tokens: int = 4096,
@@ -59,39 +60,19 @@ class AnthropicClient(interface.IAnthropicClient):
             max_searches: int = 5,
             images: list[bytes] = None,
     ) -> tuple[str, dict]:
-        messages = self._prepare_messages(history, enable_caching=enable_caching, images=images)
-
-        api_params: dict = {
-            "model": llm_model,
-            "max_tokens": max_tokens,
-            "temperature": temperature,
-            "messages": messages
-        }
-
-        if system_prompt:
-            if enable_caching:
-                api_params["system"] = [
-                    {
-                        "type": "text",
-                        "text": system_prompt,
-                        "cache_control": {"type": "ephemeral", "ttl": cache_ttl}
-                    }
-                ]
-            else:
-                api_params["system"] = system_prompt
-
-        if enable_web_search:
-            api_params["tools"] = [{
-                "type": "web_search_20250305",
-                "name": "web_search",
-                "max_uses": max_searches
-            }]
-
-        if thinking_tokens is not None and thinking_tokens > 0:
-            api_params["thinking"] = {
-                "type": "enabled",
-                "budget_tokens": thinking_tokens
-            }
+        api_params = self._build_api_params(
+            history,
+            system_prompt,
+            temperature,
+            llm_model,
+            max_tokens,
+            thinking_tokens,
+            enable_caching,
+            cache_ttl,
+            enable_web_search,
+            max_searches,
+            images
+        )
 
         completion_response = await self.client.messages.create(**api_params)
 
@@ -114,7 +95,7 @@ class AnthropicClient(interface.IAnthropicClient):
     async def generate_json(
             self,
             history: list,
-            system_prompt: str,
+            system_prompt: str | list[model.PromptSegment],
             temperature: float = 1.0,
             llm_model: str = "claude-haiku-4-5",
             max_tokens: int = 4096,
@@ -153,44 +134,195 @@ class AnthropicClient(interface.IAnthropicClient):
                 system_prompt,
                 enable_caching,
             )
-            generate_cost = {
-                'total_cost': round(generate_cost["total_cost"] + retry_generate_cost["total_cost"], 6),
-                'input_cost': round(generate_cost["input_cost"] + retry_generate_cost["input_cost"], 6),
-                'output_cost': round(generate_cost["output_cost"] + retry_generate_cost["output_cost"], 6),
-                'cached_tokens_savings': round(
-                    generate_cost["cached_tokens_savings"] + retry_generate_cost["cached_tokens_savings"], 6),
-                'details': {
-                    'model': llm_model,
-                    'tokens': {
-                        'total_input_tokens': generate_cost["details"]["tokens"]["total_input_tokens"] +
-                                              retry_generate_cost["details"]["tokens"]["total_input_tokens"],
-                        'regular_input_tokens': generate_cost["details"]["tokens"]["regular_input_tokens"] +
-                                                retry_generate_cost["details"]["tokens"]["regular_input_tokens"],
-                        'cached_tokens': generate_cost["details"]["tokens"]["cached_tokens"] +
-                                         retry_generate_cost["details"]["tokens"]["cached_tokens"],
-                        'output_tokens': generate_cost["details"]["tokens"]["output_tokens"] +
-                                         retry_generate_cost["details"]["tokens"]["output_tokens"],
-                        'total_tokens': generate_cost["details"]["tokens"]["total_tokens"] +
-                                        retry_generate_cost["details"]["tokens"]["total_tokens"]
-                    },
-                    'costs': {
-                        'regular_input_cost': round(
-                            generate_cost["details"]["costs"]["regular_input_cost"] +
-                            retry_generate_cost["details"]["costs"]["regular_input_cost"], 6),
-                        'cached_input_cost': round(
-                            generate_cost["details"]["costs"]["cached_input_cost"] +
-                            retry_generate_cost["details"]["costs"]["cached_input_cost"], 6),
-                        'output_cost': round(
-                            generate_cost["details"]["costs"]["output_cost"] +
-                            retry_generate_cost["details"]["costs"]["output_cost"], 6)
-                    },
-                    'pricing': generate_cost["details"]["pricing"]
-                }
-            }
+            generate_cost = self._merge_generate_cost(generate_cost, retry_generate_cost, llm_model)
 
         self.logger.info("Ответ от LLM", {"llm_response": llm_response_json})
         return llm_response_json, generate_cost
 
+    async def stream_json(
+            self,
+            history: list,
+            system_prompt: str | list[model.PromptSegment],
+            temperature: float = 1.0,
+            llm_model: str = "claude-haiku-4-5",
+            max_tokens: int = 4096,
+            thinking_tokens: int = None,
+            enable_caching: bool = True,
+            cache_ttl: str = "5m",
+            enable_web_search: bool = True,
+            max_searches: int = 5,
+            images: list[bytes] = None,
+    ) -> AsyncIterator[dict]:
+        """
+        Потоковая генерация JSON.
+
+        События: {"type": "thinking", "status": "started" | "finished"},
+        {"type": "web_search"}, {"type": "text_delta", "text": ...}
+        и последним {"type": "result", "json": ..., "cost": ...}.
+        """
+        api_params = self._build_api_params(
+            history,
+            system_prompt,
+            temperature,
+            llm_model,
+            max_tokens,
+            thinking_tokens,
+            enable_caching,
+            cache_ttl,
+            enable_web_search,
+            max_searches,
+            images
+        )
+
+        async with self.client.messages.stream(**api_params) as stream:
+            block_types: dict[int, str] = {}
+
+            async for event in stream:
+                if event.type == "content_block_start":
+                    block_types[event.index] = event.content_block.type
+                    if event.content_block.type == "thinking":
+                        yield {"type": "thinking", "status": "started"}
+                    elif event.content_block.type == "server_tool_use":
+                        yield {"type": "web_search"}
+
+                elif event.type == "content_block_delta":
+                    if event.delta.type == "text_delta":
+                        yield {"type": "text_delta", "text": event.delta.text}
+
+                elif event.type == "content_block_stop":
+                    if block_types.get(event.index) == "thinking":
+                        yield {"type": "thinking", "status": "finished"}
+
+            completion_response = await stream.get_final_message()
+
+        generate_cost = self._calculate_llm_cost(completion_response, llm_model)
+
+        llm_response_str = ""
+        for content_block in completion_response.content:
+            if content_block.type == "text":
+                llm_response_str += content_block.text
+
+        try:
+            llm_response_json = self._extract_and_parse_json(llm_response_str)
+        except Exception:
+            llm_response_json, retry_generate_cost = await self._retry_llm_generate(
+                history,
+                llm_model,
+                temperature,
+                llm_response_str,
+                system_prompt,
+                enable_caching,
+            )
+            generate_cost = self._merge_generate_cost(generate_cost, retry_generate_cost, llm_model)
+
+        self.logger.info("Ответ от LLM", {"llm_response": llm_response_json})
+        yield {"type": "result", "json": llm_response_json, "cost": generate_cost}
+
+    def _build_api_params(
+            self,
+            history: list,
+            system_prompt: str | list[model.PromptSegment],
+            temperature: float,
+            llm_model: str,
+            max_tokens: int,
+            thinking_tokens: int | None,
+            enable_caching: bool,
+            cache_ttl: str,
+            enable_web_search: bool,
+            max_searches: int,
+            images: list[bytes] | None,
+    ) -> dict:
+        messages = self._prepare_messages(history, enable_caching=enable_caching, images=images)
+
+        api_params: dict = {
+            "model": llm_model,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "messages": messages
+        }
+
+        if system_prompt:
+            api_params["system"] = self._build_system(system_prompt, enable_caching, cache_ttl)
+
+        if enable_web_search:
+            api_params["tools"] = [{
+                "type": "web_search_20250305",
+                "name": "web_search",
+                "max_uses": max_searches
+            }]
+
+        if thinking_tokens is not None and thinking_tokens > 0:
+            api_params["thinking"] = {
+                "type": "enabled",
+                "budget_tokens": thinking_tokens
+            }
+
+        return api_params
+
+    @staticmethod
+    def _build_system(
+            system_prompt: str | list[model.PromptSegment],
+            enable_caching: bool,
+            cache_ttl: str = "5m",
+    ) -> str | list[dict]:
+        if isinstance(system_prompt, str):
+            system_prompt = [model.PromptSegment(text=system_prompt, cache=True)]
+
+        if not enable_caching:
+            return "".join(segment.text for segment in system_prompt)
+
+        # API допускает 4 точки кеширования, одна может уйти на историю сообщений.
+        # Оставляем последние: каждая из них покрывает весь префикс до себя
+        cached_indexes = [index for index, segment in enumerate(system_prompt) if segment.cache][-3:]
+
+        system_blocks = []
+        for index, segment in enumerate(system_prompt):
+            system_block = {"type": "text", "text": segment.text}
+            if index in cached_indexes:
+                system_block["cache_control"] = {"type": "ephemeral", "ttl": cache_ttl}
+            system_blocks.append(system_block)
+
+        return system_blocks
+
+    @staticmethod
+    def _merge_generate_cost(generate_cost: dict, retry_generate_cost: dict, llm_model: str) -> dict:
+        return {
+            'total_cost': round(generate_cost["total_cost"] + retry_generate_cost["total_cost"], 6),
+            'input_cost': round(generate_cost["input_cost"] + retry_generate_cost["input_cost"], 6),
+            'output_cost': round(generate_cost["output_cost"] + retry_generate_cost["output_cost"], 6),
+            'cached_tokens_savings': round(
+                generate_cost["cached_tokens_savings"] + retry_generate_cost["cached_tokens_savings"], 6),
+            'details': {
+                'model': llm_model,
+                'tokens': {
+                    'total_input_tokens': generate_cost["details"]["tokens"]["total_input_tokens"] +
+                                          retry_generate_cost["details"]["tokens"]["total_input_tokens"],
+                    'regular_input_tokens': generate_cost["details"]["tokens"]["regular_input_tokens"] +
+                                            retry_generate_cost["details"]["tokens"]["regular_input_tokens"],
+                    'cached_tokens': generate_cost["details"]["tokens"]["cached_tokens"] +
+                                     retry_generate_cost["details"]["tokens"]["cached_tokens"],
+                    'cache_creation_tokens': generate_cost["details"]["tokens"].get("cache_creation_tokens", 0) +
+                                             retry_generate_cost["details"]["tokens"].get("cache_creation_tokens", 0),
+                    'output_tokens': generate_cost["details"]["tokens"]["output_tokens"] +
+                                     retry_generate_cost["details"]["tokens"]["output_tokens"],
+                    'total_tokens': generate_cost["details"]["tokens"]["total_tokens"] +
+                                    retry_generate_cost["details"]["tokens"]["total_tokens"]
+                },
+                'costs': {
+                    'regular_input_cost': round(
+                        generate_cost["details"]["costs"]["regular_input_cost"] +
+                        retry_generate_cost["details"]["costs"]["regular_input_cost"], 6),
+                    'cached_input_cost': round(
+                        generate_cost["details"]["costs"]["cached_input_cost"] +
+                        retry_generate_cost["details"]["costs"]["cached_input_cost"], 6),
+                    'output_cost': round(
+                        generate_cost["details"]["costs"]["output_cost"] +
+                        retry_generate_cost["details"]["costs"]["output_cost"], 6)
+                },
+                'pricing': generate_cost["details"]["pricing"]
+            }
+        }
+
     def _prepare_messages(
             self,
             history: list,
@@ -378,7 +510,7 @@ class AnthropicClient(interface.IAnthropicClient):
             llm_model: str,
             temperature: float,
             llm_response_str: str,
-            system_prompt: str,
+            system_prompt: str | list[model.PromptSegment],
             enable_caching: bool = True,
     ) -> tuple[dict, dict]:
         self.logger.warning("LLM потребовался retry", {"llm_response": llm_response_str})
@@ -401,16 +533,7 @@ class AnthropicClient(interface.IAnthropicClient):
         }
 
         if system_prompt:
-            if enable_caching:
-                api_params["system"] = [
-                    {
-                        "type": "text",
-                        "text": system_prompt,
-                        "cache_control": {"type": "ephemeral"}
-                    }
-                ]
-            else:
-                api_params["system"] = system_prompt
+            api_params["system"] = self._build_system(system_prompt, enable_caching)
 
         completion_response = await self.client.messages.create(**api_params)
 
@@ -1,5 +1,6 @@
 import base64
 import asyncio
+from typing import AsyncIterator
 
 from aiogram import Bot
 from aiogram.types import BufferedInputFile
@@ -9,31 +10,40 @@ import segno
 from telethon import TelegramClient as TelethonClient
 from telethon.sessions import StringSession
 from telethon.tl.functions.auth import ExportLoginTokenRequest
+from telethon.tl.types import InputPeerChannel
 from telethon.tl.types.auth import LoginTokenSuccess
 from telethon.errors import (
     AuthTokenExpiredError,
     AuthTokenAlreadyAcceptedError,
     AuthTokenInvalidError,
+    FloodWaitError,
+    ChannelInvalidError,
+    ChannelPrivateError,
 )
 
 from internal import interface
+from pkg.client.external.telegram.entity_cache import TelegramEntityCache
+from pkg.client.external.telegram.session_pool import TelethonSessionPool, TelethonSession
 
 
 class LTelegramClient(interface.ITelegramClient):
     def __init__(
             self,
+            tel: interface.ITelemetry,
+            redis: interface.IRedis,
             bot_token: str,
-            session_string: str,
+            session_strings: list[str],
             api_id: int,
             api_hash: str,
+            entity_cache_ttl: int = 7 * 24 * 60 * 60,
     ):
         self.bot = Bot(token=bot_token)
         self.bot.session.middleware(AiogramSulgukMiddleware())
 
         self.api_id = api_id
         self.api_hash = api_hash
-        self.session_string = session_string
-        self.telegram_client: TelethonClient | None = None
+        self.session_pool = TelethonSessionPool(tel, session_strings, api_id, api_hash)
+        self.entity_cache = TelegramEntityCache(tel, redis, entity_cache_ttl)
 
     async def send_text_message(
             self,
@@ -192,60 +202,122 @@ class LTelegramClient(interface.ITelegramClient):
             channel_id: str,
             limit: int = None
     ) -> list[dict]:
-        try:
-            if not self.telegram_client:
-                client = TelethonClient(
-                    StringSession(self.session_string),
-                    self.api_id,
-                    self.api_hash,
-                    device_model='Server',
-                    system_version='Linux',
-                    app_version='1.0',
-                    lang_code='ru'
-                )
-                await client.connect()
-                self.telegram_client = client
-
-            # Проверяем авторизацию
-            if not await self.telegram_client.is_user_authorized():
-                raise Exception("Session string недействительна")
-
-            # Нормализуем ID канала
-            if not channel_id.startswith('@'):
-                channel_id = f"@{channel_id}"
-
-            # Получаем информацию о канале
-            entity = await self.telegram_client.get_entity(channel_id)
-
-            posts = []
-            async for message in self.telegram_client.iter_messages(entity, limit=limit):
-                # Определяем тип медиа
-                media_type = None
-                if message.media:
-                    if hasattr(message.media, 'photo'):
-                        media_type = 'photo'
-                    elif hasattr(message.media, 'document'):
-                        if message.video:
-                            media_type = 'video'
-                        else:
-                            media_type = 'document'
-
-                # Формируем ссылку на пост
-                channel_username = entity.username if hasattr(entity, 'username') and entity.username else str(entity.id)
-                post_link = self._create_post_link(channel_username, message.id)
-
-                post_data = {
-                    'id': message.id,
-                    'date': message.date,
-                    'text': message.text or '',
-                    'views': message.views or 0,
-                    'media_type': media_type,
-                    'link': post_link,
-                }
-
-                posts.append(post_data)
-
-            return posts
+        posts = []
+        async for post_data in self.iter_channel_posts(channel_id, limit=limit):
+            posts.append(post_data)
 
-        except Exception as e:
-            raise
\ No newline at end of file
+        return posts
+
+    async def iter_channel_posts(
+            self,
+            channel_id: str,
+            min_id: int = 0,
+            limit: int = None
+    ) -> AsyncIterator[dict]:
+        """Посты канала от новых к старым, только с id больше min_id"""
+        # Нормализуем ID канала
+        if not channel_id.startswith('@'):
+            channel_id = f"@{channel_id}"
+
+        yielded = 0
+        offset_id = 0
+
+        while True:
+            session = await self.session_pool.acquire()
+            try:
+                peer, channel_username, cached = await self._resolve_channel(session, channel_id)
+
+                try:
+                    messages = self._iter_messages(session, peer, limit, yielded, min_id, offset_id)
+                    first_message = await anext(messages, None)
+                except (ChannelInvalidError, ChannelPrivateError, ValueError):
+                    if not cached:
+                        raise
+                    # Запись устарела: канал пересоздан или username перешёл другому каналу
+                    await self.invalidate_channel_entity(channel_id)
+                    peer, channel_username, _ = await self._resolve_channel(session, channel_id)
+                    messages = self._iter_messages(session, peer, limit, yielded, min_id, offset_id)
+                    first_message = await anext(messages, None)
+
+                if first_message is None:
+                    return
+
+                async for message in self._prepend(first_message, messages):
+                    # Определяем тип медиа
+                    media_type = None
+                    if message.media:
+                        if hasattr(message.media, 'photo'):
+                            media_type = 'photo'
+                        elif hasattr(message.media, 'document'):
+                            if message.video:
+                                media_type = 'video'
+                            else:
+                                media_type = 'document'
+
+                    # Формируем ссылку на пост
+                    post_link = self._create_post_link(channel_username, message.id)
+
+                    yield {
+                        'id': message.id,
+                        'date': message.date,
+                        'text': message.text or '',
+                        'views': message.views or 0,
+                        'media_type': media_type,
+                        'link': post_link,
+                        'forwarded': message.fwd_from is not None,
+                    }
+
+                    yielded += 1
+                    offset_id = message.id
+
+                return
+
+            except FloodWaitError as err:
+                # Продолжаем с того же места через другую сессию
+                self.session_pool.mark_flood_wait(session, err.seconds)
+
+            finally:
+                self.session_pool.release(session)
+
+    async def invalidate_channel_entity(self, channel_id: str):
+        account_keys = [session.account_key for session in self.session_pool.sessions]
+        await self.entity_cache.invalidate(account_keys, channel_id)
+
+    async def _resolve_channel(
+            self,
+            session: TelethonSession,
+            channel_id: str
+    ) -> tuple[InputPeerChannel, str, bool]:
+        # access_hash у каждого аккаунта свой, поэтому канал разрешаем в рамках сессии
+        cached = await self.entity_cache.get(session.account_key, channel_id)
+        if cached is not None:
+            peer, channel_username = cached
+            return peer, channel_username, True
+
+        entity = await session.client.get_entity(channel_id)
+        await self.entity_cache.set(session.account_key, channel_id, entity)
+
+        channel_username = entity.username if hasattr(entity, 'username') and entity.username else str(entity.id)
+        return InputPeerChannel(channel_id=entity.id, access_hash=entity.access_hash), channel_username, False
+
+    @staticmethod
+    def _iter_messages(
+            session: TelethonSession,
+            peer: InputPeerChannel,
+            limit: int | None,
+            yielded: int,
+            min_id: int,
+            offset_id: int
+    ):
+        return session.client.iter_messages(
+            peer,
+            limit=None if limit is None else limit - yielded,
+            min_id=min_id,
+            offset_id=offset_id
+        )
+
+    @staticmethod
+    async def _prepend(first_message, messages):
+        yield first_message
+        async for message in messages:
+            yield message
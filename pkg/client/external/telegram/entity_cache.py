@@ -0,0 +1,63 @@
+from telethon.tl.types import InputPeerChannel
+
+from internal import interface
+
+
+class TelegramEntityCache:
+    """
+    Кеш разрешения username канала в id и access_hash.
+
+    contacts.resolveUsername — один из самых жёстко лимитированных методов MTProto,
+    поэтому результат хранится в Redis. access_hash выдаётся конкретному аккаунту,
+    так что ключ включает аккаунт сессии.
+    """
+
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            redis: interface.IRedis,
+            ttl: int = 7 * 24 * 60 * 60,
+    ):
+        self.logger = tel.logger()
+        self.meter = tel.meter()
+        self.redis = redis
+        # Ограничивает время, в течение которого сменивший username канал читается по старой записи
+        self.ttl = ttl
+
+        self.requests_counter = self.meter.create_counter(
+            "telegram.entity_cache.requests",
+            description="Обращения к кешу каналов Telegram по результату: hit, miss",
+        )
+
+    async def get(self, account_key: str, username: str) -> tuple[InputPeerChannel, str] | None:
+        cached = await self.redis.get(self._key(account_key, username))
+        if not cached:
+            self.requests_counter.add(1, {"result": "miss"})
+            return None
+
+        self.requests_counter.add(1, {"result": "hit"})
+        peer = InputPeerChannel(channel_id=cached["id"], access_hash=cached["access_hash"])
+        return peer, cached["username"]
+
+    async def set(self, account_key: str, username: str, entity):
+        value = {
+            "id": entity.id,
+            "access_hash": entity.access_hash,
+            "username": entity.username if getattr(entity, 'username', None) else str(entity.id),
+        }
+
+        try:
+            await self.redis.set(self._key(account_key, username), value, ttl=self.ttl)
+        except Exception as err:
+            # Без кеша чтение продолжит работать через resolveUsername
+            self.logger.warning(f"Не удалось сохранить канал {username} в кеш: {err}")
+
+    async def invalidate(self, account_keys: list[str], username: str):
+        try:
+            await self.redis.delete(*[self._key(account_key, username) for account_key in account_keys])
+        except Exception as err:
+            self.logger.warning(f"Не удалось сбросить кеш канала {username}: {err}")
+
+    @staticmethod
+    def _key(account_key: str, username: str) -> str:
+        return f"telegram:entity:{account_key}:{username.lstrip('@').lower()}"
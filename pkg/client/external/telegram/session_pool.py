@@ -0,0 +1,142 @@
+import asyncio
+import hashlib
+import time
+from dataclasses import dataclass, field
+
+from telethon import TelegramClient as TelethonClient
+from telethon.sessions import StringSession
+
+from internal import interface
+
+
+@dataclass
+class TelethonSession:
+    name: str
+    session_string: str
+    # Стабильный идентификатор аккаунта, не зависящий от порядка сессий в конфиге
+    account_key: str
+    client: TelethonClient | None = None
+    cooldown_until: float = 0
+    in_flight: int = 0
+    requests: int = 0
+    flood_waits: int = 0
+    connect_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+class TelethonSessionPool:
+    """
+    Пул MTProto-сессий для чтения каналов.
+
+    Запрос уходит в наименее загруженную сессию без активного FloodWait.
+    Сессия, получившая FloodWait, исключается из выдачи до конца ожидания.
+    """
+
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            session_strings: list[str],
+            api_id: int,
+            api_hash: str,
+            max_flood_wait: int = 60,
+            broken_session_cooldown: int = 10 * 60,
+    ):
+        if not session_strings:
+            raise ValueError("Не задано ни одной session string")
+
+        self.logger = tel.logger()
+        self.meter = tel.meter()
+        self.api_id = api_id
+        self.api_hash = api_hash
+        # Дольше этого ждать освобождения сессии нет смысла — отдаём ошибку вызывающему
+        self.max_flood_wait = max_flood_wait
+        self.broken_session_cooldown = broken_session_cooldown
+
+        self.sessions = [
+            TelethonSession(
+                name=f"session-{index}",
+                session_string=session_string,
+                account_key=hashlib.sha256(session_string.encode()).hexdigest()[:16],
+            )
+            for index, session_string in enumerate(session_strings)
+        ]
+
+        self.requests_counter = self.meter.create_counter(
+            "telegram.session.requests",
+            description="Запросы к Telegram по сессиям пула",
+        )
+        self.flood_wait_counter = self.meter.create_counter(
+            "telegram.session.flood_waits",
+            description="FloodWait по сессиям пула",
+        )
+
+    async def acquire(self) -> TelethonSession:
+        while True:
+            now = time.monotonic()
+
+            available = [session for session in self.sessions if session.cooldown_until <= now]
+            if available:
+                session = min(available, key=lambda session: (session.in_flight, session.requests))
+                try:
+                    await self._connect(session)
+                except Exception as err:
+                    # Нерабочую сессию надолго убираем из выдачи, остальные продолжают работать
+                    self.logger.error(f"Не удалось подключить {session.name}: {err}")
+                    session.cooldown_until = now + self.broken_session_cooldown
+                    continue
+
+                session.in_flight += 1
+                session.requests += 1
+                self.requests_counter.add(1, {"session": session.name})
+                return session
+
+            wait_seconds = min(session.cooldown_until for session in self.sessions) - now
+            if wait_seconds > self.max_flood_wait:
+                raise Exception(f"Все Telegram-сессии во FloodWait, ближайшая освободится через {wait_seconds:.0f}с")
+
+            self.logger.warning(f"Все Telegram-сессии во FloodWait, ждём {wait_seconds:.0f}с")
+            await asyncio.sleep(wait_seconds)
+
+    def release(self, session: TelethonSession):
+        session.in_flight -= 1
+
+    def mark_flood_wait(self, session: TelethonSession, seconds: int):
+        session.cooldown_until = time.monotonic() + seconds
+        session.flood_waits += 1
+        self.flood_wait_counter.add(1, {"session": session.name})
+        self.logger.warning(f"FloodWait {seconds}с для {session.name}")
+
+    def stats(self) -> list[dict]:
+        now = time.monotonic()
+        return [
+            {
+                "session": session.name,
+                "requests": session.requests,
+                "in_flight": session.in_flight,
+                "flood_waits": session.flood_waits,
+                "cooldown_seconds": max(session.cooldown_until - now, 0),
+            }
+            for session in self.sessions
+        ]
+
+    async def _connect(self, session: TelethonSession):
+        async with session.connect_lock:
+            if session.client is None:
+                client = TelethonClient(
+                    StringSession(session.session_string),
+                    self.api_id,
+                    self.api_hash,
+                    device_model='Server',
+                    system_version='Linux',
+                    app_version='1.0',
+                    lang_code='ru',
+                    # FloodWait не пережидаем внутри Telethon, а переключаемся на другую сессию
+                    flood_sleep_threshold=0
+                )
+                await client.connect()
+
+                # Проверяем авторизацию
+                if not await client.is_user_authorized():
+                    await client.disconnect()
+                    raise Exception(f"Session string {session.name} недействительна")
+
+                session.client = client
@@ -0,0 +1,120 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable
+
+from internal import interface, model
+from pkg.trace_wrapper import traced_method
+
+
+class CachedLoomOrganizationClient(interface.ILoomOrganizationClient):
+    """
+    Кеширующая обёртка над клиентом loom-organization.
+
+    Организация несёт баланс, поэтому живёт в кеше несколько секунд и сбрасывается
+    после списания. Множители стоимости меняются редко и кешируются надолго.
+    Одновременные промахи по одному ключу объединяются в один запрос.
+    """
+
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            client: interface.ILoomOrganizationClient,
+            organization_ttl: float = 5,
+            cost_multiplier_ttl: float = 5 * 60,
+    ):
+        self.tracer = tel.tracer()
+        self.logger = tel.logger()
+        self.meter = tel.meter()
+        self.client = client
+        self.organization_ttl = organization_ttl
+        self.cost_multiplier_ttl = cost_multiplier_ttl
+
+        self._cache: dict[tuple[str, int], tuple[float, Any]] = {}
+        self._in_flight: dict[tuple[str, int], asyncio.Task] = {}
+
+        self.requests_counter = self.meter.create_counter(
+            "organization_client.cache.requests",
+            description="Обращения к кешу организаций по типу записи и результату: hit, miss, coalesced",
+        )
+
+    async def debit_balance(self, organization_id: int, amount_rub: str) -> None:
+        try:
+            await self.client.debit_balance(organization_id, amount_rub)
+        finally:
+            # Баланс изменился (или мог измениться, если ответ потерялся)
+            self._invalidate(("organization", organization_id))
+
+    async def get_organization_by_id(self, organization_id: int) -> model.Organization:
+        return await self._get_cached(
+            ("organization", organization_id),
+            self.organization_ttl,
+            lambda: self.client.get_organization_by_id(organization_id),
+        )
+
+    async def get_cost_multiplier(self, organization_id: int) -> model.CostMultiplier:
+        return await self._get_cached(
+            ("cost_multiplier", organization_id),
+            self.cost_multiplier_ttl,
+            lambda: self.client.get_cost_multiplier(organization_id),
+        )
+
+    @traced_method()
+    async def get_organization_with_cost_multiplier(
+            self,
+            organization_id: int
+    ) -> tuple[model.Organization, model.CostMultiplier]:
+        organization, cost_multiplier = await asyncio.gather(
+            self.get_organization_by_id(organization_id),
+            self.get_cost_multiplier(organization_id),
+        )
+        return organization, cost_multiplier
+
+    async def _get_cached(
+            self,
+            key: tuple[str, int],
+            ttl: float,
+            loader: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            self.requests_counter.add(1, {"kind": key[0], "result": "hit"})
+            return cached[1]
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.requests_counter.add(1, {"kind": key[0], "result": "coalesced"})
+        else:
+            self.requests_counter.add(1, {"kind": key[0], "result": "miss"})
+            task = asyncio.create_task(self._load(key, ttl, loader))
+            self._in_flight[key] = task
+
+        # Отмена одного ожидающего не должна отменять общий запрос
+        return await asyncio.shield(task)
+
+    async def _load(
+            self,
+            key: tuple[str, int],
+            ttl: float,
+            loader: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        try:
+            value = await loader()
+            if self._in_flight.get(key) is asyncio.current_task():
+                self._cache[key] = (time.monotonic() + ttl, value)
+                self._evict_expired()
+            return value
+        finally:
+            if self._in_flight.get(key) is asyncio.current_task():
+                del self._in_flight[key]
+
+    def _invalidate(self, key: tuple[str, int]):
+        self._cache.pop(key, None)
+        # Запрос, начатый до списания, может вернуть старый баланс — не сохраняем его
+        self._in_flight.pop(key, None)
+
+    def _evict_expired(self):
+        if len(self._cache) < 1024:
+            return
+
+        now = time.monotonic()
+        self._cache = {key: entry for key, entry in self._cache.items() if entry[0] > now}
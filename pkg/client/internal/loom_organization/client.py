@@ -1,3 +1,4 @@
+import asyncio
 from contextvars import ContextVar
 
 import httpx
@@ -59,3 +60,13 @@ class LoomOrganizationClient(interface.ILoomOrganizationClient):
         json_response = response.json()
 
         return model.CostMultiplier(**json_response)
+
+    async def get_organization_with_cost_multiplier(
+            self,
+            organization_id: int
+    ) -> tuple[model.Organization, model.CostMultiplier]:
+        organization, cost_multiplier = await asyncio.gather(
+            self.get_organization_by_id(organization_id),
+            self.get_cost_multiplier(organization_id),
+        )
+        return organization, cost_multiplier
@@ -0,0 +1,21 @@
+from infrastructure.weedfs.etag import fid_etag, etag_matches
+
+
+def test_etag_matches_fid_with_comma():
+    etag = fid_etag("3,01637037d6")
+
+    assert etag_matches('"3,01637037d6"', etag)
+
+
+def test_etag_matches_in_list_and_weak():
+    etag = fid_etag("3,01637037d6")
+
+    assert etag_matches('"7,0a1b2c", W/"3,01637037d6"', etag)
+    assert etag_matches('*', etag)
+
+
+def test_etag_does_not_match_other_fid():
+    etag = fid_etag("3,01637037d6")
+
+    assert not etag_matches('"3,01637037d7"', etag)
+    assert not etag_matches('"3"', etag)
@@ -0,0 +1,57 @@
+import pytest
+
+
+class FakeInstrument:
+    def add(self, amount, attributes=None):
+        pass
+
+    def record(self, amount, attributes=None):
+        pass
+
+
+class FakeMeter:
+    def create_counter(self, name, **kwargs):
+        return FakeInstrument()
+
+    def create_up_down_counter(self, name, **kwargs):
+        return FakeInstrument()
+
+    def create_histogram(self, name, **kwargs):
+        return FakeInstrument()
+
+
+class FakeLogger:
+    def __init__(self):
+        self.messages = []
+
+    def debug(self, message, *args, **kwargs):
+        self.messages.append(("debug", message))
+
+    def info(self, message, *args, **kwargs):
+        self.messages.append(("info", message))
+
+    def warning(self, message, *args, **kwargs):
+        self.messages.append(("warning", message))
+
+    def error(self, message, *args, **kwargs):
+        self.messages.append(("error", message))
+
+
+class FakeTelemetry:
+    def __init__(self):
+        self._logger = FakeLogger()
+        self._meter = FakeMeter()
+
+    def logger(self):
+        return self._logger
+
+    def meter(self):
+        return self._meter
+
+    def tracer(self):
+        return None
+
+
+@pytest.fixture
+def tel():
+    return FakeTelemetry()
@@ -0,0 +1,143 @@
+import asyncio
+
+import pytest
+
+from internal.app.autoposting.app import Autoposting
+
+
+class FakePromptGenerator:
+    async def get_filter_posts_batch_system_prompt(self, filter_prompt: str, posts_text: list[str]) -> str:
+        return "batch"
+
+    async def get_filter_post_system_prompt(self, filter_prompt: str, post_text: str) -> str:
+        return f"single:{post_text}"
+
+
+class FakeOpenAIClient:
+    def __init__(self, batch_result: dict | Exception):
+        self.batch_result = batch_result
+        self.single_calls = []
+
+    async def generate_json(self, history: list, system_prompt: str, **kwargs) -> tuple[dict, dict]:
+        if system_prompt == "batch":
+            if isinstance(self.batch_result, Exception):
+                raise self.batch_result
+            return self.batch_result, {}
+
+        post_text = system_prompt.removeprefix("single:")
+        self.single_calls.append(post_text)
+        return {"is_suitable": True, "reason": "single"}, {}
+
+
+def new_autoposting(tel, openai_client=None, filter_batch_size: int = 20, filter_batch_token_budget: int = 8000):
+    return Autoposting(
+        tel=tel,
+        publication_service=None,
+        telegram_client=None,
+        openai_client=openai_client,
+        prompt_generator=FakePromptGenerator(),
+        autoposting_jobs=None,
+        post_prefilter=None,
+        channel_post_cache=None,
+        filter_batch_size=filter_batch_size,
+        filter_batch_token_budget=filter_batch_token_budget,
+    )
+
+
+def post(text: str) -> dict:
+    return {"text": text, "link": text}
+
+
+def test_split_filter_batches_respects_batch_size(tel):
+    autoposting = new_autoposting(tel, filter_batch_size=2)
+    posts = [post(f"post {index}") for index in range(5)]
+
+    batches = autoposting._split_filter_batches(posts)
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert [item for batch in batches for item in batch] == posts
+
+
+def test_split_filter_batches_respects_token_budget(tel):
+    # Каждый пост оценивается в 60 // 3 + 20 = 40 токенов
+    autoposting = new_autoposting(tel, filter_batch_token_budget=100)
+    posts = [post("а" * 60) for _ in range(5)]
+
+    batches = autoposting._split_filter_batches(posts)
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+
+
+def test_split_filter_batches_keeps_oversized_post_alone(tel):
+    autoposting = new_autoposting(tel, filter_batch_token_budget=100)
+    posts = [post("short"), post("а" * 600), post("short")]
+
+    batches = autoposting._split_filter_batches(posts)
+
+    assert [len(batch) for batch in batches] == [1, 1, 1]
+
+
+def test_split_filter_batches_empty(tel):
+    assert new_autoposting(tel)._split_filter_batches([]) == []
+
+
+def test_parse_batch_verdicts_maps_by_index():
+    filter_result = {"results": [
+        {"index": 1, "is_suitable": False, "reason": "реклама"},
+        {"index": 0, "is_suitable": True},
+    ]}
+
+    verdicts = Autoposting._parse_batch_verdicts(filter_result, 2)
+
+    assert verdicts == [(True, "не указана"), (False, "реклама")]
+
+
+def test_parse_batch_verdicts_leaves_missing_and_drops_extra():
+    filter_result = {"results": [
+        {"index": 0, "is_suitable": True, "reason": "ok"},
+        {"index": 5, "is_suitable": True, "reason": "лишний"},
+        {"index": -1, "is_suitable": True, "reason": "лишний"},
+        {"index": 2, "is_suitable": "yes", "reason": "не bool"},
+        "мусор",
+    ]}
+
+    verdicts = Autoposting._parse_batch_verdicts(filter_result, 3)
+
+    assert verdicts == [(True, "ok"), None, None]
+
+
+def test_parse_batch_verdicts_requires_results_list():
+    with pytest.raises(ValueError):
+        Autoposting._parse_batch_verdicts({"is_suitable": True}, 2)
+
+
+def test_filter_posts_falls_back_to_single_calls_for_missing_verdicts(tel):
+    openai_client = FakeOpenAIClient({"results": [{"index": 0, "is_suitable": False, "reason": "batch"}]})
+    autoposting = new_autoposting(tel, openai_client)
+    posts = [post("first"), post("second"), post("third")]
+
+    verdicts = asyncio.run(autoposting._filter_posts_with_ai("prompt", posts))
+
+    assert verdicts == [(False, "batch"), (True, "single"), (True, "single")]
+    assert openai_client.single_calls == ["second", "third"]
+
+
+def test_filter_posts_falls_back_to_single_calls_when_batch_fails(tel):
+    openai_client = FakeOpenAIClient(RuntimeError("bad json"))
+    autoposting = new_autoposting(tel, openai_client)
+    posts = [post("first"), post("second")]
+
+    verdicts = asyncio.run(autoposting._filter_posts_with_ai("prompt", posts))
+
+    assert verdicts == [(True, "single"), (True, "single")]
+    assert openai_client.single_calls == ["first", "second"]
+
+
+def test_filter_single_post_skips_batch_call(tel):
+    openai_client = FakeOpenAIClient(RuntimeError("batch must not be called"))
+    autoposting = new_autoposting(tel, openai_client)
+
+    verdicts = asyncio.run(autoposting._filter_posts_with_ai("prompt", [post("only")]))
+
+    assert verdicts == [(True, "single")]
+    assert openai_client.single_calls == ["only"]
@@ -0,0 +1,99 @@
+from internal.app.autoposting.prefilter import (
+    AdStage,
+    KeywordRulesStage,
+    LanguageStage,
+    LengthStage,
+    SimilarityStage,
+    new_post_prefilter,
+)
+
+
+def post(text: str, **fields) -> dict:
+    return {"text": text, **fields}
+
+
+def test_length_stage_ignores_surrounding_whitespace():
+    stage = LengthStage(min_length=10)
+
+    assert stage.check(post("достаточно длинный"), "")
+    assert not stage.check(post("   коротко   "), "")
+
+
+def test_language_stage_rejects_posts_without_text():
+    stage = LanguageStage(["cyrillic"])
+
+    assert not stage.check(post("🔥🔥🔥 https://t.me/x 123"), "")
+
+
+def test_language_stage_checks_dominant_script():
+    stage = LanguageStage(["cyrillic"])
+
+    assert stage.check(post("Новости рынка: Apple выпустила отчёт"), "")
+    assert not stage.check(post("Market news: Apple released a report"), "")
+    assert LanguageStage([]).check(post("Market news"), "")
+
+
+def test_keyword_stage_without_exclusions_passes_everything():
+    assert KeywordRulesStage().check(post("крипта"), "Посты про финансы")
+
+
+def test_keyword_stage_rejects_excluded_terms():
+    stage = KeywordRulesStage()
+    filter_prompt = "Посты про финансы\nИсключить: крипта, ставки на спорт."
+
+    assert not stage.check(post("Обзор: Крипта снова растёт"), filter_prompt)
+    assert not stage.check(post("Лучшие ставки на спорт недели"), filter_prompt)
+    assert stage.check(post("Ключевая ставка ЦБ"), filter_prompt)
+
+
+def test_keyword_stage_matches_terms_literally():
+    stage = KeywordRulesStage()
+    filter_prompt = "Стоп-слова: /.*/, c++, (скидки"
+
+    assert stage.check(post("Обычный пост"), filter_prompt)
+    assert not stage.check(post("Новый стандарт c++ вышел"), filter_prompt)
+    assert not stage.check(post("Большие (скидки до пятницы"), filter_prompt)
+
+
+def test_ad_stage_rejects_ad_markers():
+    stage = AdStage()
+
+    assert not stage.check(post("Отличный курс. Промокод SALE"), "")
+    assert not stage.check(post("Новинка #реклама"), "")
+    assert stage.check(post("Разбор рынка недели"), "")
+
+
+def test_ad_stage_keeps_forwarded_posts_by_default():
+    forwarded_post = post("Разбор рынка недели", forwarded=True)
+
+    assert AdStage().check(forwarded_post, "")
+    assert not AdStage(reject_forwarded=True).check(forwarded_post, "")
+
+
+def test_similarity_stage_compares_post_with_filter_prompt():
+    stage = SimilarityStage(threshold=0.2)
+    filter_prompt = "Новости про инвестиции, акции и облигации"
+
+    assert stage.check(post("Акции и облигации: куда инвестировать в этом году"), filter_prompt)
+    assert not stage.check(post("Рецепт домашнего пирога с яблоками"), filter_prompt)
+    assert not stage.check(post(""), filter_prompt)
+
+
+def test_prefilter_splits_posts_by_first_failed_stage(tel):
+    prefilter = new_post_prefilter(tel, min_length=10, allowed_scripts=["cyrillic"], similarity_threshold=0)
+    passed = post("Разбор рынка акций за неделю")
+    too_short = post("Коротко")
+    advert = post("Разбор рынка акций. Промокод SALE")
+
+    passed_posts, rejected_posts = prefilter.apply("Посты про акции", [passed, too_short, advert])
+
+    assert passed_posts == [passed]
+    assert rejected_posts == [too_short, advert]
+
+
+def test_prefilter_adds_similarity_stage_only_with_threshold(tel):
+    without_similarity = new_post_prefilter(tel, min_length=1, allowed_scripts=[], similarity_threshold=0)
+    with_similarity = new_post_prefilter(tel, min_length=1, allowed_scripts=[], similarity_threshold=0.5)
+
+    assert [stage.name for stage in without_similarity.stages] == ["length", "language", "keywords", "ads"]
+    assert with_similarity.stages[-1].name == "similarity"
@@ -0,0 +1,130 @@
+import asyncio
+from dataclasses import replace
+from datetime import datetime, timedelta
+
+from internal import model
+from internal.app.autoposting.scheduler import AutopostingScheduler
+
+NOW = datetime(2026, 1, 1, 12, 0)
+
+
+class FakePublicationService:
+    def __init__(self, autopostings: list[model.Autoposting]):
+        self.autopostings = autopostings
+        self.updated_since_calls = []
+
+    async def get_all_autopostings(self) -> list[model.Autoposting]:
+        return self.autopostings
+
+    async def get_autopostings_updated_since(self, updated_since: datetime) -> list[model.Autoposting]:
+        self.updated_since_calls.append(updated_since)
+        return [autoposting for autoposting in self.autopostings if autoposting.updated_at >= updated_since]
+
+
+def new_autoposting(
+        autoposting_id: int,
+        last_active: datetime | None = NOW,
+        period_in_hours: int = 1,
+        enabled: bool = True,
+        updated_at: datetime = NOW,
+) -> model.Autoposting:
+    return model.Autoposting(
+        id=autoposting_id,
+        organization_id=1,
+        autoposting_category_id=1,
+        period_in_hours=period_in_hours,
+        enabled=enabled,
+        filter_prompt="",
+        tg_channels=[],
+        required_moderation=False,
+        need_image=False,
+        last_active=last_active,
+        updated_at=updated_at,
+        created_at=NOW,
+    )
+
+
+def test_pop_due_returns_only_due_in_order(tel):
+    scheduler = AutopostingScheduler(tel, FakePublicationService([]))
+    scheduler.upsert(new_autoposting(1, period_in_hours=3))
+    scheduler.upsert(new_autoposting(2, period_in_hours=1))
+    scheduler.upsert(new_autoposting(3, last_active=None))
+
+    due = scheduler.pop_due(NOW + timedelta(hours=2))
+
+    assert [autoposting.id for autoposting in due] == [3, 2]
+    assert scheduler.pop_due(NOW + timedelta(hours=2)) == []
+
+
+def test_disabled_autoposting_is_not_scheduled(tel):
+    scheduler = AutopostingScheduler(tel, FakePublicationService([]))
+    scheduler.upsert(new_autoposting(1))
+    scheduler.upsert(new_autoposting(1, enabled=False, updated_at=NOW + timedelta(minutes=1)))
+
+    assert scheduler.pop_due(NOW + timedelta(days=1)) == []
+
+
+def test_upsert_replaces_previous_schedule(tel):
+    scheduler = AutopostingScheduler(tel, FakePublicationService([]))
+    scheduler.upsert(new_autoposting(1, period_in_hours=1))
+    scheduler.upsert(new_autoposting(1, period_in_hours=5, updated_at=NOW + timedelta(minutes=1)))
+
+    assert scheduler.pop_due(NOW + timedelta(hours=2)) == []
+    assert [autoposting.id for autoposting in scheduler.pop_due(NOW + timedelta(hours=5))] == [1]
+
+
+def test_in_flight_autoposting_is_not_popped_twice(tel):
+    scheduler = AutopostingScheduler(tel, FakePublicationService([]))
+    autoposting = new_autoposting(1, last_active=None)
+    scheduler.upsert(autoposting)
+
+    assert len(scheduler.pop_due(NOW)) == 1
+
+    # Изменение во время обработки не ставит второй запуск
+    scheduler.upsert(replace(autoposting, filter_prompt="новый"))
+    assert scheduler.pop_due(NOW + timedelta(days=1)) == []
+
+
+def test_complete_success_schedules_next_period(tel):
+    scheduler = AutopostingScheduler(tel, FakePublicationService([]))
+    scheduler.upsert(new_autoposting(1, last_active=None, period_in_hours=2))
+    scheduler.pop_due(NOW)
+
+    scheduler.complete(1, succeeded=True)
+
+    assert scheduler.pop_due(datetime.now() + timedelta(hours=1)) == []
+    assert len(scheduler.pop_due(datetime.now() + timedelta(hours=2, minutes=1))) == 1
+
+
+def test_complete_failure_retries_after_delay(tel):
+    scheduler = AutopostingScheduler(tel, FakePublicationService([]), retry_delay=60)
+    scheduler.upsert(new_autoposting(1, last_active=None, period_in_hours=24))
+    scheduler.pop_due(NOW)
+
+    scheduler.complete(1, succeeded=False)
+
+    assert scheduler.pop_due(datetime.now()) == []
+    assert len(scheduler.pop_due(datetime.now() + timedelta(seconds=61))) == 1
+
+
+def test_removed_autoposting_is_dropped(tel):
+    scheduler = AutopostingScheduler(tel, FakePublicationService([]))
+    scheduler.upsert(new_autoposting(1, last_active=None))
+
+    scheduler.remove(1)
+
+    assert scheduler.pop_due(NOW + timedelta(days=1)) == []
+
+
+def test_sync_loads_all_then_reads_since_watermark_with_overlap(tel):
+    publication_service = FakePublicationService([
+        new_autoposting(1, last_active=None, updated_at=NOW - timedelta(minutes=5)),
+        new_autoposting(2, last_active=None, updated_at=NOW),
+    ])
+    scheduler = AutopostingScheduler(tel, publication_service, watermark_overlap=5)
+
+    asyncio.run(scheduler.sync())
+    asyncio.run(scheduler.sync())
+
+    assert publication_service.updated_since_calls == [NOW - timedelta(seconds=5)]
+    assert [autoposting.id for autoposting in scheduler.pop_due(NOW)] == [1, 2]